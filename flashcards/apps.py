@@ -2,4 +2,11 @@ from django.apps import AppConfig
 
 class FlashcardsConfig(AppConfig):
     default_auto_field= 'django.db.models.BigAutoField'
-    name='flashcards'
\ No newline at end of file
+    name='flashcards'
+
+    def ready(self):
+        from django.conf import settings
+        from flashcards import signals
+        if settings.PRODUCTION_RENDERING:
+            from flashcards.core.pages import prerender_pages
+            prerender_pages()
\ No newline at end of file
@@ -11,6 +11,9 @@ import os
 
 from django.core.asgi import get_asgi_application
 
+from flashcards.static_server import wrap_asgi
+
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "flashcards.settings")
 
-application = get_asgi_application()
+# With SERVE_STATIC on, files under STATIC_ROOT are answered before Django.
+application = wrap_asgi(get_asgi_application())
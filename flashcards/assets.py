@@ -0,0 +1,74 @@
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only .gz files are written.
+    brotli = None
+
+# Text formats worth compressing; images and fonts are compressed already.
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.mjs', '.map', '.json', '.svg', '.txt', '.html', '.xml', '.ico'}
+# Below this, headers outweigh what compression saves.
+MIN_SIZE = 256
+# A variant must be at least this much smaller than the original to be kept.
+MAX_RATIO = 0.95
+
+
+def encoders():
+    """Return (suffix, compress) for each available encoding, best first."""
+    found = []
+    if brotli is not None:
+        found.append(('.br', lambda data: brotli.compress(data, quality=11)))
+    found.append(('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0)))
+    return found
+
+
+def _write(path, data):
+    # Replace atomically, so a server indexing the directory never sees half a file.
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def compress_file(path, available=None):
+    """Write compressed siblings of path; return {suffix: size} of those kept."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    sizes = {}
+    for suffix, compress in available or encoders():
+        variant = path + suffix
+        compressed = compress(data)
+        if len(compressed) <= len(data) * MAX_RATIO:
+            _write(variant, compressed)
+            sizes[suffix] = len(compressed)
+        elif os.path.exists(variant):
+            os.remove(variant)
+    return sizes
+
+
+def compress_directory(root):
+    """Precompress every compressible file under root.
+
+    Returns (relative path, size, {suffix: compressed size}) per file. Files
+    whose variants are all newer than they are are not compressed again.
+    """
+    available = encoders()
+    results = []
+    for directory, _, files in os.walk(root):
+        for name in sorted(files):
+            path = os.path.join(directory, name)
+            extension = os.path.splitext(name)[1]
+            if extension not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            stat = os.stat(path)
+            if stat.st_size < MIN_SIZE:
+                continue
+            current = {
+                suffix: os.path.getsize(path + suffix) for suffix, _ in available
+                if os.path.exists(path + suffix) and os.path.getmtime(path + suffix) >= stat.st_mtime
+            }
+            if len(current) < len(available):
+                current = compress_file(path, available)
+            results.append((os.path.relpath(path, root), stat.st_size, current))
+    return results
@@ -0,0 +1,302 @@
+import json
+import random
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.forms.models import model_to_dict
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import redirect
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_http_methods, require_POST
+from flashcards.models import Collection
+from flashcards.models import Flashcard
+from flashcards.models import FlashcardSet
+from flashcards.models import ReviewState
+from flashcards.models import User
+from flashcards.core import scheduler
+from flashcards.core.pagination import page_size_from
+from flashcards.core.search import search_cards
+from flashcards.core.conditional import MAX_ID
+from flashcards.core.cards import batch_too_large, batch_too_large_message, create_cards, validate_cards
+from flashcards.core.randompick import random_collection as pick_random_collection
+
+CARD_FIELDS = ['question', 'answer', 'difficulty']
+
+encoder = DjangoJSONEncoder(separators=(',', ':'))
+
+
+def json_error(message, status):
+    return JsonResponse({'message': message}, status=status)
+
+
+def json_body(request):
+    try:
+        body = json.loads(request.body)
+    except ValueError:
+        return None
+    return body if isinstance(body, dict) else None
+
+
+def stream_json_array(rows, chunk_size=None):
+    """Encode an iterable of dicts as a JSON array, one database chunk at a time."""
+    chunk_size = chunk_size or settings.API_CHUNK_SIZE
+    yield '['
+    batch = []
+    first = True
+    for row in rows:
+        batch.append(encoder.encode(row))
+        if len(batch) >= chunk_size:
+            yield ('' if first else ',') + ','.join(batch)
+            first = False
+            batch = []
+    if batch:
+        yield ('' if first else ',') + ','.join(batch)
+    yield ']'
+
+
+async def astream_json_array(rows, chunk_size=None, serialize=None):
+    """stream_json_array() over an async iterable, for ASGI."""
+    chunk_size = chunk_size or settings.API_CHUNK_SIZE
+    yield '['
+    batch = []
+    first = True
+    async for row in rows:
+        batch.append(encoder.encode(serialize(row) if serialize else row))
+        if len(batch) >= chunk_size:
+            yield ('' if first else ',') + ','.join(batch)
+            first = False
+            batch = []
+    if batch:
+        yield ('' if first else ',') + ','.join(batch)
+    yield ']'
+
+
+def shuffled_ids(queryset):
+    """Return the ids of a queryset in random order, or None above API_SHUFFLE_MAX_CARDS.
+
+    Shuffling here instead of ORDER BY RANDOM() spares the database a sort of
+    the whole set, but every id is held in memory until the response ends,
+    which the cap keeps bounded.
+    """
+    limit = settings.API_SHUFFLE_MAX_CARDS
+    ids = list(queryset.values_list('id', flat=True)[:limit + 1])
+    if len(ids) > limit:
+        return None
+    random.shuffle(ids)
+    return ids
+
+
+def rows_in_order(queryset, ids, chunk_size):
+    """The rows of a values() queryset that includes 'id', in the order of ids."""
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        rows = {row['id']: row for row in queryset.filter(id__in=chunk)}
+        yield from (rows[row_id] for row_id in chunk if row_id in rows)
+
+
+async def arows_in_order(queryset, ids, chunk_size):
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        rows = {row['id']: row async for row in queryset.filter(id__in=chunk)}
+        for row_id in chunk:
+            if row_id in rows:
+                yield rows[row_id]
+
+
+def streaming_json_response(request, queryset, serialize=None, ids=None):
+    """Stream a values() queryset as a JSON array in API_CHUNK_SIZE chunks.
+
+    With ids, the rows come in that order instead of the queryset's. Under
+    ASGI the rows come from an async iterator; Django would otherwise buffer a
+    synchronous stream in full before sending it.
+    """
+    chunk_size = settings.API_CHUNK_SIZE
+    if isinstance(request, ASGIRequest):
+        if ids is not None:
+            rows = arows_in_order(queryset, ids, chunk_size)
+        else:
+            rows = queryset.aiterator(chunk_size=chunk_size)
+        content = astream_json_array(rows, chunk_size, serialize)
+    else:
+        if ids is not None:
+            rows = rows_in_order(queryset, ids, chunk_size)
+        else:
+            rows = queryset.iterator(chunk_size=chunk_size)
+        if serialize is not None:
+            rows = map(serialize, rows)
+        content = stream_json_array(rows, chunk_size)
+    return StreamingHttpResponse(content, content_type='application/json')
+
+
+def add_set_cards(request, set_id):
+    reqset = FlashcardSet.objects.filter(id=set_id).first()
+    if reqset is None:
+        return json_error("The flashcard set was not found", 404)
+    try:
+        rows = json.loads(request.body)
+    except ValueError:
+        rows = None
+    if not isinstance(rows, list) or not rows:
+        return json_error("Request body must be a non-empty JSON array of flashcards", 400)
+    if batch_too_large(rows):
+        return json_error(batch_too_large_message(), 400)
+
+    cards, errors = validate_cards(rows)
+    if errors:
+        return JsonResponse({
+            'message': "No flashcards were created because some were invalid",
+            'errors': [{'index': index, 'errors': row_errors} for index, row_errors in errors.items()],
+        }, status=400)
+
+    created = create_cards(reqset, cards)
+    return JsonResponse([serialize_card(model_to_dict(card, CARD_FIELDS)) for card in created], status=201, safe=False)
+
+
+def serialize_user(user):
+    return {'id': user.id, 'username': user.username, 'admin': user.admin}
+
+
+def serialize_set(reqset):
+    return {'id': reqset.id, 'name': reqset.name, 'created_at': reqset.created_at, 'updated_at': reqset.updated_at}
+
+
+def serialize_collection(collection):
+    return {
+        'id': collection.id,
+        'name': collection.name,
+        'comment': collection.comment.comment if collection.comment else None,
+        'set': serialize_set(collection.flashcardset) if collection.flashcardset else None,
+        'author': serialize_user(collection.author) if collection.author else None,
+    }
+
+
+def serialize_card(row):
+    difficulty = row['difficulty']
+    return {
+        'question': row['question'],
+        'answer': row['answer'],
+        'difficulty': difficulty.lower() if difficulty else None,
+    }
+
+
+@require_GET
+def sets(request):
+    queryset = FlashcardSet.objects.order_by('id').values('id', 'name', 'created_at', 'updated_at')
+    return streaming_json_response(request, queryset)
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'POST'])
+def set_cards(request, set_id):
+    if request.method == 'POST':
+        return add_set_cards(request, set_id)
+    if not FlashcardSet.objects.filter(id=set_id).exists():
+        return json_error("The flashcard set was not found", 404)
+
+    queryset = Flashcard.objects.filter(flashcardset_id=set_id).order_by('id').values('id', *CARD_FIELDS)
+    ids = None
+    if request.GET.get('shuffle', '').lower() in ('1', 'true', 'yes'):
+        ids = shuffled_ids(queryset)
+        if ids is None:
+            return json_error(f"Sets of more than {settings.API_SHUFFLE_MAX_CARDS} cards cannot be shuffled", 400)
+    return streaming_json_response(request, queryset, serialize_card, ids=ids)
+
+
+def serialize_search_result(row):
+    return {**row, 'difficulty': row['difficulty'].lower() if row['difficulty'] else None}
+
+
+@require_GET
+def search(request):
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return json_error("q must be a non-empty search query", 400)
+    try:
+        offset = max(int(request.GET.get('offset', 0)), 0)
+    except ValueError:
+        return json_error("offset must be an integer", 400)
+    size = page_size_from(request)
+    # One extra row tells us whether there is another page.
+    results = search_cards(query, size + 1, offset)
+    next_offset = offset + size if len(results) > size else None
+    return JsonResponse({
+        'query': query,
+        'results': [serialize_search_result(row) for row in results[:size]],
+        'next_offset': next_offset,
+    })
+
+
+@require_GET
+def collection_detail(request, col_id):
+    collection = Collection.objects.select_related('flashcardset', 'author', 'comment').filter(id=col_id).first()
+    if collection is None:
+        return json_error("The flashcard set collection was not found", 404)
+    return JsonResponse(serialize_collection(collection), encoder=DjangoJSONEncoder)
+
+
+@require_GET
+def random_collection(request):
+    collection = pick_random_collection(Collection.objects.only('id'))
+    if collection is None:
+        return json_error("There are no flashcard set collections", 404)
+    return redirect('api_collection', col_id=collection.id)
+
+
+def serialize_review_state(state):
+    return {
+        'card_id': state.flashcard_id,
+        'question': state.flashcard.question,
+        'answer': state.flashcard.answer,
+        'difficulty': state.flashcard.difficulty.lower() if state.flashcard.difficulty else None,
+        'due_at': state.due_at,
+        'interval_days': state.interval_days,
+        'ease_factor': state.ease_factor,
+    }
+
+
+@require_GET
+def due_cards(request, user_id):
+    user = User.objects.filter(id=user_id).first()
+    if user is None:
+        return json_error("The user was not found", 404)
+    try:
+        limit = min(max(int(request.GET.get('limit', settings.DUE_CARDS_LIMIT)), 1), settings.MAX_PAGE_SIZE)
+    except ValueError:
+        return json_error("limit must be an integer", 400)
+    states = scheduler.due_cards(user, limit)
+    return JsonResponse([serialize_review_state(state) for state in states], encoder=DjangoJSONEncoder, safe=False)
+
+
+@csrf_exempt
+@require_POST
+def study_set(request, user_id, set_id):
+    user = User.objects.filter(id=user_id).first()
+    if user is None:
+        return json_error("The user was not found", 404)
+    if not FlashcardSet.objects.filter(id=set_id).exists():
+        return json_error("The flashcard set was not found", 404)
+    scheduler.enroll(user, set_id)
+    return JsonResponse({}, status=201)
+
+
+@csrf_exempt
+@require_POST
+def record_review(request, user_id):
+    body = json_body(request)
+    if body is None:
+        return json_error("Request body must be a JSON object", 400)
+    card_id = body.get('card_id')
+    quality = body.get('quality')
+    if not isinstance(card_id, int) or isinstance(card_id, bool) or not 0 < card_id <= MAX_ID:
+        return json_error("card_id must be an integer", 400)
+    if not isinstance(quality, int) or isinstance(quality, bool) or not 0 <= quality <= 5:
+        return json_error("quality must be an integer from 0 to 5", 400)
+    state = (
+        ReviewState.objects.select_related('flashcard')
+        .filter(user_id=user_id, flashcard_id=card_id)
+        .first()
+    )
+    if state is None:
+        return json_error("The card is not in this user's study queue", 404)
+    scheduler.review(state, quality)
+    return JsonResponse(serialize_review_state(state), encoder=DjangoJSONEncoder)
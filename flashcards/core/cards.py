@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from flashcards.models import DifficultyLevel, Flashcard, FlashcardSet
+
+# Accept the stored value or the short label, in any case ("Easy", "easy", "E").
+DIFFICULTY_LOOKUP = {}
+for _level in DifficultyLevel:
+    DIFFICULTY_LOOKUP[_level.value.lower()] = _level.value
+    DIFFICULTY_LOOKUP[_level.label.lower()] = _level.value
+
+MISSING_FIELDS = "Cannot create a new flashcard without a question, answer, or difficulty."
+INVALID_DIFFICULTY = "You must enter a valid difficulty."
+
+
+def validate_cards(rows):
+    """Check a list of card dicts in one pass.
+
+    Returns ``(cards, errors)`` where ``cards`` are unsaved Flashcards and
+    ``errors`` maps each bad row's index to its messages.
+    """
+    question_length = Flashcard._meta.get_field('question').max_length
+    answer_length = Flashcard._meta.get_field('answer').max_length
+    cards = []
+    errors = {}
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors[index] = ["Each flashcard must be an object."]
+            continue
+        question = row.get('question')
+        answer = row.get('answer')
+        difficulty = row.get('difficulty')
+        row_errors = []
+        if not question or not answer or not difficulty:
+            row_errors.append(MISSING_FIELDS)
+        else:
+            if not isinstance(question, str) or len(question) > question_length:
+                row_errors.append(f"Question must be text of at most {question_length} characters.")
+            if not isinstance(answer, str) or len(answer) > answer_length:
+                row_errors.append(f"Answer must be text of at most {answer_length} characters.")
+            difficulty = DIFFICULTY_LOOKUP.get(str(difficulty).lower())
+            if difficulty is None:
+                row_errors.append(INVALID_DIFFICULTY)
+        if row_errors:
+            errors[index] = row_errors
+        else:
+            cards.append(Flashcard(question=question, answer=answer, difficulty=difficulty))
+    return cards, errors
+
+
+def batch_too_large(rows):
+    return len(rows) > settings.MAX_CARDS_PER_BATCH
+
+
+def batch_too_large_message():
+    return f"No more than {settings.MAX_CARDS_PER_BATCH} flashcards can be created at once."
+
+
+def touch_flashcardset(set_id):
+    """Bump a set's updated_at without a save() so cached card fragments expire."""
+    FlashcardSet.objects.filter(id=set_id).update(updated_at=timezone.now())
+
+
+def create_cards(reqset, cards):
+    for card in cards:
+        card.flashcardset = reqset
+    with transaction.atomic():
+        created = Flashcard.objects.bulk_create(cards, batch_size=500)
+        touch_flashcardset(reqset.id)
+    return created
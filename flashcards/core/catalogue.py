@@ -0,0 +1,59 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+from flashcards.models import FlashcardSet
+from flashcards.core.pagination import KeysetPage, akeyset_page, page_request
+
+GENERATION_CACHE_KEY = 'flashcards:set_catalogue:generation'
+# Present for REPLICA_PIN_SECONDS after an invalidation, while replicas may lag.
+INVALIDATED_CACHE_KEY = 'flashcards:set_catalogue:invalidated'
+
+
+def _first_generation():
+    # Start from the clock rather than 1 so a flushed cache never reuses a
+    # generation that an old ETag was built from.
+    return int(time.time() * 1000)
+
+
+def catalogue_generation():
+    cache.add(GENERATION_CACHE_KEY, _first_generation(), None)
+    return cache.get(GENERATION_CACHE_KEY, 1)
+
+
+async def acatalogue_generation():
+    await cache.aadd(GENERATION_CACHE_KEY, _first_generation(), None)
+    return await cache.aget(GENERATION_CACHE_KEY, 1)
+
+
+def invalidate_catalogue():
+    """Retire every cached catalogue page by moving to a new generation."""
+    try:
+        cache.incr(GENERATION_CACHE_KEY)
+    except ValueError:
+        cache.add(GENERATION_CACHE_KEY, _first_generation(), None)
+    cache.set(INVALIDATED_CACHE_KEY, True, settings.REPLICA_PIN_SECONDS)
+
+
+async def aset_catalogue_page(request):
+    """Return the (id, name) page of FlashcardSets for the study set picker.
+
+    Pages are built lazily with akeyset_page() and cached per generation, so a
+    render only reaches the database after a set has been created, renamed
+    or deleted. Pages built right after that read from the primary, so they
+    never cache a list a lagging replica still returns.
+    """
+    window = page_request(request)
+    key = 'flashcards:set_catalogue:{}:{}:{}:{}'.format(
+        await acatalogue_generation(), window['size'], window['after'], window['before'],
+    )
+    cached = await cache.aget(key)
+    if cached is None:
+        queryset = FlashcardSet.objects.values('id', 'name')
+        if await cache.aget(INVALIDATED_CACHE_KEY):
+            queryset = queryset.using('default')
+        page = await akeyset_page(queryset, **window)
+        cached = (page.object_list, page.next_cursor, page.prev_cursor)
+        await cache.aset(key, cached, settings.SET_CATALOGUE_TTL)
+    object_list, next_cursor, prev_cursor = cached
+    return KeysetPage(object_list, window['size'], next_cursor=next_cursor, prev_cursor=prev_cursor,
+                      extra_query=window['extra_query'])
@@ -0,0 +1,86 @@
+from functools import wraps
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from flashcards.models import FlashcardSet
+from flashcards.core.catalogue import acatalogue_generation
+
+SAFE_METHODS = ('GET', 'HEAD')
+# The largest primary key the database can store; SQLite raises OverflowError
+# on bigger integers instead of finding no row.
+MAX_ID = 2 ** 63 - 1
+
+
+def lookup_data(request):
+    """The form data a lookup view reads: POST for the old forms, else GET."""
+    return request.POST if request.method == 'POST' else request.GET
+
+
+def parse_id(value):
+    """The primary key in a submitted field, or None if it can't name a row."""
+    try:
+        pk = int(value)
+    except (TypeError, ValueError):
+        return None
+    return pk if 0 < pk <= MAX_ID else None
+
+
+async def arequested_set(request, param):
+    """(id, updated_at) of the FlashcardSet named in the query string, or None."""
+    set_id = parse_id(request.GET.get(param))
+    if set_id is None:
+        return None
+    updated_at = await FlashcardSet.objects.filter(id=set_id).values_list('updated_at', flat=True).afirst()
+    return None if updated_at is None else (set_id, updated_at)
+
+
+def conditional(validators):
+    """django.views.decorators.http.condition() for async views.
+
+    ``validators`` is awaited with the request and returns (etag, last_modified),
+    either of which may be None. Only safe methods are validated, so POSTs never
+    pay for the extra query, and a match is answered before the view runs.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            if request.method not in SAFE_METHODS:
+                return await view(request, *args, **kwargs)
+            etag, last_modified = await validators(request)
+            etag = quote_etag(etag) if etag is not None else None
+            last_modified = int(last_modified.timestamp()) if last_modified is not None else None
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if last_modified and not response.has_header('Last-Modified'):
+                response.headers['Last-Modified'] = http_date(last_modified)
+            if etag:
+                response.headers.setdefault('ETag', etag)
+            return response
+        return inner
+    return decorator
+
+
+def set_conditional(param):
+    """Validate one set's page on FlashcardSet.updated_at, which card and
+    comment changes bump, so a stale page never matches."""
+    async def validators(request):
+        found = await arequested_set(request, param)
+        if found is None:
+            return None, None
+        return f"set-{found[0]}-{found[1].timestamp()}", found[1]
+    return conditional(validators)
+
+
+async def study_validators(request):
+    # The study page also lists the set catalogue, whose changes are tracked by
+    # a cache generation rather than a timestamp, so it only gets an ETag.
+    tag = f"study-{await acatalogue_generation()}"
+    if 'flashcard_set' in request.GET:
+        found = await arequested_set(request, 'flashcard_set')
+        if found is None:
+            return None, None
+        tag = f"{tag}-set-{found[0]}-{found[1].timestamp()}"
+    return tag, None
+
+
+study_conditional = conditional(study_validators)
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.http import HttpResponse
+from django.shortcuts import render
+from django.template.loader import render_to_string
+
+# Templates that render no data. With PRODUCTION_RENDERING on they are
+# rendered once per worker and served as bytes from then on.
+STATIC_PAGES = [
+    'index.html',
+    'success.html',
+    'user_hub.html',
+    'flashcard_set_hub.html',
+    'collection_hub.html',
+]
+
+_rendered = {}
+
+
+def prerender_pages():
+    for template_name in STATIC_PAGES:
+        try:
+            _rendered[template_name] = render_to_string(template_name).encode()
+        except ValueError:
+            # The hashed static file names are not known until build_assets
+            # has run (which itself starts the app); render on first request.
+            continue
+
+
+def static_page(request, template_name):
+    if not settings.PRODUCTION_RENDERING:
+        return render(request, template_name)
+    content = _rendered.get(template_name)
+    if content is None:
+        content = _rendered[template_name] = render_to_string(template_name).encode()
+    return HttpResponse(content)
@@ -0,0 +1,103 @@
+from urllib.parse import urlencode
+from django.conf import settings
+
+
+def _parse_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _key_of(item, key):
+    if isinstance(item, dict):
+        return item[key]
+    return getattr(item, key)
+
+
+def page_size_from(request):
+    size = _parse_int(request.GET.get('size'))
+    if size is None or size < 1:
+        return settings.PAGE_SIZE
+    return min(size, settings.MAX_PAGE_SIZE)
+
+
+class KeysetPage:
+    """One window of rows ordered by an ascending integer key.
+
+    Cursors are the key of the last (``next``) or first (``prev``) row on the
+    page, so fetching any page is an index range scan of ``size + 1`` rows.
+    """
+
+    def __init__(self, object_list, size, next_cursor=None, prev_cursor=None, extra_query=None):
+        self.object_list = object_list
+        self.size = size
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.extra_query = extra_query or {}
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    @property
+    def next_query(self):
+        return urlencode({**self.extra_query, 'after': self.next_cursor})
+
+    @property
+    def prev_query(self):
+        return urlencode({**self.extra_query, 'before': self.prev_cursor})
+
+
+def page_request(request):
+    """Return the akeyset_page() arguments requested in the query string."""
+    size = page_size_from(request)
+    return {
+        'size': size,
+        'after': _parse_int(request.GET.get('after')),
+        'before': _parse_int(request.GET.get('before')),
+        'extra_query': {'size': size} if 'size' in request.GET else {},
+    }
+
+
+def _window(queryset, size, after, before, key):
+    if before is not None:
+        return queryset.filter(**{f'{key}__lt': before}).order_by(f'-{key}')[:size + 1]
+    if after is not None:
+        queryset = queryset.filter(**{f'{key}__gt': after})
+    return queryset.order_by(key)[:size + 1]
+
+
+def _page_of(rows, size, after, before, key, extra_query):
+    has_more = len(rows) > size
+    if before is not None:
+        rows = rows[:size][::-1]
+        prev_cursor = _key_of(rows[0], key) if rows and has_more else None
+        next_cursor = _key_of(rows[-1], key) if rows else None
+    else:
+        rows = rows[:size]
+        next_cursor = _key_of(rows[-1], key) if rows and has_more else None
+        prev_cursor = _key_of(rows[0], key) if rows and after is not None else None
+    return KeysetPage(rows, size, next_cursor=next_cursor, prev_cursor=prev_cursor, extra_query=extra_query)
+
+
+async def akeyset_page(queryset, size, after=None, before=None, key='id', extra_query=None):
+    rows = [row async for row in _window(queryset, size, after, before, key)]
+    return _page_of(rows, size, after, before, key, extra_query)
+
+
+async def apaginate(request, queryset, key='id'):
+    return await akeyset_page(queryset, key=key, **page_request(request))
@@ -0,0 +1,53 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+
+SET_QUOTA_KEY = 'flashcards:quota:sets:{user_id}:{window}'
+
+
+def _incr(key, delta, timeout):
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        # First hit in this window. add() only succeeds for one caller; the
+        # others fall through to incr() and see its count.
+        if cache.add(key, delta, timeout):
+            return delta
+        return cache.incr(key, delta)
+
+
+def sliding_count(current, previous, elapsed, window):
+    """Estimate the hits in the last ``window`` seconds from two fixed windows.
+
+    The previous window's count is weighted by how much of it still overlaps
+    the sliding window, assuming its hits were spread evenly.
+    """
+    return current + previous * (window - elapsed) / window
+
+
+def take_set_quota(user, now=None):
+    """Reserve one flashcard set creation for ``user``; False once over the quota.
+
+    Counters live in the cache, one per user per fixed window, so a check is
+    an incr() and a get() rather than a COUNT(*) over FlashcardSet. The slot
+    is taken before the limit is compared and handed back if it was over, so
+    concurrent requests can't all pass a check they would fail together. That
+    holds across worker processes as long as the cache is shared and its
+    incr() is atomic (Redis, Memcached); LocMemCache counts per process.
+    """
+    if user.admin:
+        return True
+    limit = settings.SET_QUOTA_PER_DAY
+    window = settings.SET_QUOTA_WINDOW
+    now = time.time() if now is None else now
+    index, elapsed = divmod(now, window)
+    index = int(index)
+
+    key = SET_QUOTA_KEY.format(user_id=user.id, window=index)
+    # Each counter is read during its own window and the next one.
+    current = _incr(key, 1, window * 2)
+    previous = cache.get(SET_QUOTA_KEY.format(user_id=user.id, window=index - 1), 0)
+    if sliding_count(current, previous, elapsed, window) > limit:
+        cache.decr(key)
+        return False
+    return True
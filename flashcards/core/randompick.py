@@ -0,0 +1,45 @@
+import random
+from django.conf import settings
+from django.core.cache import cache
+from flashcards.models import Collection
+
+BOUNDS_CACHE_KEY = 'flashcards:collection_id_bounds'
+
+
+def collection_id_bounds(refresh=False):
+    bounds = None if refresh else cache.get(BOUNDS_CACHE_KEY)
+    if bounds is None:
+        # Two single-ended seeks: SQLite only applies its min/max index
+        # optimisation when the query has a single MIN() or MAX().
+        ids = Collection.objects.values_list('id', flat=True)
+        bounds = (ids.order_by('id').first(), ids.order_by('-id').first())
+        if bounds[0] is not None:
+            cache.set(BOUNDS_CACHE_KEY, bounds, settings.RANDOM_PICK_BOUNDS_TTL)
+    return bounds
+
+
+def random_collection(queryset=None):
+    """Pick a random Collection without reading the table.
+
+    Draws ids uniformly from the cached (min, max) id range and probes the
+    primary key index, retrying a few times on gaps left by deletes. If every
+    probe misses, the nearest existing id to a final draw is used instead.
+    """
+    if queryset is None:
+        queryset = Collection.objects.all()
+    low, high = collection_id_bounds()
+    if low is None:
+        return None
+
+    for _ in range(settings.RANDOM_PICK_ATTEMPTS):
+        found = queryset.filter(id=random.randint(low, high)).first()
+        if found is not None:
+            return found
+
+    candidate = random.randint(low, high)
+    found = queryset.filter(id__gte=candidate).order_by('id').first()
+    if found is None:
+        found = queryset.filter(id__lt=candidate).order_by('-id').first()
+    if found is None:
+        cache.delete(BOUNDS_CACHE_KEY)
+    return found
@@ -0,0 +1,72 @@
+from datetime import timedelta
+from django.utils import timezone
+from flashcards.models import DifficultyLevel, Flashcard, ReviewState
+
+MIN_EASE_FACTOR = 1.3
+# SM-2's first interval, in days. A lapsed card starts over from it whatever
+# its difficulty: the author's rating only seeds cards never reviewed.
+RELEARN_INTERVAL_DAYS = 1
+
+# (first interval, second interval, starting ease factor) in days, seeded from
+# the author's difficulty rating. Cards without a rating are treated as Medium.
+DIFFICULTY_SEEDS = {
+    DifficultyLevel.EASY: (3, 8, 2.6),
+    DifficultyLevel.MEDIUM: (1, 6, 2.5),
+    DifficultyLevel.HARD: (1, 4, 2.2),
+}
+DIFFICULTY_SEEDS.update({level.label: DIFFICULTY_SEEDS[level] for level in DifficultyLevel})
+
+
+def difficulty_seed(difficulty):
+    return DIFFICULTY_SEEDS.get(difficulty, DIFFICULTY_SEEDS[DifficultyLevel.MEDIUM])
+
+
+def enroll(user, flashcardset_id, now=None):
+    """Create due-now review states for every card in a set the user hasn't studied yet."""
+    now = now or timezone.now()
+    cards = Flashcard.objects.filter(flashcardset_id=flashcardset_id).values_list('id', 'difficulty')
+    states = [
+        ReviewState(user=user, flashcard_id=card_id, ease_factor=difficulty_seed(difficulty)[2], due_at=now)
+        for card_id, difficulty in cards.iterator()
+    ]
+    ReviewState.objects.bulk_create(states, batch_size=500, ignore_conflicts=True)
+
+
+def due_cards(user, limit, now=None):
+    """Return the next ``limit`` due review states, earliest first.
+
+    Served by the (user, due_at) index as a bounded range scan.
+    """
+    now = now or timezone.now()
+    return (
+        ReviewState.objects.filter(user=user, due_at__lte=now)
+        .order_by('due_at')
+        .select_related('flashcard')[:limit]
+    )
+
+
+def review(state, quality, now=None):
+    """Apply one SM-2 review graded 0-5 to ``state`` and save it."""
+    now = now or timezone.now()
+    first, second, _ = difficulty_seed(state.flashcard.difficulty)
+
+    if quality < 3:
+        state.repetitions = 0
+        state.interval_days = RELEARN_INTERVAL_DAYS
+    else:
+        if state.repetitions == 0:
+            state.interval_days = first if state.last_reviewed_at is None else RELEARN_INTERVAL_DAYS
+        elif state.repetitions == 1:
+            state.interval_days = second
+        else:
+            state.interval_days = round(state.interval_days * state.ease_factor)
+        state.repetitions += 1
+
+    state.ease_factor = max(
+        MIN_EASE_FACTOR,
+        state.ease_factor + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02),
+    )
+    state.last_reviewed_at = now
+    state.due_at = now + timedelta(days=state.interval_days)
+    state.save()
+    return state
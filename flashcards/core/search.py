@@ -0,0 +1,89 @@
+import re
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection, transaction
+from flashcards.models import Flashcard
+
+FTS_TABLE = 'flashcards_flashcard_fts'
+
+SEARCH_SQL = f"""
+    SELECT card.id, card.question, card.answer, card.difficulty, card.flashcardset_id, cardset.name,
+           -{FTS_TABLE}.rank
+    FROM {FTS_TABLE}
+    JOIN flashcards_flashcard AS card ON card.id = {FTS_TABLE}.rowid
+    LEFT JOIN flashcards_flashcardset AS cardset ON cardset.id = card.flashcardset_id
+    WHERE {FTS_TABLE} MATCH %s
+    ORDER BY {FTS_TABLE}.rank
+    LIMIT %s OFFSET %s
+"""
+
+REBUILD_CHUNK_SQL = f"""
+    INSERT OR REPLACE INTO {FTS_TABLE} (rowid, question, answer, set_name)
+    SELECT card.id, card.question, card.answer, cardset.name
+    FROM flashcards_flashcard AS card
+    LEFT JOIN flashcards_flashcardset AS cardset ON cardset.id = card.flashcardset_id
+    WHERE card.id > %s AND card.id <= %s
+"""
+
+RESULT_FIELDS = ['id', 'question', 'answer', 'difficulty', 'set_id', 'set_name', 'score']
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def match_expression(query):
+    """Turn free text into an FTS5 query: every word must match, the last as a prefix.
+
+    Words are quoted, so FTS5 operators and punctuation in user input are
+    matched literally instead of raising syntax errors.
+    """
+    terms = TERM_RE.findall(query)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def search_cards(query, size, offset=0):
+    """Return up to ``size`` cards matching ``query``, best match first.
+
+    On SQLite this is a BM25-ranked lookup in the FTS5 index. Other backends
+    rank with their own full-text functions, which is correct but unindexed.
+    """
+    if connection.vendor != 'sqlite':
+        return _search_unindexed(query, size, offset)
+    expression = match_expression(query)
+    if expression is None:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(SEARCH_SQL, [expression, size, offset])
+        return [dict(zip(RESULT_FIELDS, row)) for row in cursor.fetchall()]
+
+
+def _search_unindexed(query, size, offset):
+    vector = (
+        SearchVector('question', weight='A')
+        + SearchVector('answer', weight='B')
+        + SearchVector('flashcardset__name', weight='C')
+    )
+    search = SearchQuery(query, search_type='websearch')
+    rows = (
+        Flashcard.objects.annotate(document=vector, score=SearchRank(vector, search))
+        .filter(document=search)
+        .order_by('-score', 'id')
+        .values_list('id', 'question', 'answer', 'difficulty', 'flashcardset_id', 'flashcardset__name', 'score')
+    )[offset:offset + size]
+    return [dict(zip(RESULT_FIELDS, row)) for row in rows]
+
+
+def rebuild_index(chunk_size=50000, progress=None):
+    """Refill the FTS5 index from the flashcard table in primary key ranges."""
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT MAX(id) FROM flashcards_flashcard')
+        highest = cursor.fetchone()[0] or 0
+        with transaction.atomic():
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            for start in range(0, highest, chunk_size):
+                cursor.execute(REBUILD_CHUNK_SQL, [start, start + chunk_size])
+                if progress is not None:
+                    progress(min(start + chunk_size, highest), highest)
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
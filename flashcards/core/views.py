@@ -1,74 +1,118 @@
 #from django.http import JsonResponse
-import random
 import json
+from itertools import zip_longest
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponseForbidden
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from django.http import HttpResponse, HttpResponseForbidden
 from django.core.exceptions import ValidationError
 from flashcards.models import User
 from flashcards.models import Flashcard
 from flashcards.models import FlashcardSet
 from flashcards.models import Comment
 from flashcards.models import Collection
-from flashcards.models import DifficultyLevel
+from flashcards.core.pagination import apaginate
+from flashcards.core.catalogue import aset_catalogue_page
+from flashcards.core.cards import batch_too_large, batch_too_large_message, create_cards, validate_cards
+from flashcards.core.randompick import random_collection as pick_random_collection
+from flashcards.core.conditional import lookup_data, parse_id, set_conditional, study_conditional
+from flashcards.core.pages import static_page
+from flashcards.routers import recently_written
+from flashcards.core.quota import take_set_quota
 
 def index(request):
-    return render(request, "index.html")
+    return static_page(request, "index.html")
 
-def list_users(request):
-    udata = list(User.objects.values('id', 'username', 'admin'))
-    ujson_data = json.dumps(udata)
-    return render(request, 'list_users.html', {'listuserdata_json': ujson_data})
+# The read views below are async and use the async ORM, so under ASGI they
+# run on the event loop instead of holding a worker thread. Everything a
+# template touches is loaded before render(), which must not hit the database.
 
-def list_sets(request):
+async def list_users(request):
+    page = await apaginate(request, User.objects.values('id', 'username', 'admin'))
+    ujson_data = json.dumps(page.object_list)
+    return render(request, 'list_users.html', {'listuserdata_json': ujson_data, 'page': page})
+
+async def list_sets(request):
     flashcard_sets = None
     if request.method == 'POST':
         user_id = request.POST.get('user_id')
         try:
-            flashcard_sets = FlashcardSet.objects.get(author_id=user_id)
-        except FlashcardSet.DoesNotExist:
+            flashcard_sets = [s async for s in FlashcardSet.objects.filter(author_id=user_id).order_by('id')] or None
+        except ValueError:
             flashcard_sets = None
     return render(request, 'flashcard_set_list.html', {'flashcard_sets': flashcard_sets})
 
-def list_collections(request):
+async def list_collections(request):
     collectionsets = None
     if request.method == 'POST':
         user_id = request.POST.get('user_id')
         try:
-            collectionsets = Collection.objects.get(author_id=user_id)
-        except Collection.DoesNotExist:
+            collectionsets = [
+                c async for c in Collection.objects.filter(author_id=user_id)
+                .select_related('flashcardset', 'author', 'comment')
+                .order_by('id')
+            ] or None
+        except ValueError:
             collectionsets = None
     return render(request, 'list_collections.html', {'collectionsets': collectionsets})
 
-def list_all_collections(request):
-    collections = Collection.objects.all()
-    return render(request, 'get_collections.html', {'collections': collections})
+async def list_all_collections(request):
+    collections = await apaginate(request, Collection.objects.select_related('flashcardset', 'author', 'comment'))
+    return render(request, 'get_collections.html', {'collections': collections, 'page': collections})
 
-def search_id(request):
+async def search_id(request):
     user = None
     if request.method == 'POST':
         user_id = request.POST.get('user_id')
         try:
-            user = User.objects.get(id=user_id)
+            user = await User.objects.aget(id=user_id)
         except User.DoesNotExist:
             user = None
     return render(request, 'user_by_id.html', {'user': user})
 
-def search_set(request):
+@set_conditional('set_id')
+async def search_set(request):
     reqset = None
-    if request.method == 'POST':
-        set_id = request.POST.get('set_id')
+    cards_html = None
+    data = lookup_data(request)
+    set_id = parse_id(data.get('set_id'))
+    if set_id is not None:
         try:
-            reqset = FlashcardSet.objects.get(id=set_id)
+            reqset = await (
+                FlashcardSet.objects.select_related('author')
+                .prefetch_related(Prefetch('comments', queryset=Comment.objects.select_related('author').order_by('id')))
+                .aget(id=set_id)
+            )
         except FlashcardSet.DoesNotExist:
             reqset = None
-    return render(request, 'sets_by_id.html', {'reqset': reqset})
-
-def search_col(request):
+        if reqset is not None:
+            cards_html = await set_cards_fragment(reqset)
+    return render(request, 'sets_by_id.html', {'reqset': reqset, 'cards_html': cards_html, 'submitted': 'set_id' in data})
+
+async def set_cards_fragment(reqset):
+    # The card list is cached per set and updated_at, which card changes bump,
+    # so the cards are only read when the set has changed. Right after a change
+    # they are read from the primary, which replicas may still lag behind.
+    key = f'flashcards:set_cards:{reqset.id}:{reqset.updated_at.isoformat()}'
+    fragment = await cache.aget(key)
+    if fragment is None:
+        cards = Flashcard.objects.filter(flashcardset=reqset).order_by('id')
+        if recently_written(reqset.updated_at):
+            cards = cards.using('default')
+        cards = [card async for card in cards]
+        fragment = render_to_string('set_cards.html', {'cards': cards})
+        await cache.aset(key, str(fragment), settings.SET_CARDS_FRAGMENT_TTL)
+    return mark_safe(fragment)
+
+async def search_col(request):
     collectionsets = None
     if request.method == 'POST':
         col_id = request.POST.get('col_id')
         try:
-            collectionsets = Collection.objects.get(id=col_id)
+            collectionsets = await Collection.objects.select_related('flashcardset', 'author', 'comment').aget(id=col_id)
         except Collection.DoesNotExist:
             collectionsets = None
     return render(request, 'collections_by_id.html', {'collectionsets': collectionsets})
@@ -107,11 +151,12 @@ def create_flashcard_set(request):
              return HttpResponseForbidden("Forbidden: You cannot create a new set without a valid user id or set name.")
 
         try:
-            user = User.objects.get(id=user_id)
+            author = User.objects.get(id=user_id)
         except User.DoesNotExist:
             return HttpResponseForbidden("Forbidden: You cannot create a new set without a valid user id or set name.")
-            
-        author = get_object_or_404(User, id=user_id)
+
+        if not take_set_quota(author):
+            return HttpResponse("Too Many Requests: You have reached the maximum number of flashcard sets allowed today.", status=429)
 
         set_input = FlashcardSet(name=set_name, author=author)
         set_input.save()
@@ -138,6 +183,14 @@ def create_collection(request):
         return redirect('success')
     return render(request, 'create_collection.html')
 
+def card_rows_from_post(post):
+    rows = zip_longest(post.getlist('question'), post.getlist('answer'), post.getlist('difficulty'), fillvalue='')
+    return [
+        {'question': question, 'answer': answer, 'difficulty': difficulty}
+        for question, answer, difficulty in rows
+        if question or answer or difficulty
+    ]
+
 def create_flashcards(request):
     reqset = None
     if request.method == 'POST':
@@ -151,19 +204,18 @@ def create_flashcards(request):
             return HttpResponseForbidden("Forbidden: Cannot add cards to a non-existent set.")
         
         if 'add' in request.POST:
-            question = request.POST.get('question')
-            answer = request.POST.get('answer')
-            difficulty = request.POST.get('difficulty')
-
-            if not question or not answer or not difficulty:
+            rows = card_rows_from_post(request.POST)
+            if not rows:
                 return HttpResponseForbidden("Forbidden: Cannot create a new flashcard without a question, answer, or difficulty.")
-                
-            valid_difficulties = {choice[0]: choice[1] for choice in DifficultyLevel.choices}
-            if difficulty not in valid_difficulties.keys() and difficulty not in valid_difficulties.values():
-                return HttpResponseForbidden("Forbidden: You must enter a valid difficulty.")
-                
-            card_input = Flashcard(question=question, answer=answer, difficulty=difficulty, flashcardset=reqset)
-            card_input.save()
+            if batch_too_large(rows):
+                return HttpResponseForbidden(f"Forbidden: {batch_too_large_message()}")
+
+            cards, errors = validate_cards(rows)
+            if errors:
+                messages = [f"Card {index + 1}: {' '.join(row_errors)}" for index, row_errors in errors.items()]
+                return HttpResponseForbidden("Forbidden: " + " ".join(messages))
+
+            create_cards(reqset, cards)
             return redirect('success')
         return render(request, 'create_flashcards.html', {'reqset': reqset})
     return render(request, 'create_flashcards.html', {'reqset': reqset})
@@ -292,44 +344,46 @@ def comment_set(request):
             return HttpResponseForbidden("Forbidden. Invalid input.")
     return render(request, 'post_comment.html', {'reqset': reqset})
 
-def search_flashcard(request):
-    reqcard = None
-    if request.method == 'POST':
-        set_id = request.POST.get('set_id')
-        try:
-            reqcard = Flashcard.objects.get(flashcardset_id=set_id)
-        except Flashcard.DoesNotExist:
-            reqcard = None
-    return render(request, 'get_flashcards.html', {'reqcard': reqcard})
+@set_conditional('set_id')
+async def search_flashcard(request):
+    reqcards = None
+    data = lookup_data(request)
+    set_id = parse_id(data.get('set_id'))
+    if set_id is not None:
+        reqcards = [card async for card in Flashcard.objects.filter(flashcardset_id=set_id).order_by('id')] or None
+    return render(request, 'get_flashcards.html', {'reqcards': reqcards, 'submitted': 'set_id' in data})
 
 def random_collection(request):
-    collections = Collection.objects.all()
-    random_col = random.choice(collections) if collections else None
+    random_col = pick_random_collection(Collection.objects.select_related('flashcardset', 'author', 'comment'))
     return render(request, 'random_collection.html', {'collection': random_col})
 
-def study_flashcards(request):
-    flashcard_sets = FlashcardSet.objects.all()
+@study_conditional
+async def study_flashcards(request):
+    flashcard_sets = await aset_catalogue_page(request)
     flashcards = None
 
-    if request.method == 'POST':
-        selected_set_id = request.POST.get('flashcard_set')
-        try:
-            flashcards = Flashcard.objects.filter(flashcardset_id=selected_set_id)
-        except Flashcard.DoesNotExist:
-            flashcards = None
+    data = lookup_data(request)
+    selected_set_id = parse_id(data.get('flashcard_set'))
+    if selected_set_id is not None:
+        flashcards = [card async for card in Flashcard.objects.filter(flashcardset_id=selected_set_id)]
     
-    return render(request, 'study_flashcards.html', {'flashcard_sets': flashcard_sets, 'flashcards': flashcards,})
+    # The picker submits by GET, so it carries the current page window along.
+    page_params = [(name, request.GET[name]) for name in ('size', 'after', 'before') if name in request.GET]
+    return render(request, 'study_flashcards.html', {
+        'flashcard_sets': flashcard_sets, 'flashcards': flashcards, 'page': flashcard_sets, 'page_params': page_params,
+        'submitted': 'flashcard_set' in data,
+    })
 
     #return render(request, 'study_flashcards.html', {'flashcard_sets': flashcard_sets})
 
 def success(request):
-    return render(request, 'success.html')
+    return static_page(request, 'success.html')
 
 def userhub(request):
-    return render(request, 'user_hub.html')
+    return static_page(request, 'user_hub.html')
 
 def sethub(request):
-    return render(request, 'flashcard_set_hub.html')
+    return static_page(request, 'flashcard_set_hub.html')
 
 def collectionhub(request):
-    return render(request, 'collection_hub.html')
\ No newline at end of file
+    return static_page(request, 'collection_hub.html')
\ No newline at end of file
@@ -0,0 +1,213 @@
+import json
+import re
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+from flashcards.models import User, FlashcardSet, Flashcard, Comment, Collection, ReviewState
+
+SCAN_RE = re.compile(r'^SCAN (?:TABLE )?"?(\w+)"?(.*)$')
+LIMIT_RE = re.compile(r'\bLIMIT \d+\s*$')
+COLUMN_RE = re.compile(r'"(\w+)"\."(\w+)"\s*(?:=|<|>|<=|>=|IN\b|IS\b)')
+EXPLAINABLE = ('SELECT', 'UPDATE', 'DELETE')
+# Views that stream a whole table by design.
+FULL_EXPORT_VIEWS = {'api_sets'}
+
+
+class Command(BaseCommand):
+    help = ("Run every view in flashcards/core/views.py and flashcards/core/api.py against a seeded "
+            "database, EXPLAIN each statement and fail on full scans of large tables or on views "
+            "that raise. Seeded rows are rolled back afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000, help="Rows to seed per table.")
+        parser.add_argument('--large-table', type=int, default=500,
+                            help="Tables with at least this many rows count as large.")
+        parser.add_argument('--json', action='store_true', help="Print the findings as JSON.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("audit_query_plans reads SQLite's EXPLAIN QUERY PLAN output.")
+
+        # A dummy cache makes every cached read fall through to the database
+        # without touching the real cache.
+        dummy_cache = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+        with override_settings(CACHES=dummy_cache), transaction.atomic():
+            fixtures = self.seed(options['rows'])
+            sizes = self.table_sizes()
+            findings, errors = self.audit(fixtures, sizes, options['large_table'])
+            transaction.set_rollback(True)
+
+        if options['json']:
+            self.stdout.write(json.dumps({'findings': findings, 'errors': errors}, indent=2))
+        else:
+            for error in errors:
+                self.stdout.write(self.style.ERROR(f"{error['view']}: raised {error['error']}"))
+            for finding in findings:
+                self.stdout.write(self.style.ERROR(
+                    f"{finding['view']}: {finding['detail']} ({finding['rows']} rows)"
+                ))
+                self.stdout.write(f"    {finding['sql']}")
+                if finding['suggested_index']:
+                    self.stdout.write(f"    suggested index: {finding['suggested_index']}")
+        # A view that raised was not audited past the error, so it fails the run too.
+        problems = []
+        if findings:
+            problems.append(f"{len(findings)} full table scan(s) found")
+        if errors:
+            problems.append(f"{len(errors)} view(s) raised")
+        if problems:
+            raise CommandError('; '.join(problems) + '.')
+        self.stdout.write(self.style.SUCCESS("No full scans of large tables found."))
+
+    def seed(self, rows):
+        probe = User.objects.create(username='audit', password='audit')
+        probe_set = FlashcardSet.objects.create(name='audit set', author=probe)
+        probe_comment = Comment.objects.create(comment='audit', author=probe, flashcardset=probe_set)
+        probe_collection = Collection.objects.create(
+            name='audit collection', author=probe, flashcardset=probe_set, comment=probe_comment,
+        )
+        users = User.objects.bulk_create(User(username=f'user {i}', password='x') for i in range(rows))
+        sets = FlashcardSet.objects.bulk_create(
+            FlashcardSet(name=f'set {i}', author=users[i % len(users)]) for i in range(rows)
+        )
+        cards = Flashcard.objects.bulk_create(
+            Flashcard(question=f'q {i}', answer=f'a {i}', difficulty='Easy', flashcardset=sets[i % len(sets)])
+            for i in range(rows)
+        )
+        Flashcard.objects.bulk_create(
+            Flashcard(question=f'q {i}', answer=f'a {i}', difficulty='Hard', flashcardset=probe_set)
+            for i in range(10)
+        )
+        comments = Comment.objects.bulk_create(
+            Comment(comment=f'c {i}', author=users[i % len(users)], flashcardset=sets[i % len(sets)])
+            for i in range(rows)
+        )
+        Collection.objects.bulk_create(
+            Collection(name=f'col {i}', author=users[i % len(users)], flashcardset=sets[i % len(sets)],
+                       comment=comments[i % len(comments)])
+            for i in range(rows)
+        )
+        ReviewState.objects.bulk_create(
+            ReviewState(user=users[i % len(users)], flashcard=cards[i], due_at=timezone.now())
+            for i in range(rows)
+        )
+        return {'user': probe, 'set': probe_set, 'collection': probe_collection}
+
+    def scenarios(self, fixtures):
+        user_id = fixtures['user'].id
+        set_id = fixtures['set'].id
+        col_id = fixtures['collection'].id
+        return [
+            ('GET', reverse('index'), {}),
+            ('GET', reverse('list_users'), {}),
+            ('POST', reverse('submit_form'), {'username': 'audit2', 'password': 'audit2'}),
+            ('POST', reverse('search_id'), {'user_id': user_id}),
+            ('POST', reverse('search_user'), {'user_id': user_id, 'username': 'audit3', 'update': ''}),
+            ('POST', reverse('list_sets'), {'user_id': user_id}),
+            ('POST', reverse('create_flashcard_set'), {'user_id': user_id, 'set_name': 'audit'}),
+            ('POST', reverse('search_set'), {'set_id': set_id}),
+            ('POST', reverse('update_set'), {'set_id': set_id, 'name': 'audit', 'update': ''}),
+            ('POST', reverse('comment_set'), {'set_id': set_id, 'comment': 'audit', 'author': user_id}),
+            ('POST', reverse('search_flashcard'), {'set_id': set_id}),
+            ('POST', reverse('list_collections'), {'user_id': user_id}),
+            ('POST', reverse('search_col'), {'col_id': col_id}),
+            ('POST', reverse('update_collection'), {'col_id': col_id, 'name': 'audit', 'update': ''}),
+            ('POST', reverse('create_collection'), {'colname': 'audit', 'user_id': user_id}),
+            ('GET', reverse('list_all_collections'), {}),
+            ('GET', reverse('random_collection'), {}),
+            ('POST', reverse('create_flashcards'), {'set_id': set_id, 'question': 'q', 'answer': 'a',
+                                                    'difficulty': 'Easy', 'add': ''}),
+            ('GET', reverse('study_flashcards'), {}),
+            ('POST', reverse('study_flashcards'), {'flashcard_set': set_id}),
+            ('GET', reverse('api_search'), {'q': 'q 1'}),
+            ('GET', reverse('api_sets'), {}),
+            ('GET', reverse('api_set_cards', args=[set_id]), {}),
+            ('GET', reverse('api_random_collection'), {}),
+            ('GET', reverse('api_collection', args=[col_id]), {}),
+            ('GET', reverse('api_due_cards', args=[user_id]), {}),
+            ('POST', reverse('api_study_set', args=[user_id, set_id]), {}),
+            ('POST', reverse('delete_collection'), {'col_id': col_id}),
+            ('POST', reverse('delete_set'), {'set_id': set_id}),
+            ('POST', reverse('delete_user'), {'id': user_id}),
+        ]
+
+    def table_sizes(self):
+        sizes = {}
+        with connection.cursor() as cursor:
+            for table in connection.introspection.table_names(cursor):
+                cursor.execute(f'SELECT COUNT(*) FROM "{table}"')
+                sizes[table] = cursor.fetchone()[0]
+        return sizes
+
+    def audit(self, fixtures, sizes, large_table):
+        factory = RequestFactory()
+        findings = []
+        errors = []
+        for method, path, data in self.scenarios(fixtures):
+            match = resolve(path)
+            request = factory.post(path, data) if method == 'POST' else factory.get(path, data)
+            with transaction.atomic(), CaptureQueriesContext(connection) as captured:
+                try:
+                    view = match.func
+                    if iscoroutinefunction(view):
+                        view = async_to_sync(view)
+                    response = view(request, *match.args, **match.kwargs)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                except Exception as e:
+                    errors.append({'view': match.url_name, 'error': repr(e)})
+                transaction.set_rollback(True)
+
+            if match.url_name in FULL_EXPORT_VIEWS:
+                continue
+            for query in captured.captured_queries:
+                sql = query['sql']
+                if not sql.lstrip().upper().startswith(EXPLAINABLE):
+                    continue
+                # A LIMITed read with no WHERE clause stops after LIMIT rows,
+                # even though SQLite reports it as a SCAN.
+                if ' WHERE ' not in sql.upper() and LIMIT_RE.search(sql):
+                    continue
+                for detail in self.explain(sql):
+                    scan = SCAN_RE.match(detail)
+                    if scan is None or sizes.get(scan.group(1), 0) < large_table:
+                        continue
+                    # Virtual tables (the FTS5 index) report lookups through
+                    # their own index as a SCAN.
+                    if ' VIRTUAL TABLE INDEX ' in detail:
+                        continue
+                    table = scan.group(1)
+                    findings.append({
+                        'view': match.url_name,
+                        'detail': detail,
+                        'rows': sizes[table],
+                        'sql': sql,
+                        'suggested_index': self.suggest_index(table, sql),
+                    })
+        return findings, errors
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def suggest_index(self, table, sql):
+        where = sql.upper().find(' WHERE ')
+        if where < 0:
+            return None
+        columns = []
+        for column_table, column in COLUMN_RE.findall(sql[where:]):
+            if column_table == table and column not in columns:
+                columns.append(column)
+        if not columns:
+            return None
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, table)
+        for constraint in constraints.values():
+            if constraint['index'] and constraint['columns'][:len(columns)] == columns:
+                return None
+        return f"{table}({', '.join(columns)})"
@@ -0,0 +1,106 @@
+import multiprocessing
+import statistics
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from flashcards.models import FlashcardSet, User
+from flashcards.core.quota import SET_QUOTA_KEY, take_set_quota
+
+BATCH_SIZE = 5000
+
+
+def quota_keys(user_ids):
+    """The counters take_set_quota() may have touched for user_ids around now."""
+    index = int(time.time() // settings.SET_QUOTA_WINDOW)
+    return [SET_QUOTA_KEY.format(user_id=user_id, window=window)
+            for user_id in user_ids for window in range(index - 2, index + 1)]
+
+
+def worker(user_id, attempts, results):
+    # Forked workers must not share the parent's cache client connections.
+    caches.close_all()
+    user = User(id=user_id, admin=False)
+    results.put(sum(take_set_quota(user) for _ in range(attempts)))
+
+
+class Command(BaseCommand):
+    help = ("Time the cached set quota check against a COUNT(*) over today's sets, then "
+            "race several processes at one user's quota to check the limit holds across "
+            "workers. Rows are created inside a transaction that is rolled back afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sets', type=int, default=100000, help="FlashcardSets to seed.")
+        parser.add_argument('--samples', type=int, default=2000)
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--attempts', type=int, default=50, help="Quota checks per worker.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            users = User.objects.bulk_create(User(username=f'bench {i}', password='bench') for i in range(100))
+            for start in range(0, options['sets'], BATCH_SIZE):
+                FlashcardSet.objects.bulk_create(
+                    FlashcardSet(name='bench', author=users[i % len(users)])
+                    for i in range(start, min(start + BATCH_SIZE, options['sets']))
+                )
+            quota = self.time_quota(users, options['samples'])
+            count = self.time_count(users, options['samples'])
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"{'check':<26} {'p50':>10} {'p99':>10}")
+        for label, timings in (('cached sliding window', quota), ('COUNT(*) of last 24h', count)):
+            p50 = statistics.median(timings)
+            p99 = statistics.quantiles(timings, n=100)[98]
+            self.stdout.write(f"{label:<26} {p50:>8.3f}ms {p99:>8.3f}ms")
+        self.race(options['workers'], options['attempts'])
+
+    def time_quota(self, users, samples):
+        # Only the benchmark's own counters are reset; the ids of the rolled
+        # back users are handed out again to real ones.
+        user_ids = [user.id for user in users]
+        cache.delete_many(quota_keys(user_ids))
+        timings = []
+        try:
+            for i in range(samples):
+                user = users[i % len(users)]
+                start = time.perf_counter()
+                take_set_quota(user)
+                timings.append((time.perf_counter() - start) * 1000)
+        finally:
+            cache.delete_many(quota_keys(user_ids))
+        return timings
+
+    def time_count(self, users, samples):
+        timings = []
+        for i in range(samples):
+            user = users[i % len(users)]
+            start = time.perf_counter()
+            FlashcardSet.objects.filter(author=user, created_at__gte=timezone.now() - timedelta(days=1)).count()
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
+
+    def race(self, workers, attempts):
+        # User id 0 is never assigned, so its counters are the benchmark's own.
+        cache.delete_many(quota_keys([0]))
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        processes = [context.Process(target=worker, args=(0, attempts, results)) for _ in range(workers)]
+        for process in processes:
+            process.start()
+        admitted = sum(results.get() for _ in processes)
+        for process in processes:
+            process.join()
+        cache.delete_many(quota_keys([0]))
+
+        limit = settings.SET_QUOTA_PER_DAY
+        message = f"{workers} workers x {attempts} attempts on one user: {admitted} admitted, limit {limit}."
+        if admitted == limit:
+            self.stdout.write(self.style.SUCCESS(message))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f"{message} {settings.CACHES['default']['BACKEND']} is not shared between processes "
+                "or its incr() is not atomic; use Redis or Memcached."
+            ))
@@ -0,0 +1,71 @@
+import random
+import statistics
+import time
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from flashcards.models import Collection, User
+from flashcards.core.randompick import BOUNDS_CACHE_KEY, random_collection
+
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = ("Benchmark the random collection picker against table size. "
+            "Rows are created inside a transaction that is rolled back afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10**3, 10**5, 10**6])
+        parser.add_argument('--samples', type=int, default=1000)
+        parser.add_argument('--gap-ratio', type=float, default=0.1,
+                            help="Fraction of rows deleted at random to leave id gaps.")
+        parser.add_argument('--legacy-max', type=int, default=10**5,
+                            help="Largest size at which random.choice(Collection.objects.all()) is also timed.")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'rows':>10} {'picker p50':>12} {'picker p99':>12} {'legacy p50':>12}")
+        with transaction.atomic():
+            author = User.objects.create(username='bench', password='bench')
+            for size in sorted(options['sizes']):
+                self.fill(size, author, options['gap_ratio'])
+                cache.delete(BOUNDS_CACHE_KEY)
+                p50, p99 = self.time_picker(options['samples'])
+                legacy = self.time_legacy() if size <= options['legacy_max'] else None
+                self.stdout.write(
+                    f"{Collection.objects.count():>10} {p50:>10.3f}ms {p99:>10.3f}ms "
+                    f"{f'{legacy:.3f}ms' if legacy is not None else '-':>12}"
+                )
+            transaction.set_rollback(True)
+
+    def fill(self, size, author, gap_ratio):
+        target = size - Collection.objects.count()
+        if target <= 0:
+            return
+        total = int(target / (1 - gap_ratio))
+        created = []
+        for start in range(0, total, BATCH_SIZE):
+            batch = [Collection(name=f"bench {start + i}", author=author) for i in range(min(BATCH_SIZE, total - start))]
+            created.extend(c.id for c in Collection.objects.bulk_create(batch))
+        doomed = random.sample(created, len(created) - target)
+        for start in range(0, len(doomed), 900):
+            Collection.objects.filter(id__in=doomed[start:start + 900]).delete()
+
+    def time_picker(self, samples):
+        queryset = Collection.objects.only('id')
+        random_collection(queryset)
+        timings = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            random_collection(queryset)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        return statistics.median(timings), timings[int(len(timings) * 0.99) - 1]
+
+    def time_legacy(self, samples=5):
+        timings = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            collections = Collection.objects.all()
+            random.choice(collections) if collections else None
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
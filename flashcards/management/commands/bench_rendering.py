@@ -0,0 +1,45 @@
+import statistics
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.template import Context, Engine, engines
+from django.test import RequestFactory, override_settings
+from flashcards.core.pages import STATIC_PAGES, static_page
+
+
+class Command(BaseCommand):
+    help = ("Time the data-free pages three ways: compiling and rendering the template on every request, "
+            "rendering through the cached template loader, and serving the bytes pre-rendered by "
+            "PRODUCTION_RENDERING.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--samples', type=int, default=2000)
+        parser.add_argument('--template-dir', default=str(settings.TEMPLATES[0]['DIRS'][0]),
+                            help="Template directory for the first two columns, e.g. an older checkout.")
+
+    def handle(self, *args, **options):
+        samples = options['samples']
+        libraries = engines['django'].engine.libraries
+        filesystem = [('django.template.loaders.filesystem.Loader', [options['template_dir']])]
+        uncached = Engine(loaders=filesystem, libraries=libraries)
+        cached = Engine(loaders=[('django.template.loaders.cached.Loader', filesystem)], libraries=libraries)
+        request = RequestFactory().get('/')
+
+        self.stdout.write(f"{'template':<24} {'compile+render':>15} {'cached loader':>14} {'pre-rendered':>13}")
+        for template_name in STATIC_PAGES:
+            compile_render = self.time(samples, lambda: uncached.get_template(template_name).render(Context()))
+            cached_render = self.time(samples, lambda: cached.get_template(template_name).render(Context()))
+            with override_settings(PRODUCTION_RENDERING=True):
+                prerendered = self.time(samples, lambda: static_page(request, template_name))
+            self.stdout.write(
+                f"{template_name:<24} {compile_render:>13.1f}us {cached_render:>12.1f}us {prerendered:>11.1f}us"
+            )
+
+    def time(self, samples, func):
+        func()
+        timings = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 10**6)
+        return statistics.median(timings)
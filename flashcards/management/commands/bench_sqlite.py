@@ -0,0 +1,113 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+# The search index comes along so writes pay for its triggers as they do in production.
+TABLES = ['flashcards_user', 'flashcards_flashcardset', 'flashcards_flashcard', 'flashcards_flashcard_fts']
+READ_SQL = 'SELECT id, question, answer, difficulty FROM flashcards_flashcard WHERE flashcardset_id = ?'
+WRITE_SQL = "INSERT INTO flashcards_flashcard (question, answer, difficulty, flashcardset_id) VALUES ('q', 'a', 'Easy', ?)"
+
+
+def connect(path, pragmas, timeout):
+    db = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+    for pragma, value in pragmas.items():
+        db.execute(f'PRAGMA {pragma} = {value}')
+    return db
+
+
+def worker(path, pragmas, timeout, persistent, write_ratio, sets, deadline, results):
+    rng = random.Random(os.getpid())
+    done = locked = 0
+    db = connect(path, pragmas, timeout) if persistent else None
+    while time.monotonic() < deadline:
+        # Without persistent connections every request opens its own.
+        conn = db or connect(path, pragmas, timeout)
+        try:
+            if rng.random() < write_ratio:
+                conn.execute(WRITE_SQL, (rng.randint(1, sets),))
+            else:
+                conn.execute(READ_SQL, (rng.randint(1, sets),)).fetchall()
+            done += 1
+        except sqlite3.OperationalError:
+            locked += 1
+        finally:
+            if db is None:
+                conn.close()
+    results.put((done, locked))
+
+
+class Command(BaseCommand):
+    help = ("Benchmark mixed read/write throughput on a scratch copy of the flashcard tables, "
+            "with SQLite's defaults and a new connection per request versus SQLITE_PRAGMAS "
+            "and persistent connections.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--write-ratio', type=float, default=0.2)
+        parser.add_argument('--sets', type=int, default=1000)
+        parser.add_argument('--cards', type=int, default=50000)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("bench_sqlite needs the SQLite backend.")
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT sql FROM sqlite_master WHERE tbl_name IN ({', '.join('%s' for _ in TABLES)}) AND sql IS NOT NULL",
+                TABLES,
+            )
+            schema = [row[0] for row in cursor.fetchall()]
+        if not schema:
+            raise CommandError("Run migrate first; the schema is copied from the default database.")
+
+        timeout = settings.DATABASES['default'].get('OPTIONS', {}).get('timeout', 5)
+        profiles = [
+            ('defaults, reconnect', {'journal_mode': 'DELETE', 'synchronous': 'FULL'}, False),
+            ('SQLITE_PRAGMAS, persistent', settings.SQLITE_PRAGMAS, True),
+        ]
+        self.stdout.write(f"{'profile':<30} {'ops/s':>10} {'locked':>8}")
+        for label, pragmas, persistent in profiles:
+            with tempfile.TemporaryDirectory() as scratch:
+                path = os.path.join(scratch, 'bench.sqlite3')
+                self.seed(path, schema, options['sets'], options['cards'])
+                done, locked = self.run(path, pragmas, timeout, persistent, options)
+            self.stdout.write(f"{label:<30} {done / options['seconds']:>10.0f} {locked:>8}")
+
+    def seed(self, path, schema, sets, cards):
+        db = sqlite3.connect(path)
+        for statement in schema:
+            db.execute(statement)
+        db.execute("INSERT INTO flashcards_user (id, username, password, admin) VALUES (1, 'bench', 'bench', 0)")
+        db.executemany(
+            "INSERT INTO flashcards_flashcardset (id, name, author_id, created_at, updated_at) "
+            "VALUES (?, 'bench', 1, datetime('now'), datetime('now'))",
+            ((i,) for i in range(1, sets + 1)),
+        )
+        db.executemany(
+            WRITE_SQL.replace("'q', 'a'", '?, ?'),
+            ((f'q{i}', f'a{i}', i % sets + 1) for i in range(cards)),
+        )
+        db.commit()
+        db.close()
+
+    def run(self, path, pragmas, timeout, persistent, options):
+        results = multiprocessing.Queue()
+        deadline = time.monotonic() + options['seconds']
+        processes = [
+            multiprocessing.Process(target=worker, args=(
+                path, pragmas, timeout, persistent, options['write_ratio'], options['sets'], deadline, results,
+            ))
+            for _ in range(options['workers'])
+        ]
+        for process in processes:
+            process.start()
+        totals = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        return sum(done for done, _ in totals), sum(locked for _, locked in totals)
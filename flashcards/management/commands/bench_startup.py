@@ -0,0 +1,166 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Ends both children: print the status and timings, and whether the static
+# files manifest the templates need is missing, which makes pages fail.
+REPORT = """
+from django.contrib.staticfiles.storage import ManifestFilesMixin, staticfiles_storage
+missing_manifest = (isinstance(staticfiles_storage, ManifestFilesMixin)
+                    and not staticfiles_storage.manifest_storage.exists(staticfiles_storage.manifest_name))
+print(json.dumps({'status': status, 'load': loaded - started, 'first': answered - loaded,
+                  'missing_manifest': missing_manifest}), flush=True)
+"""
+
+# Run in a fresh interpreter: set up Django through the project's WSGI or ASGI
+# module, serve one GET, and print the status with the in-process timings.
+WSGI_CHILD = """
+import io, json, sys, time
+started = time.perf_counter()
+from flashcards.wsgi import application
+from django.conf import settings
+loaded = time.perf_counter()
+host = next((h for h in settings.ALLOWED_HOSTS if h and '*' not in h and not h.startswith('.')), 'localhost')
+environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': sys.argv[1], 'QUERY_STRING': '', 'SERVER_NAME': host,
+           'SERVER_PORT': '80', 'HTTP_HOST': host, 'wsgi.input': io.BytesIO(), 'wsgi.url_scheme': 'http'}
+statuses = []
+response = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+b''.join(response)
+response.close()
+answered = time.perf_counter()
+status = int(statuses[0].split()[0])
+""" + REPORT
+
+ASGI_CHILD = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+from flashcards.asgi import application
+from django.conf import settings
+loaded = time.perf_counter()
+host = next((h for h in settings.ALLOWED_HOSTS if h and '*' not in h and not h.startswith('.')), 'localhost')
+scope = {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+         'path': sys.argv[1], 'raw_path': sys.argv[1].encode(), 'query_string': b'', 'root_path': '',
+         'headers': [(b'host', host.encode())], 'client': ('127.0.0.1', 0), 'server': (host, 80)}
+statuses = []
+messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+
+async def receive():
+    # After the body, the client stays connected until the response is sent.
+    if messages:
+        return messages.pop()
+    await asyncio.Event().wait()
+
+async def send(message):
+    if message['type'] == 'http.response.start':
+        statuses.append(message['status'])
+
+asyncio.run(application(scope, receive, send))
+answered = time.perf_counter()
+status = statuses[0]
+""" + REPORT
+
+TARGETS = ('wsgi', 'asgi', 'check')
+
+
+class Command(BaseCommand):
+    help = ("Measure cold start: the wall time from starting a fresh interpreter to the first "
+            "response through flashcards/wsgi.py and flashcards/asgi.py, and the time 'manage.py "
+            "check' takes, for each settings module. With --record the medians are appended to a "
+            "JSON Lines file and compared with the previous entry, to track startup across releases.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modules', nargs='+',
+                            default=['flashcards.settings', 'flashcards.settings_production'],
+                            help="Settings modules to compare.")
+        parser.add_argument('--runs', type=int, default=10, help="Fresh processes per measurement.")
+        parser.add_argument('--path', default='/homepage', help="Path of the first request.")
+        parser.add_argument('--record', help="JSON Lines file to append the results to.")
+
+    def handle(self, *args, **options):
+        if options['runs'] < 1:
+            raise CommandError("--runs must be at least 1.")
+        results = {}
+        for module in options['modules']:
+            results[module] = {target: self.measure(module, target, options['path'], options['runs'])
+                               for target in TARGETS}
+
+        previous = self.previous_record(options['record']) if options['record'] else None
+        self.report(results, previous)
+        if options['record']:
+            self.append_record(options['record'], results, options['runs'])
+
+    def measure(self, module, target, path, runs):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': module}
+        if target == 'check':
+            command = [sys.executable, 'manage.py', 'check']
+        else:
+            command = [sys.executable, '-c', WSGI_CHILD if target == 'wsgi' else ASGI_CHILD, path]
+        walls, loads, firsts = [], [], []
+        for _ in range(runs):
+            started = time.perf_counter()
+            process = subprocess.run(command, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+            walls.append(time.perf_counter() - started)
+            if process.returncode != 0:
+                raise CommandError(f"{target} with {module} failed:\n{process.stderr}")
+            if target != 'check':
+                timings = json.loads(process.stdout.splitlines()[-1])
+                if timings['missing_manifest']:
+                    raise CommandError(f"{module} serves static files from a manifest that does not exist "
+                                       "yet; run 'manage.py build_assets' with it first.")
+                if timings['status'] >= 400:
+                    raise CommandError(f"{target} with {module} answered GET {path} with {timings['status']}; "
+                                       "check ALLOWED_HOSTS.")
+                loads.append(timings['load'])
+                firsts.append(timings['first'])
+        result = {'wall_ms': round(statistics.median(walls) * 1000, 1)}
+        if loads:
+            result['load_ms'] = round(statistics.median(loads) * 1000, 1)
+            result['first_response_ms'] = round(statistics.median(firsts) * 1000, 1)
+        return result
+
+    def report(self, results, previous):
+        self.stdout.write(f"{'settings':<32} {'target':<6} {'wall':>9} {'load':>9} {'1st req':>9} {'previous':>9}")
+        for module, targets in results.items():
+            for target, result in targets.items():
+                row = f"{module:<32} {target:<6} {result['wall_ms']:>7.1f}ms"
+                row += ''.join(f" {result[key]:>7.1f}ms" if key in result else f" {'':>9}"
+                               for key in ('load_ms', 'first_response_ms'))
+                before = (previous or {}).get('results', {}).get(module, {}).get(target)
+                if before:
+                    row += f" {before['wall_ms']:>7.1f}ms"
+                self.stdout.write(row)
+        if previous:
+            self.stdout.write(f"previous: {previous['revision'] or 'unknown revision'} at "
+                              f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(previous['ts']))}")
+
+    def previous_record(self, path):
+        try:
+            with open(path) as f:
+                lines = [line for line in f if line.strip()]
+        except FileNotFoundError:
+            return None
+        return json.loads(lines[-1]) if lines else None
+
+    def append_record(self, path, results, runs):
+        try:
+            revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                                      capture_output=True, text=True).stdout.strip() or None
+        except OSError:
+            revision = None
+        record = {
+            'ts': round(time.time(), 3),
+            'revision': revision,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'runs': runs,
+            'results': results,
+        }
+        with open(path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
@@ -0,0 +1,57 @@
+import os
+import subprocess
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestFilesMixin, staticfiles_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from flashcards.assets import brotli, compress_directory
+from flashcards.templatetags.assets import STYLESHEET
+
+TAILWIND_INPUT = os.path.join('flashcards', 'styles', 'app.css')
+
+
+class Command(BaseCommand):
+    help = ("Build the static files for production: compile flashcards/styles/app.css with the "
+            "Tailwind CLI, keeping only the utilities the templates use, collect everything into "
+            "STATIC_ROOT under content-hashed names, and write .gz and .br copies next to each "
+            "text file. Run it with DJANGO_SETTINGS_MODULE=flashcards.settings_production after "
+            "'npm ci'.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-css', action='store_true',
+                            help="Use the stylesheet already built instead of running Tailwind.")
+
+    def handle(self, *args, **options):
+        if not isinstance(staticfiles_storage, ManifestFilesMixin):
+            raise CommandError("The staticfiles storage does not hash file names; run with "
+                               "DJANGO_SETTINGS_MODULE=flashcards.settings_production.")
+        output = os.path.join(settings.STATICFILES_DIRS[0], STYLESHEET)
+        if not options['skip_css']:
+            self.build_css(output)
+        elif not os.path.exists(output):
+            raise CommandError(f"{output} has not been built.")
+
+        call_command('collectstatic', interactive=False, verbosity=0, ignore_patterns=['*.gz', '*.br'])
+        self.stdout.write(f"Collected into {settings.STATIC_ROOT}; stylesheet is "
+                          f"{staticfiles_storage.stored_name(STYLESHEET)}.")
+        if brotli is None:
+            self.stdout.write(self.style.WARNING("brotli is not installed; writing .gz files only."))
+
+        self.stdout.write(f"{'file':<48} {'size':>9} {'gzip':>9} {'brotli':>9}")
+        raw_total = gzip_total = 0
+        for name, size, variants in compress_directory(settings.STATIC_ROOT):
+            raw_total += size
+            gzip_total += variants.get('.gz', size)
+            self.stdout.write(f"{name:<48} {size:>9} {variants.get('.gz', '-'):>9} {variants.get('.br', '-'):>9}")
+        self.stdout.write(f"{raw_total} bytes of text, {gzip_total} gzipped.")
+
+    def build_css(self, output):
+        command = ['npx', '--no-install', 'tailwindcss', '--postcss', '--minify',
+                   '-c', 'tailwind.config.js', '-i', TAILWIND_INPUT, '-o', output]
+        try:
+            process = subprocess.run(command, cwd=settings.BASE_DIR, capture_output=True, text=True)
+        except FileNotFoundError:
+            raise CommandError("npx was not found; install Node.js and run 'npm ci'.")
+        if process.returncode != 0:
+            raise CommandError(f"Tailwind failed; has 'npm ci' been run?\n{process.stderr}")
+        self.stdout.write(f"Built {output} ({os.path.getsize(output)} bytes).")
@@ -1,3 +1,96 @@
-#import json
-#from django.core.management.base import BaseCommand
-#from flashcards.models import User
\ No newline at end of file
+import gzip
+import json
+import os
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from flashcards.models import User, FlashcardSet, Flashcard, Comment, Collection
+
+EXPORT_MODELS = [User, FlashcardSet, Flashcard, Comment, Collection]
+
+encoder = DjangoJSONEncoder(separators=(',', ':'))
+
+
+class Command(BaseCommand):
+    help = ("Export users, flashcard sets, flashcards, comments and collections as JSON Lines. "
+            "Rows are read in primary-key chunks and a checkpoint is written after every chunk "
+            "so an interrupted export can be continued with --resume.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help="File to write. A .gz suffix turns on gzip.")
+        parser.add_argument('--gzip', action='store_true', help="Compress the output with gzip.")
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--resume', action='store_true',
+                            help="Continue from the checkpoint left by an interrupted export.")
+
+    def handle(self, *args, **options):
+        output = options['output']
+        compress = options['gzip'] or output.endswith('.gz')
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError("--chunk-size must be at least 1.")
+        checkpoint_path = f"{output}.checkpoint"
+
+        labels = [model._meta.label_lower for model in EXPORT_MODELS]
+        checkpoint = {'model': labels[0], 'last_pk': None, 'offset': 0, 'rows': 0, 'gzip': compress}
+        if options['resume']:
+            if not os.path.exists(checkpoint_path):
+                raise CommandError(f"No checkpoint found at {checkpoint_path}.")
+            with open(checkpoint_path) as f:
+                checkpoint = json.load(f)
+            if checkpoint['model'] not in labels:
+                raise CommandError(f"Checkpoint refers to unknown model {checkpoint['model']}.")
+            compress = checkpoint['gzip']
+            self.stdout.write(f"Resuming at {checkpoint['model']} "
+                              f"after pk {checkpoint['last_pk']} ({checkpoint['rows']} rows written).")
+
+        with open(output, 'r+b' if options['resume'] else 'wb') as raw:
+            raw.truncate(checkpoint['offset'])
+            raw.seek(checkpoint['offset'])
+            start = labels.index(checkpoint['model'])
+            for model, label in zip(EXPORT_MODELS[start:], labels[start:]):
+                last_pk = checkpoint['last_pk'] if label == checkpoint['model'] else None
+                for rows in self.chunks(model, last_pk, chunk_size):
+                    last_pk = rows[-1]['id']
+                    self.write_chunk(raw, label, rows, compress)
+                    checkpoint = {
+                        'model': label,
+                        'last_pk': last_pk,
+                        'offset': raw.tell(),
+                        'rows': checkpoint['rows'] + len(rows),
+                        'gzip': compress,
+                    }
+                    self.save_checkpoint(checkpoint_path, checkpoint)
+
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        self.stdout.write(self.style.SUCCESS(f"Exported {checkpoint['rows']} rows to {output}."))
+
+    def chunks(self, model, last_pk, chunk_size):
+        queryset = model.objects.order_by('pk').values()
+        while True:
+            page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            rows = list(page[:chunk_size])
+            if not rows:
+                return
+            last_pk = rows[-1]['id']
+            yield rows
+
+    def write_chunk(self, raw, label, rows, compress):
+        data = ''.join(
+            encoder.encode({'model': label, 'pk': row.pop('id'), 'fields': row}) + '\n' for row in rows
+        ).encode()
+        if compress:
+            # One gzip member per chunk keeps every checkpoint offset on a
+            # member boundary; gzip readers concatenate members transparently.
+            with gzip.GzipFile(fileobj=raw, mode='wb') as member:
+                member.write(data)
+        else:
+            raw.write(data)
+        raw.flush()
+        os.fsync(raw.fileno())
+
+    def save_checkpoint(self, path, checkpoint):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, path)
@@ -0,0 +1,98 @@
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_PATHS = ['/setsbyid?set_id=1', '/getflashcards?set_id=1', '/studyflashcards?flashcard_set=1', '/getallcollections']
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split()[1])
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding', '').lower() == 'chunked':
+        # Streamed responses (the JSON API) arrive chunked on a kept-alive connection.
+        while True:
+            size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.read()
+        headers['connection'] = 'close'
+    return status, headers.get('connection', '').lower() == 'close'
+
+
+async def client(host, port, paths, offset, deadline, latencies, failures):
+    loop = asyncio.get_running_loop()
+    reader = writer = None
+    sent = offset
+    while loop.time() < deadline:
+        path = paths[sent % len(paths)]
+        sent += 1
+        start = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: keep-alive\r\n\r\n'.encode())
+            await writer.drain()
+            status, close = await read_response(reader)
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            failures.append(path)
+            writer = None
+            continue
+        if status >= 400:
+            failures.append(path)
+        else:
+            latencies.append(time.perf_counter() - start)
+        if close:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+class Command(BaseCommand):
+    help = ("Drive a running server with concurrent keep-alive clients issuing GETs against the read "
+            "views and report requests per second and latency percentiles.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help="Server base URL, e.g. http://127.0.0.1:8000")
+        parser.add_argument('--clients', type=int, default=500)
+        parser.add_argument('--seconds', type=float, default=20)
+        parser.add_argument('--path', action='append', dest='paths',
+                            help="Path to request; repeat for several. Defaults to the search, study "
+                                 "and collection list pages.")
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme != 'http' or not url.hostname:
+            raise CommandError("Only plain http://host:port URLs are supported.")
+        latencies, failures = [], []
+        started = time.perf_counter()
+        asyncio.run(self.run(url.hostname, url.port or 80, options, latencies, failures))
+        elapsed = time.perf_counter() - started
+        if not latencies:
+            raise CommandError(f"No successful responses ({len(failures)} failures).")
+        latencies.sort()
+        p99 = latencies[max(int(len(latencies) * 0.99) - 1, 0)]
+        self.stdout.write(
+            f"{len(latencies)} ok, {len(failures)} failed in {elapsed:.1f}s: "
+            f"{len(latencies) / elapsed:.0f} req/s, p50 {statistics.median(latencies) * 1000:.0f}ms, "
+            f"p99 {p99 * 1000:.0f}ms"
+        )
+
+    async def run(self, host, port, options, latencies, failures):
+        paths = options['paths'] or DEFAULT_PATHS
+        deadline = asyncio.get_running_loop().time() + options['seconds']
+        await asyncio.gather(*(
+            client(host, port, paths, i, deadline, latencies, failures) for i in range(options['clients'])
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+from flashcards.models import User
+from flashcards.profiling import make_token
+
+
+class Command(BaseCommand):
+    help = ("Print a profiling token for an admin user. Send it in the X-Profile header or the "
+            "profile query parameter to profile a request, or to open /profiles.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('user_id', type=int)
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(id=options['user_id']).first()
+        if user is None:
+            raise CommandError(f"User {options['user_id']} does not exist.")
+        if not user.admin:
+            raise CommandError(f"User {user.id} is not an admin.")
+        self.stdout.write(make_token(user))
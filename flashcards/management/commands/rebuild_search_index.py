@@ -0,0 +1,29 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from flashcards.core.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = ("Rebuild the SQLite FTS5 index behind /api/search from the flashcard table. "
+            "Triggers keep the index current, so this is only needed after bulk loads that "
+            "bypassed them or to recover from a damaged index.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=50000,
+                            help="Flashcard ids to index per statement.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("The FTS5 search index only exists on SQLite.")
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size must be at least 1.")
+
+        def progress(done, total):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"Indexed flashcards up to id {done} of {total}.")
+
+        started = time.perf_counter()
+        rebuild_index(options['chunk_size'], progress)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the search index in {elapsed:.2f}s."))
@@ -0,0 +1,240 @@
+import asyncio
+import json
+import time
+from collections import defaultdict
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+from django.urls import Resolver404, resolve, reverse
+from flashcards.management.commands.load_test import read_response
+
+
+def load_records(path, limit=None):
+    records = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                records.append(json.loads(line))
+            if limit is not None and len(records) >= limit:
+                break
+    if not records:
+        raise CommandError(f"No requests recorded in {path}.")
+    records.sort(key=lambda record: record['ts'])
+    return records
+
+
+def url_name_of(path):
+    try:
+        return resolve(path).url_name or path
+    except Resolver404:
+        return 'unresolved'
+
+
+def request_parts(record):
+    """Return (path with query string, body bytes, content type) for a record."""
+    path = record['path']
+    if record.get('query'):
+        path += '?' + urlencode(record['query'], doseq=True)
+    if 'json' in record:
+        return path, record['json'].encode(), 'application/json'
+    if 'form' in record:
+        return path, urlencode(record['form'], doseq=True).encode(), 'application/x-www-form-urlencoded'
+    return path, b'', None
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[max(int(len(sorted_values) * fraction + 0.5) - 1, 0)]
+
+
+class ServerTarget:
+    """Replays over keep-alive HTTP/1.1 connections to a running server."""
+
+    def __init__(self, url):
+        url = urlsplit(url)
+        if url.scheme != 'http' or not url.hostname:
+            raise CommandError("Only plain http://host:port URLs are supported.")
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.csrf_token = None
+
+    async def open(self):
+        # Form posts need a CSRF cookie and matching header; any page with a
+        # form hands one out.
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        writer.write(f"GET {reverse('create_flashcard_set')} HTTP/1.1\r\nHost: {self.host}\r\n"
+                     "Connection: close\r\n\r\n".encode())
+        await writer.drain()
+        head = (await reader.read()).split(b'\r\n\r\n', 1)[0].decode('latin-1')
+        writer.close()
+        for line in head.split('\r\n'):
+            if line.lower().startswith('set-cookie:'):
+                cookie = SimpleCookie(line.split(':', 1)[1])
+                if 'csrftoken' in cookie:
+                    self.csrf_token = cookie['csrftoken'].value
+
+    def connection(self):
+        return {'reader': None, 'writer': None}
+
+    async def send(self, conn, record):
+        path, body, content_type = request_parts(record)
+        headers = [f"{record['method']} {path} HTTP/1.1", f"Host: {self.host}", "Connection: keep-alive",
+                   f"Content-Length: {len(body)}"]
+        if content_type:
+            headers.append(f"Content-Type: {content_type}")
+        if self.csrf_token and record['method'] not in ('GET', 'HEAD'):
+            headers += [f"Cookie: csrftoken={self.csrf_token}", f"X-CSRFToken: {self.csrf_token}"]
+        try:
+            if conn['writer'] is None:
+                conn['reader'], conn['writer'] = await asyncio.open_connection(self.host, self.port)
+            conn['writer'].write(('\r\n'.join(headers) + '\r\n\r\n').encode() + body)
+            await conn['writer'].drain()
+            status, close = await read_response(conn['reader'])
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            conn['writer'] = None
+            return None
+        if close:
+            conn['writer'].close()
+            conn['writer'] = None
+        return status
+
+    async def close(self, conn):
+        if conn['writer'] is not None:
+            conn['writer'].close()
+
+    async def finish(self):
+        pass
+
+
+class InProcessTarget:
+    """Replays through Django's handlers in this process, without CSRF checks."""
+
+    def __init__(self, asgi):
+        self.asgi = asgi
+        # The test clients send Host: testserver, as they do under the test runner.
+        self.settings = override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'])
+
+    async def open(self):
+        self.settings.enable()
+
+    def connection(self):
+        return AsyncClient() if self.asgi else Client()
+
+    async def send(self, client, record):
+        path, body, content_type = request_parts(record)
+        kwargs = {'content_type': content_type} if content_type else {}
+        if self.asgi:
+            response = await client.generic(record['method'], path, body, **kwargs)
+            if response.streaming:
+                # Sync streams, like the JSON API's cursor, are consumed off the event loop.
+                if response.is_async:
+                    async for _ in response.streaming_content:
+                        pass
+                else:
+                    await sync_to_async(b''.join)(response.streaming_content)
+            return response.status_code
+        return await asyncio.to_thread(self.send_wsgi, client, record['method'], path, body, kwargs)
+
+    def send_wsgi(self, client, method, path, body, kwargs):
+        try:
+            response = client.generic(method, path, body, **kwargs)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            return response.status_code
+        finally:
+            # The test client leaves connections open after a response; each
+            # executor thread would keep its own.
+            connections.close_all()
+
+    async def close(self, client):
+        pass
+
+    async def finish(self):
+        # Views run through sync_to_async share one thread, which still holds
+        # a connection.
+        await sync_to_async(connections.close_all)()
+        self.settings.disable()
+
+
+class Command(BaseCommand):
+    help = ("Replay requests captured by TrafficCaptureMiddleware at their recorded pace, scaled, or "
+            "as fast as possible, against this app in-process (WSGI or ASGI) or a running server, and "
+            "report throughput and latency percentiles per URL name. Replayed writes change the "
+            "database, so point it at a copy.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('capture', help="JSON Lines file written by TrafficCaptureMiddleware.")
+        parser.add_argument('--url', help="Base URL of a running server, e.g. http://127.0.0.1:8000. "
+                                          "Without it requests go through the in-process WSGI handler.")
+        parser.add_argument('--asgi', action='store_true', help="Use the in-process ASGI handler instead.")
+        parser.add_argument('--speed', type=float, default=1.0,
+                            help="Multiple of the recorded rate; 0 sends as fast as the connections allow.")
+        parser.add_argument('--concurrency', type=int, default=32, help="Requests in flight at most.")
+        parser.add_argument('--limit', type=int, help="Replay only the first N requests.")
+
+    def handle(self, *args, **options):
+        if options['speed'] < 0:
+            raise CommandError("--speed must not be negative.")
+        if options['concurrency'] < 1:
+            raise CommandError("--concurrency must be at least 1.")
+        records = load_records(options['capture'], options['limit'])
+        target = ServerTarget(options['url']) if options['url'] else InProcessTarget(options['asgi'])
+
+        results = defaultdict(lambda: {'latencies': [], 'failed': 0})
+        started = time.perf_counter()
+        asyncio.run(self.replay(target, records, options, results))
+        elapsed = time.perf_counter() - started
+        self.report(results, elapsed)
+
+    async def replay(self, target, records, options, results):
+        await target.open()
+        queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        first = records[0]['ts']
+        speed = options['speed']
+        begin = loop.time()
+
+        async def worker():
+            conn = target.connection()
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                due, record = item
+                status = await target.send(conn, record)
+                # Latency runs from when the request was due, so time spent
+                # waiting for a free connection counts against the server.
+                latency = loop.time() - due
+                bucket = results[url_name_of(record['path'])]
+                if status is None or status >= 400:
+                    bucket['failed'] += 1
+                else:
+                    bucket['latencies'].append(latency)
+            await target.close(conn)
+
+        workers = [asyncio.create_task(worker()) for _ in range(options['concurrency'])]
+        for record in records:
+            due = begin + (record['ts'] - first) / speed if speed else loop.time()
+            delay = due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await queue.put((due, record))
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+        await target.finish()
+
+    def report(self, results, elapsed):
+        self.stdout.write(f"{'url name':<24} {'ok':>7} {'failed':>7} {'req/s':>8} {'p50':>9} {'p90':>9} {'p99':>9}")
+        for name in sorted(results):
+            latencies = sorted(results[name]['latencies'])
+            row = f"{name:<24} {len(latencies):>7} {results[name]['failed']:>7} {len(latencies) / elapsed:>8.1f}"
+            if latencies:
+                row += ''.join(f" {percentile(latencies, p) * 1000:>7.1f}ms" for p in (0.5, 0.9, 0.99))
+            self.stdout.write(row)
+        total = sum(len(result['latencies']) for result in results.values())
+        failed = sum(result['failed'] for result in results.values())
+        self.stdout.write(f"{total} ok, {failed} failed in {elapsed:.1f}s: {total / elapsed:.0f} req/s")
@@ -0,0 +1,288 @@
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_GET
+
+try:
+    import fcntl
+except ImportError:  # Windows: the files of exited workers are kept as they are.
+    fcntl = None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# name: (type, help, buckets)
+METRICS = {
+    'flashcards_request_duration_seconds': ('histogram', "Time to build the response, by URL name.", LATENCY_BUCKETS),
+    'flashcards_response_size_bytes': ('histogram', "Size of non-streaming response bodies.", SIZE_BUCKETS),
+    'flashcards_responses_total': ('counter', "Responses by URL name and status code.", None),
+    'flashcards_db_queries_total': ('counter', "SQL statements run while handling requests.", None),
+    'flashcards_db_query_seconds_total': ('counter', "Time spent in SQL statements while handling requests.", None),
+}
+
+# The summed totals of exited workers, and the lock held while /metrics reads
+# and compacts METRICS_DIR.
+EXITED_FILE = 'metrics-exited.json'
+DIRECTORY_LOCK = 'metrics.lock'
+# A worker's lock file is written just before its first totals; one without
+# totals is only removed once it is this old.
+ORPHAN_LOCK_SECONDS = 60
+
+# The SQL totals of the request being handled. Context variables follow the
+# request into the threads sync_to_async runs the ORM on.
+_request_sql = ContextVar('flashcards_request_sql', default=None)
+
+
+class Registry:
+    """Counters and histograms for this process.
+
+    With METRICS_DIR set, each process writes its totals to its own file there
+    every METRICS_FLUSH_SECONDS, and the /metrics page sums every file, so the
+    numbers cover all workers behind the server. File names are unique to the
+    process rather than its pid, which the OS hands out again. Each process
+    holds a lock on a matching .lock file while it lives; /metrics folds the
+    files whose lock is free into EXITED_FILE, so the totals of workers that
+    have exited are kept without one file per worker ever started.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.values = {}
+        self.last_flush = 0.0
+        self.name = None
+        self.lock_fd = None
+
+    def forked(self):
+        # A forked worker counts from zero under a name of its own; the parent
+        # keeps its lock and its totals.
+        if self.lock_fd is not None:
+            os.close(self.lock_fd)
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.values = {}
+        self.name = self.lock_fd = None
+
+    def inc(self, name, labels, amount=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            # One count per bucket (the last is +Inf), then sum and count.
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = [0] * (len(buckets) + 3)
+            series[bisect_left(buckets, value)] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return [[name, dict(labels), value] for (name, labels), value in self.values.items()]
+
+    def path(self):
+        if self.name is None:
+            self.name = f'metrics-{os.getpid()}-{uuid.uuid4().hex[:12]}'
+        return os.path.join(settings.METRICS_DIR, f'{self.name}.json')
+
+    def hold_lock(self):
+        if fcntl is None or self.lock_fd is not None:
+            return
+        path = self.path()[:-len('.json')] + '.lock'
+        self.lock_fd = os.open(path, os.O_WRONLY | os.O_CREAT, 0o600)
+        # Kept until the process exits, which releases it.
+        fcntl.flock(self.lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def flush(self, force=False):
+        if not settings.METRICS_DIR:
+            return
+        with self.flush_lock:
+            now = time.monotonic()
+            if not force and now - self.last_flush < settings.METRICS_FLUSH_SECONDS:
+                return
+            self.last_flush = now
+            os.makedirs(settings.METRICS_DIR, exist_ok=True)
+            self.hold_lock()
+            _write_rows(self.path(), self.snapshot())
+
+    def collect(self):
+        """Return every series summed across the processes sharing METRICS_DIR."""
+        if not settings.METRICS_DIR:
+            return self.snapshot()
+        self.flush(force=True)
+        merged = {}
+        with _directory_lock():
+            self.compact()
+            for entry in os.scandir(settings.METRICS_DIR):
+                if entry.name.startswith('metrics-') and entry.name.endswith('.json'):
+                    _merge(merged, _read_rows(entry.path) or [])
+        return [[name, dict(labels), value] for (name, labels), value in merged.items()]
+
+    def compact(self):
+        """Fold the totals of exited workers into EXITED_FILE and remove their files."""
+        if fcntl is None:
+            return
+        exited_path = os.path.join(settings.METRICS_DIR, EXITED_FILE)
+        merged = {}
+        removed = []
+        for entry in os.scandir(settings.METRICS_DIR):
+            if not (entry.name.startswith('metrics-') and entry.name.endswith('.lock')):
+                continue
+            try:
+                fd = os.open(entry.path, os.O_WRONLY)
+            except FileNotFoundError:
+                continue
+            try:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue  # Its worker is running.
+                data_path = entry.path[:-len('.lock')] + '.json'
+                rows = _read_rows(data_path)
+                if rows is not None:
+                    _merge(merged, rows)
+                    removed += [data_path, entry.path]
+                elif time.time() - entry.stat().st_mtime > ORPHAN_LOCK_SECONDS:
+                    removed.append(entry.path)
+            finally:
+                os.close(fd)
+        if not removed:
+            return
+        _merge(merged, _read_rows(exited_path) or [])
+        _write_rows(exited_path, [[name, dict(labels), value] for (name, labels), value in merged.items()])
+        for path in removed:
+            os.remove(path)
+
+
+def _read_rows(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_rows(path, rows):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(rows, f)
+    os.replace(tmp_path, path)
+
+
+def _merge(merged, rows):
+    for name, labels, value in rows:
+        key = (name, tuple(sorted(labels.items())))
+        if key not in merged:
+            merged[key] = value
+        elif isinstance(value, list):
+            merged[key] = [a + b for a, b in zip(merged[key], value)]
+        else:
+            merged[key] += value
+
+
+@contextmanager
+def _directory_lock():
+    # Serializes /metrics reads across workers, so no file is compacted while
+    # another worker sums the directory.
+    if fcntl is None:
+        yield
+        return
+    fd = os.open(os.path.join(settings.METRICS_DIR, DIRECTORY_LOCK), os.O_WRONLY | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+registry = Registry()
+atexit.register(lambda: registry.flush(force=True))
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=lambda: registry.forked())
+
+
+def start_request():
+    return _request_sql.set({'queries': 0, 'seconds': 0.0})
+
+
+def end_request(token):
+    totals = _request_sql.get()
+    _request_sql.reset(token)
+    return totals
+
+
+def sql_wrapper(execute, sql, params, many, context):
+    """execute_wrapper installed on every connection by flashcards.signals."""
+    totals = _request_sql.get()
+    if totals is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        totals['queries'] += 1
+        totals['seconds'] += time.perf_counter() - started
+
+
+def record(request, response, duration, sql):
+    match = request.resolver_match
+    view = (match.url_name or match.view_name) if match else 'unresolved'
+    registry.observe('flashcards_request_duration_seconds', {'view': view, 'method': request.method}, duration)
+    registry.inc('flashcards_responses_total', {'view': view, 'status': str(response.status_code)})
+    if sql['queries']:
+        registry.inc('flashcards_db_queries_total', {'view': view}, sql['queries'])
+        registry.inc('flashcards_db_query_seconds_total', {'view': view}, sql['seconds'])
+    if not response.streaming:
+        registry.observe('flashcards_response_size_bytes', {'view': view}, len(response.content))
+    registry.flush()
+
+
+def _label_text(labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{name}="{escape(value)}"' for name, value in sorted(labels.items()))
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def exposition(rows):
+    """Render rows from Registry.collect() in the Prometheus text format."""
+    by_name = {}
+    for name, labels, value in rows:
+        by_name.setdefault(name, []).append((labels, value))
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in sorted(by_name.get(name, []), key=lambda row: _label_text(row[0])):
+            if kind == 'counter':
+                lines.append(f'{name}{{{_label_text(labels)}}} {_number(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip((*buckets, '+Inf'), value):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{_label_text({**labels, "le": bound})}}} {cumulative}')
+            lines.append(f'{name}_sum{{{_label_text(labels)}}} {_number(value[-2])}')
+            lines.append(f'{name}_count{{{_label_text(labels)}}} {value[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+@require_GET
+def metrics(request):
+    if settings.METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {settings.METRICS_TOKEN}':
+        return HttpResponseForbidden("Forbidden: A valid metrics token is required.")
+    return HttpResponse(exposition(registry.collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
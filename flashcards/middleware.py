@@ -0,0 +1,250 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import reverse
+from flashcards import metrics, profiling, routers, slowlog
+
+PIN_COOKIE = 'pin_primary'
+PROFILE_ID_HEADER = 'X-Profile-Id'
+
+
+class PrimaryPinMiddleware:
+    """Track writes per request for PrimaryReplicaRouter.
+
+    A response to a request that wrote sets a short-lived cookie, and requests
+    carrying it read from the primary until the replicas have caught up.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = routers.start_request(pinned=PIN_COOKIE in request.COOKIES)
+        try:
+            return self.process_response(self.get_response(request))
+        finally:
+            routers.end_request(token)
+
+    async def __acall__(self, request):
+        token = routers.start_request(pinned=PIN_COOKIE in request.COOKIES)
+        try:
+            return self.process_response(await self.get_response(request))
+        finally:
+            routers.end_request(token)
+
+    def process_response(self, response):
+        if routers.wrote_to_primary():
+            response.set_cookie(PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
+
+
+class TrafficCaptureMiddleware:
+    """Append a sample of requests to TRAFFIC_CAPTURE_PATH as JSON Lines.
+
+    Each line holds what replay_traffic needs to send the request again, plus
+    the status and time taken. Query and form fields named in
+    TRAFFIC_CAPTURE_REDACT are replaced, and CSRF and profiling tokens are
+    dropped. Removed from the stack when no capture path is set.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.TRAFFIC_CAPTURE_PATH:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.lock = threading.Lock()
+        self.fd = None
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= settings.TRAFFIC_CAPTURE_SAMPLE:
+            return self.get_response(request)
+        started = time.time()
+        record = self.record(request, started)
+        response = self.get_response(request)
+        self.write(record, request, response, started)
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= settings.TRAFFIC_CAPTURE_SAMPLE:
+            return await self.get_response(request)
+        started = time.time()
+        record = self.record(request, started)
+        response = await self.get_response(request)
+        self.write(record, request, response, started)
+        return response
+
+    def record(self, request, started):
+        # Read the input before the view does, so a streamed body is still
+        # available here.
+        record = {'ts': round(started, 6), 'method': request.method, 'path': request.path}
+        # An admin's profiling token would let anyone reading the capture profile requests.
+        query = self.fields(request.GET, profiling.TOKEN_PARAM)
+        if query:
+            record['query'] = query
+        if request.method == 'POST':
+            if request.content_type == 'application/json':
+                record['json'] = request.body.decode('utf-8', 'replace')
+            else:
+                record['form'] = self.fields(request.POST, 'csrfmiddlewaretoken')
+        return record
+
+    def fields(self, data, dropped):
+        redact = settings.TRAFFIC_CAPTURE_REDACT
+        return {
+            name: ['redacted' for _ in values] if name in redact else values
+            for name, values in data.lists() if name != dropped
+        }
+
+    def write(self, record, request, response, started):
+        record['status'] = response.status_code
+        record['ms'] = round((time.time() - started) * 1000, 3)
+        match = request.resolver_match
+        record['url_name'] = match.url_name if match else None
+        line = (json.dumps(record, separators=(',', ':')) + '\n').encode()
+        with self.lock:
+            if self.fd is None:
+                self.fd = os.open(settings.TRAFFIC_CAPTURE_PATH, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            # One write() per line on an O_APPEND descriptor keeps lines from
+            # several worker processes whole.
+            os.write(self.fd, line)
+
+
+class MetricsMiddleware:
+    """Record latency, SQL and response size per URL name for /metrics."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        token = metrics.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            sql = metrics.end_request(token)
+        metrics.record(request, response, time.perf_counter() - started, sql)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        token = metrics.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            sql = metrics.end_request(token)
+        metrics.record(request, response, time.perf_counter() - started, sql)
+        return response
+
+
+class SlowQueryMiddleware:
+    """Make the current request visible to flashcards.slowlog for attribution."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.SLOW_QUERY_LOG:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = slowlog.current_request.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            slowlog.current_request.reset(token)
+
+    async def __acall__(self, request):
+        token = slowlog.current_request.set(request)
+        task_token = slowlog.current_task.set(asyncio.current_task())
+        try:
+            return await self.get_response(request)
+        finally:
+            slowlog.current_task.reset(task_token)
+            slowlog.current_request.reset(token)
+
+
+class ProfilingMiddleware:
+    """Profile requests that carry an admin's profiling token.
+
+    The token comes in the X-Profile header or the ``profile`` query
+    parameter. Requests without one only pay for that lookup.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILE_DIR:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        # The listing takes the same token; viewing it should not push out
+        # the profiles being looked at.
+        self.profiles_path = reverse('profile_list')
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def wants_profile(self, request):
+        token = profiling.request_token(request)
+        return token if token and not request.path.startswith(self.profiles_path) else None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = self.wants_profile(request)
+        user = profiling.admin_from_token(token) if token else None
+        if user is None:
+            return self.get_response(request)
+        sampler = profiling.Sampler(threading.get_ident())
+        sampler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            sampler.stop()
+        response[PROFILE_ID_HEADER] = profiling.save_profile(request, response, sampler, user)
+        return response
+
+    async def __acall__(self, request):
+        token = self.wants_profile(request)
+        user = await sync_to_async(profiling.admin_from_token)(token) if token else None
+        if user is None:
+            return await self.get_response(request)
+        sampler = profiling.Sampler(threading.get_ident(), include_sync_workers=True)
+        sampler.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            sampler.stop()
+        response[PROFILE_ID_HEADER] = await sync_to_async(profiling.save_profile)(request, response, sampler, user)
+        return response
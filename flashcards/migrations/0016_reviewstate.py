@@ -0,0 +1,63 @@
+# Generated by Django 5.0.14 on 2026-10-18 20:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("flashcards", "0015_alter_user_password"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReviewState",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("ease_factor", models.FloatField(default=2.5)),
+                ("interval_days", models.PositiveIntegerField(default=0)),
+                ("repetitions", models.PositiveIntegerField(default=0)),
+                ("due_at", models.DateTimeField()),
+                (
+                    "last_reviewed_at",
+                    models.DateTimeField(blank=True, default=None, null=True),
+                ),
+                (
+                    "flashcard",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="review_states",
+                        to="flashcards.flashcard",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="review_states",
+                        to="flashcards.user",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["user", "due_at"], name="review_user_due_idx")
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="reviewstate",
+            constraint=models.UniqueConstraint(
+                fields=("user", "flashcard"), name="unique_review_state"
+            ),
+        ),
+    ]
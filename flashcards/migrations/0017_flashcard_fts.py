@@ -0,0 +1,78 @@
+from django.db import migrations
+
+# An SQLite FTS5 index over card questions and answers and the name of the
+# card's set. rowid is the flashcard id, and triggers keep the index in step
+# with every insert, update and delete, including bulk_create() and update().
+# Other backends get no index; flashcards.core.search falls back to their own
+# full-text functions.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE flashcards_flashcard_fts USING fts5(
+        question, answer, set_name, tokenize = 'porter unicode61', prefix = '2 3'
+    )
+    """,
+    # Rank questions above answers above set names.
+    "INSERT INTO flashcards_flashcard_fts (flashcards_flashcard_fts, rank) VALUES ('rank', 'bm25(10.0, 5.0, 2.0)')",
+    """
+    CREATE TRIGGER flashcards_flashcard_fts_insert AFTER INSERT ON flashcards_flashcard BEGIN
+        INSERT INTO flashcards_flashcard_fts (rowid, question, answer, set_name)
+        VALUES (new.id, new.question, new.answer,
+                (SELECT name FROM flashcards_flashcardset WHERE id = new.flashcardset_id));
+    END
+    """,
+    """
+    CREATE TRIGGER flashcards_flashcard_fts_update AFTER UPDATE OF question, answer, flashcardset_id
+    ON flashcards_flashcard BEGIN
+        DELETE FROM flashcards_flashcard_fts WHERE rowid = old.id;
+        INSERT INTO flashcards_flashcard_fts (rowid, question, answer, set_name)
+        VALUES (new.id, new.question, new.answer,
+                (SELECT name FROM flashcards_flashcardset WHERE id = new.flashcardset_id));
+    END
+    """,
+    """
+    CREATE TRIGGER flashcards_flashcard_fts_delete AFTER DELETE ON flashcards_flashcard BEGIN
+        DELETE FROM flashcards_flashcard_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER flashcards_flashcardset_fts_rename AFTER UPDATE OF name ON flashcards_flashcardset
+    WHEN old.name IS NOT new.name BEGIN
+        UPDATE flashcards_flashcard_fts SET set_name = new.name
+        WHERE rowid IN (SELECT id FROM flashcards_flashcard WHERE flashcardset_id = new.id);
+    END
+    """,
+    """
+    INSERT INTO flashcards_flashcard_fts (rowid, question, answer, set_name)
+    SELECT card.id, card.question, card.answer, cardset.name
+    FROM flashcards_flashcard AS card
+    LEFT JOIN flashcards_flashcardset AS cardset ON cardset.id = card.flashcardset_id
+    """,
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS flashcards_flashcardset_fts_rename",
+    "DROP TRIGGER IF EXISTS flashcards_flashcard_fts_delete",
+    "DROP TRIGGER IF EXISTS flashcards_flashcard_fts_update",
+    "DROP TRIGGER IF EXISTS flashcards_flashcard_fts_insert",
+    "DROP TABLE IF EXISTS flashcards_flashcard_fts",
+]
+
+
+def run_on_sqlite(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != "sqlite":
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("flashcards", "0016_reviewstate"),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_sqlite(CREATE_SQL), run_on_sqlite(DROP_SQL)),
+    ]
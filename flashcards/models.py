@@ -53,4 +53,24 @@ class Collection(models.Model):
       author = models.ForeignKey(User, default=None, null=True, blank=True, on_delete=models.CASCADE, related_name='collection')
 
       def __str__(self):
-            return f"Collection Name: {self.name}"
\ No newline at end of file
+            return f"Collection Name: {self.name}"
+
+class ReviewState(models.Model):
+      user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='review_states')
+      flashcard = models.ForeignKey(Flashcard, on_delete=models.CASCADE, related_name='review_states')
+      ease_factor = models.FloatField(default=2.5)
+      interval_days = models.PositiveIntegerField(default=0)
+      repetitions = models.PositiveIntegerField(default=0)
+      due_at = models.DateTimeField()
+      last_reviewed_at = models.DateTimeField(default=None, null=True, blank=True)
+
+      class Meta:
+            constraints = [
+                  models.UniqueConstraint(fields=['user', 'flashcard'], name='unique_review_state'),
+            ]
+            indexes = [
+                  models.Index(fields=['user', 'due_at'], name='review_user_due_idx'),
+            ]
+
+      def __str__(self):
+            return f"User: {self.user_id}, Card: {self.flashcard_id}, Due: {self.due_at}"
@@ -0,0 +1,184 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from functools import wraps
+from asgiref.sync import SyncToAsync
+from django.conf import settings
+from django.core import signing
+from django.http import FileResponse, Http404, HttpResponseForbidden
+from django.shortcuts import render
+from django.views.decorators.http import require_GET
+from flashcards.models import User
+
+TOKEN_SALT = 'flashcards.profiling'
+TOKEN_HEADER = 'X-Profile'
+TOKEN_PARAM = 'profile'
+PROFILE_SUFFIX = '.folded'
+
+_THREAD_HANDLER_CODE = SyncToAsync.thread_handler.__code__
+_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_token(user):
+    return signing.dumps(user.id, salt=TOKEN_SALT)
+
+
+def admin_from_token(token):
+    """Return the admin User a profiling token was issued to, or None."""
+    try:
+        user_id = signing.loads(token, salt=TOKEN_SALT, max_age=settings.PROFILE_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return None
+    return User.objects.filter(id=user_id, admin=True).first()
+
+
+def request_token(request):
+    return request.headers.get(TOKEN_HEADER) or request.GET.get(TOKEN_PARAM)
+
+
+def _frame_name(code):
+    filename = code.co_filename
+    if filename.startswith(_ROOT_DIR + os.sep):
+        filename = os.path.relpath(filename, _ROOT_DIR)
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'
+
+
+def _stack(frame):
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    names.reverse()
+    return names
+
+
+def _runs_sync_to_async(frame):
+    while frame is not None:
+        if frame.f_code is _THREAD_HANDLER_CODE:
+            return True
+        frame = frame.f_back
+    return False
+
+
+class Sampler:
+    """Sample the stacks of one request's threads into collapsed-stack counts.
+
+    A daemon thread wakes every PROFILE_INTERVAL_MS and reads the request
+    thread's stack from sys._current_frames(). When the request runs on an
+    event loop, threads running sync_to_async work are sampled too; on a busy
+    ASGI server those can belong to other requests.
+    """
+
+    def __init__(self, thread_id, include_sync_workers=False):
+        self.thread_id = thread_id
+        self.include_sync_workers = include_sync_workers
+        self.stacks = Counter()
+        self.samples = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='flashcards-profiler', daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        self.elapsed = time.perf_counter() - self.started
+
+    def run(self):
+        interval = settings.PROFILE_INTERVAL_MS / 1000
+        own_id = threading.get_ident()
+        while not self.stopped.wait(interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if thread_id == self.thread_id:
+                    self.stacks[';'.join(_stack(frame))] += 1
+                elif self.include_sync_workers and _runs_sync_to_async(frame):
+                    self.stacks[';'.join(_stack(frame))] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+def save_profile(request, response, sampler, user):
+    """Write the profile and its metadata, and prune the store to PROFILE_MAX_FILES."""
+    directory = settings.PROFILE_DIR
+    os.makedirs(directory, exist_ok=True)
+    match = request.resolver_match
+    # Names sort in the order the profiles were taken.
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 10**9:09d}-{os.getpid()}"
+    meta = {
+        'name': name,
+        'ts': time.time(),
+        'method': request.method,
+        'path': request.path,
+        'url_name': match.url_name if match else None,
+        'status': response.status_code,
+        'ms': round(sampler.elapsed * 1000, 3),
+        'samples': sampler.samples,
+        'user_id': user.id,
+    }
+    with open(os.path.join(directory, name + PROFILE_SUFFIX), 'w') as f:
+        f.write(sampler.collapsed())
+    with open(os.path.join(directory, name + '.json'), 'w') as f:
+        json.dump(meta, f)
+    prune(directory, settings.PROFILE_MAX_FILES)
+    return name
+
+
+def prune(directory, keep):
+    names = sorted(entry[:-len('.json')] for entry in os.listdir(directory) if entry.endswith('.json'))
+    for name in names[:max(len(names) - keep, 0)]:
+        for suffix in ('.json', PROFILE_SUFFIX):
+            try:
+                os.remove(os.path.join(directory, name + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def stored_profiles():
+    directory = settings.PROFILE_DIR
+    if not directory or not os.path.isdir(directory):
+        return []
+    profiles = []
+    for entry in sorted(os.listdir(directory), reverse=True):
+        if not entry.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, entry)) as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+def require_admin_token(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        token = request_token(request)
+        if not settings.PROFILE_DIR or not token or admin_from_token(token) is None:
+            return HttpResponseForbidden("Forbidden: A valid admin profiling token is required.")
+        return view(request, *args, token=token, **kwargs)
+    return wrapper
+
+
+@require_GET
+@require_admin_token
+def profile_list(request, token):
+    return render(request, 'profiles.html', {'profiles': stored_profiles(), 'token': token})
+
+
+@require_GET
+@require_admin_token
+def profile_detail(request, name, token):
+    path = os.path.join(settings.PROFILE_DIR, name + PROFILE_SUFFIX)
+    if os.path.basename(path) != name + PROFILE_SUFFIX or not os.path.exists(path):
+        raise Http404("No such profile.")
+    return FileResponse(open(path, 'rb'), content_type='text/plain; charset=utf-8',
+                        as_attachment=True, filename=name + PROFILE_SUFFIX)
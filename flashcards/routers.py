@@ -0,0 +1,62 @@
+import random
+from contextvars import ContextVar
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+
+# Routing state of the request being served, set by PrimaryPinMiddleware.
+_request_state = ContextVar('flashcards_replica_routing', default=None)
+
+
+def start_request(pinned):
+    # replica is picked by the request's first read and kept for the rest of it.
+    return _request_state.set({'pinned': pinned, 'wrote': False, 'replica': None})
+
+
+def end_request(token):
+    _request_state.reset(token)
+
+
+def wrote_to_primary():
+    state = _request_state.get()
+    return state is not None and state['wrote']
+
+
+class PrimaryReplicaRouter:
+    """Send reads to a replica in DATABASE_REPLICAS and writes to default.
+
+    Each request reads from one replica, picked at random by its first read.
+    Once a request writes, its later reads stay on the primary so it reads its
+    own writes, and PrimaryPinMiddleware keeps that client on the primary for
+    REPLICA_PIN_SECONDS to cover replication lag. Queries made outside a
+    request (shell, management commands) always use the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _request_state.get()
+        if state is None or state['pinned'] or not settings.DATABASE_REPLICAS:
+            return 'default'
+        if state['replica'] is None:
+            state['replica'] = random.choice(settings.DATABASE_REPLICAS)
+        return state['replica']
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state['pinned'] = state['wrote'] = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+def recently_written(moment):
+    """Whether a write made at moment may not have reached the replicas yet.
+
+    Caches filled right after an invalidation read from the primary, so they
+    never store what a lagging replica still returns.
+    """
+    return timezone.now() - moment < timedelta(seconds=settings.REPLICA_PIN_SECONDS)
@@ -10,22 +10,25 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/topics/settings/
 """
 
+import copy
 import os
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 
-# Quick-start development settings - unsuitable for production
+# Quick-start development settings - unsuitable for production; deploy with
+# DJANGO_SETTINGS_MODULE=flashcards.settings_production instead.
 # See https://docs.djangoproject.com/en/5.0/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = config("SECRET_KEY", default='ey3n2o2kn5i6m495n65o3n2i2a6m7onqn1kz')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = config("DEBUG", default=True)
+DEBUG = config("DEBUG", default=True, cast=bool)
 
 ALLOWED_HOSTS = config('ALLOWED_HOSTS', default='').split(',')
 
@@ -48,7 +51,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "flashcards.middleware.TrafficCaptureMiddleware",
+    "flashcards.middleware.MetricsMiddleware",
+    "flashcards.middleware.SlowQueryMiddleware",
+    "flashcards.middleware.ProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "flashcards.middleware.PrimaryPinMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -62,6 +70,13 @@ X_FRAME_OPTIONS = "ALLOW-FROM preview.app.github.dev"
 
 ROOT_URLCONF = "flashcards.urls"
 
+# Production rendering: the data-free pages in flashcards/core/pages.py are
+# rendered once at startup and served as bytes. Compiled templates are
+# already kept per worker by the cached loader Django adds when no explicit
+# "loaders" option is set, so do not add one here without wrapping it in
+# django.template.loaders.cached.Loader.
+PRODUCTION_RENDERING = config("PRODUCTION_RENDERING", default=False, cast=bool)
+
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
@@ -82,12 +97,91 @@ WSGI_APPLICATION = "flashcards.wsgi.application"
 
 
 # Database
-# https://docs.djangoproject.com/en/5.0/ref/settings/#databases
+# https://docs.djangoproject.com/en/5.1/ref/settings/#databases
+# DB_ENGINE picks the backend: "sqlite" (the default) or "postgresql".
+
+DB_ENGINE = config("DB_ENGINE", default="sqlite")
+
+if DB_ENGINE == "postgresql":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "HOST": config("DB_HOST", default="127.0.0.1"),
+            "PORT": config("DB_PORT", default="5432"),
+            "NAME": config("DB_DATABASE", default="flashcards"),
+            "USER": config("DB_USERNAME", default="postgres"),
+            "PASSWORD": config("DB_PASSWORD", default=""),
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {},
+        }
+    }
+    if config("DB_POOL", default=True, cast=bool):
+        # One psycopg pool per worker process. Django requires CONN_MAX_AGE=0
+        # with a pool; connections go back to the pool after each request.
+        DATABASES["default"]["CONN_MAX_AGE"] = 0
+        DATABASES["default"]["OPTIONS"]["pool"] = {
+            "min_size": config("DB_POOL_MIN_SIZE", default=2, cast=int),
+            "max_size": config("DB_POOL_MAX_SIZE", default=10, cast=int),
+            # Seconds a request waits for a free connection before erroring.
+            "timeout": config("DB_POOL_TIMEOUT", default=10, cast=float),
+            # Seconds before a pooled connection is closed and replaced.
+            "max_lifetime": config("DB_POOL_MAX_LIFETIME", default=1800, cast=float),
+        }
+    else:
+        DATABASES["default"]["CONN_MAX_AGE"] = config("CONN_MAX_AGE", default=600, cast=int)
+elif DB_ENGINE == "sqlite":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / "db.sqlite3",
+            # Keep connections open between requests; health checks replace a
+            # connection that went away instead of failing the next request.
+            "CONN_MAX_AGE": config("CONN_MAX_AGE", default=600, cast=int),
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {
+                # Seconds a writer waits for the lock before "database is locked".
+                "timeout": config("SQLITE_TIMEOUT", default=20, cast=int),
+            },
+        }
+    }
+else:
+    raise ImproperlyConfigured(f"Unsupported DB_ENGINE {DB_ENGINE!r}; use 'sqlite' or 'postgresql'.")
+
+# Read replicas, as a comma-separated list of database files (sqlite) or hosts
+# (postgresql). Each becomes an alias "replica1", "replica2", ... that shares
+# the primary's other settings. flashcards.routers.PrimaryReplicaRouter sends
+# request reads there and writes to "default"; a client that wrote reads from
+# the primary for REPLICA_PIN_SECONDS afterwards.
+for number, target in enumerate(config("DB_REPLICAS", default="", cast=Csv()), start=1):
+    replica = copy.deepcopy(DATABASES["default"])
+    replica["NAME" if DB_ENGINE == "sqlite" else "HOST"] = target
+    replica["TEST"] = {"MIRROR": "default"}
+    DATABASES[f"replica{number}"] = replica
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["flashcards.routers.PrimaryReplicaRouter"]
+REPLICA_PIN_SECONDS = config("REPLICA_PIN_SECONDS", default=5, cast=int)
+
+# Pragmas run on every new SQLite connection (see flashcards/signals.py). WAL
+# lets readers run alongside a writer, and synchronous=NORMAL is safe under
+# WAL. mmap_size is in bytes; a negative cache_size is in KiB.
+SQLITE_PRAGMAS = {
+    "journal_mode": config("SQLITE_JOURNAL_MODE", default="WAL"),
+    "synchronous": config("SQLITE_SYNCHRONOUS", default="NORMAL"),
+    "mmap_size": config("SQLITE_MMAP_SIZE", default=256 * 1024 * 1024, cast=int),
+    "cache_size": config("SQLITE_CACHE_SIZE", default=-64000, cast=int),
+    "temp_store": config("SQLITE_TEMP_STORE", default="MEMORY"),
+}
 
-DATABASES = {
+
+# Cache
+# Point CACHE_BACKEND at a shared cache (e.g. Redis or Memcached) when running
+# several worker processes so cached pages are invalidated in all of them.
+
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "BACKEND": config("CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": config("CACHE_LOCATION", default=""),
     }
 }
 
@@ -131,12 +225,116 @@ STATICFILES_DIRS = [
 ]
 
 STATIC_URL = "static/"
-STATIC_ROOT = BASE_DIR / "flashcards" / "staticfiles"
+STATIC_ROOT = config("STATIC_ROOT", default=str(BASE_DIR / "flashcards" / "staticfiles"))
+
+# The stylesheet. "manage.py build_assets" compiles flashcards/styles/app.css
+# with the Tailwind CLI into the first STATICFILES_DIRS entry, collects it and
+# precompresses STATIC_ROOT. With TAILWIND_CDN on, pages load Tailwind's
+# in-browser compiler instead, so templates can be edited without a build.
+TAILWIND_CDN = config("TAILWIND_CDN", default=True, cast=bool)
+
+# Serve STATIC_ROOT from flashcards/static_server.py, in front of Django in
+# wsgi.py and asgi.py, with the .br/.gz copies build_assets writes and byte
+# ranges. Content-hashed names are cached for a year, the rest for
+# STATIC_MAX_AGE seconds. The files are indexed when the server starts.
+SERVE_STATIC = config("SERVE_STATIC", default=False, cast=bool)
+STATIC_MAX_AGE = config("STATIC_MAX_AGE", default=60, cast=int)
 
 MEDIA_URL = "media/"
 MEDIA_ROOT = BASE_DIR / "flashcards" / "media"
 
 
+# Listing pages
+# Keyset page size for the user, collection and study set listings.
+
+PAGE_SIZE = config("PAGE_SIZE", default=50, cast=int)
+MAX_PAGE_SIZE = config("MAX_PAGE_SIZE", default=500, cast=int)
+
+# Rows fetched per database round trip by the streaming JSON API.
+API_CHUNK_SIZE = config("API_CHUNK_SIZE", default=2000, cast=int)
+# ?shuffle=1 holds every card id of the set in memory; larger sets get a 400.
+API_SHUFFLE_MAX_CARDS = config("API_SHUFFLE_MAX_CARDS", default=10000, cast=int)
+
+# Random collection picker: primary key probes before falling back to the
+# nearest id, and how long the cached id range is trusted.
+RANDOM_PICK_ATTEMPTS = config("RANDOM_PICK_ATTEMPTS", default=3, cast=int)
+RANDOM_PICK_BOUNDS_TTL = config("RANDOM_PICK_BOUNDS_TTL", default=60, cast=int)
+
+# Cached (id, name) pages of the study set picker. Pages are retired by the
+# FlashcardSet signals in flashcards/signals.py, so this only bounds memory.
+SET_CATALOGUE_TTL = config("SET_CATALOGUE_TTL", default=3600, cast=int)
+
+# Default number of cards returned by the spaced-repetition due queue.
+DUE_CARDS_LIMIT = config("DUE_CARDS_LIMIT", default=20, cast=int)
+
+# Largest number of flashcards accepted by one create_flashcards request.
+MAX_CARDS_PER_BATCH = config("MAX_CARDS_PER_BATCH", default=1000, cast=int)
+
+# Lifetime of the cached card list on the set detail page. The fragment is
+# keyed on FlashcardSet.updated_at, which card changes bump.
+SET_CARDS_FRAGMENT_TTL = config("SET_CARDS_FRAGMENT_TTL", default=3600, cast=int)
+
+# New flashcard sets a non-admin may create per sliding window (a day). The
+# counters live in the default cache, which has to be shared (Redis or
+# Memcached) for the limit to hold across worker processes.
+SET_QUOTA_PER_DAY = config("SET_QUOTA_PER_DAY", default=20, cast=int)
+SET_QUOTA_WINDOW = config("SET_QUOTA_WINDOW", default=86400, cast=int)
+
+# Traffic capture for replay_traffic. When TRAFFIC_CAPTURE_PATH is set,
+# TRAFFIC_CAPTURE_SAMPLE of all requests (0 to 1) are appended to it as JSON
+# Lines, with the query and form fields in TRAFFIC_CAPTURE_REDACT blanked.
+TRAFFIC_CAPTURE_PATH = config("TRAFFIC_CAPTURE_PATH", default="")
+TRAFFIC_CAPTURE_SAMPLE = config("TRAFFIC_CAPTURE_SAMPLE", default=1.0, cast=float)
+TRAFFIC_CAPTURE_REDACT = config("TRAFFIC_CAPTURE_REDACT", default="password", cast=Csv())
+
+# Prometheus metrics at /metrics. Each worker process keeps its own totals;
+# with METRICS_DIR set they are written there every METRICS_FLUSH_SECONDS and
+# /metrics adds up every worker's file, folding those of exited workers into
+# one (see flashcards/metrics.py). Use a directory on local disk. A
+# METRICS_TOKEN requires "Authorization: Bearer <token>" to read the page.
+METRICS_DIR = config("METRICS_DIR", default="")
+METRICS_FLUSH_SECONDS = config("METRICS_FLUSH_SECONDS", default=5, cast=float)
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+
+# Slow query log. With SLOW_QUERY_LOG set, statements taking SLOW_QUERY_MS or
+# longer are appended to it as JSON Lines with the URL name, view, template
+# line and source line that ran them. The file rotates at
+# SLOW_QUERY_LOG_MAX_BYTES, keeping SLOW_QUERY_LOG_BACKUPS old files.
+SLOW_QUERY_LOG = config("SLOW_QUERY_LOG", default="")
+SLOW_QUERY_MS = config("SLOW_QUERY_MS", default=100, cast=float)
+SLOW_QUERY_LOG_MAX_BYTES = config("SLOW_QUERY_LOG_MAX_BYTES", default=10 * 1024 * 1024, cast=int)
+SLOW_QUERY_LOG_BACKUPS = config("SLOW_QUERY_LOG_BACKUPS", default=5, cast=int)
+
+if SLOW_QUERY_LOG:
+    LOGGING = {
+        "version": 1,
+        "disable_existing_loggers": False,
+        "formatters": {"message": {"format": "%(message)s"}},
+        "handlers": {
+            "slow_queries": {
+                "class": "logging.handlers.RotatingFileHandler",
+                "filename": SLOW_QUERY_LOG,
+                "maxBytes": SLOW_QUERY_LOG_MAX_BYTES,
+                "backupCount": SLOW_QUERY_LOG_BACKUPS,
+                "formatter": "message",
+            },
+        },
+        "loggers": {
+            "flashcards.slow_queries": {"handlers": ["slow_queries"], "level": "WARNING", "propagate": False},
+        },
+    }
+
+# On-demand profiling. With PROFILE_DIR set, a request carrying a token from
+# "manage.py profile_token <admin id>" in the X-Profile header or the
+# "profile" query parameter is sampled every PROFILE_INTERVAL_MS. The
+# collapsed stacks are kept in PROFILE_DIR, newest PROFILE_MAX_FILES only,
+# and listed at /profiles. Tokens expire after PROFILE_TOKEN_MAX_AGE seconds.
+PROFILE_DIR = config("PROFILE_DIR", default="")
+PROFILE_INTERVAL_MS = config("PROFILE_INTERVAL_MS", default=1.0, cast=float)
+PROFILE_MAX_FILES = config("PROFILE_MAX_FILES", default=50, cast=int)
+PROFILE_TOKEN_MAX_AGE = config("PROFILE_TOKEN_MAX_AGE", default=86400, cast=int)
+
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
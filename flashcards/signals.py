@@ -0,0 +1,97 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.utils import timezone
+from django.dispatch import receiver
+from flashcards.models import Comment, Flashcard, FlashcardSet, User
+from flashcards.core.cards import touch_flashcardset
+from flashcards.core.catalogue import invalidate_catalogue
+from flashcards.metrics import sql_wrapper
+from flashcards.slowlog import slow_query_wrapper
+
+
+# The catalogue moves to a new generation once the change is committed, so a
+# page rebuilt in between never caches the rows from before it.
+@receiver(post_save, sender=FlashcardSet)
+def flashcardset_saved(sender, instance, created, update_fields=None, using=None, **kwargs):
+    if not created and update_fields is not None and 'name' not in update_fields:
+        return
+    transaction.on_commit(invalidate_catalogue, using=using)
+
+
+@receiver(post_delete, sender=FlashcardSet)
+def flashcardset_deleted(sender, instance, using=None, **kwargs):
+    transaction.on_commit(invalidate_catalogue, using=using)
+
+
+@receiver(post_save, sender=Flashcard)
+def flashcard_saved(sender, instance, **kwargs):
+    if instance.flashcardset_id is not None:
+        touch_flashcardset(instance.flashcardset_id)
+
+
+@receiver(post_delete, sender=Flashcard)
+def flashcard_deleted(sender, instance, origin=None, **kwargs):
+    # Cards removed by deleting their set (or its author) leave nothing to refresh.
+    if isinstance(origin, Flashcard) and instance.flashcardset_id is not None:
+        touch_flashcardset(instance.flashcardset_id)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, **kwargs):
+    if instance.flashcardset_id is not None:
+        touch_flashcardset(instance.flashcardset_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Comment) and instance.flashcardset_id is not None:
+        touch_flashcardset(instance.flashcardset_id)
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, raw=False, using=None, update_fields=None, **kwargs):
+    # Compare with the stored name, so user_saved() only acts on a rename.
+    instance._renamed = False
+    if raw or instance.pk is None or (update_fields is not None and 'username' not in update_fields):
+        return
+    stored = User.objects.using(using).filter(pk=instance.pk).values_list('username', flat=True).first()
+    instance._renamed = stored is not None and stored != instance.username
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, **kwargs):
+    # Set pages show their author's and commenters' usernames and are validated
+    # on updated_at, so renaming the user bumps those sets.
+    if not getattr(instance, '_renamed', False):
+        return
+    FlashcardSet.objects.filter(Q(author=instance) | Q(comments__author=instance)).update(updated_at=timezone.now())
+
+
+@receiver(pre_delete, sender=User)
+def user_deleting(sender, instance, **kwargs):
+    # Deleting a user cascades to their comments on other people's sets; bump
+    # those sets in one UPDATE instead of once per comment.
+    FlashcardSet.objects.filter(comments__author=instance).exclude(author=instance).update(updated_at=timezone.now())
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {pragma} = {value}')
+
+
+@receiver(connection_created)
+def install_sql_wrappers(sender, connection, **kwargs):
+    wrappers = [sql_wrapper]
+    if settings.SLOW_QUERY_LOG:
+        wrappers.append(slow_query_wrapper)
+    for wrapper in wrappers:
+        # Pooled connections fire this on every checkout of the same wrapper.
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
@@ -0,0 +1,109 @@
+import json
+import logging
+import os
+import sys
+import time
+from contextvars import ContextVar
+from asgiref.sync import SyncToAsync
+from django.conf import settings
+from django.template.base import Node
+
+logger = logging.getLogger('flashcards.slow_queries')
+
+# The request being handled, set by SlowQueryMiddleware. Context variables
+# follow the request into the threads sync_to_async runs the ORM on.
+current_request = ContextVar('flashcards_current_request', default=None)
+# The asyncio task serving the request, also set by SlowQueryMiddleware. The
+# stack of a sync_to_async thread ends in the thread pool; the line of an async
+# view that awaited the ORM is on that task's chain of awaits instead.
+current_task = ContextVar('flashcards_current_task', default=None)
+
+_RENDER_CODE = Node.render_annotated.__code__
+_THREAD_HANDLER_CODE = SyncToAsync.thread_handler.__code__
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+_ROOT_DIR = os.path.dirname(_PACKAGE_DIR)
+# Frames of the request plumbing itself never explain a query.
+_SKIP_FILES = {os.path.join(_PACKAGE_DIR, name) for name in ('slowlog.py', 'metrics.py', 'middleware.py')}
+
+
+def slow_query_wrapper(execute, sql, params, many, context):
+    """execute_wrapper installed on every connection by flashcards.signals.
+
+    Only statements slower than SLOW_QUERY_MS are attributed and logged; for
+    the rest this costs two clock reads.
+    """
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        if elapsed * 1000 >= settings.SLOW_QUERY_MS:
+            log_slow_query(sql, many, context, elapsed)
+
+
+def awaiting_frames(task):
+    """Return the frames of a suspended task's coroutines, innermost first."""
+    frames = []
+    awaitable = task.get_coro() if task is not None else None
+    while awaitable is not None:
+        frame = getattr(awaitable, 'cr_frame', None) or getattr(awaitable, 'gi_frame', None)
+        if frame is None:
+            break
+        frames.append(frame)
+        awaitable = getattr(awaitable, 'cr_await', None) or getattr(awaitable, 'gi_yieldfrom', None)
+    return reversed(frames)
+
+
+def stack(frame):
+    """Walk outwards from frame, crossing from a sync_to_async thread to the
+    coroutine that is waiting for it."""
+    while frame is not None:
+        if frame.f_code is _THREAD_HANDLER_CODE:
+            yield from awaiting_frames(current_task.get())
+            return
+        yield frame
+        frame = frame.f_back
+
+
+def attribution(frame):
+    """Find the template node and the project source line on the stack.
+
+    The innermost Node.render_annotated frame is the tag or variable whose
+    rendering ran the query; the innermost frame in this package outside the
+    template engine is the line of our code that did.
+    """
+    template = source = None
+    for frame in stack(frame):
+        code = frame.f_code
+        if template is None and code is _RENDER_CODE:
+            node = frame.f_locals.get('self')
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None:
+                template = {'template': origin.template_name or origin.name,
+                            'line': token.lineno if token is not None else None}
+        elif (source is None and code.co_filename.startswith(_PACKAGE_DIR + os.sep)
+              and code.co_filename not in _SKIP_FILES):
+            source = f"{os.path.relpath(code.co_filename, _ROOT_DIR)}:{frame.f_lineno}"
+        if template is not None and source is not None:
+            break
+    return template, source
+
+
+def log_slow_query(sql, many, context, elapsed):
+    request = current_request.get()
+    match = getattr(request, 'resolver_match', None)
+    template, source = attribution(sys._getframe(2))
+    record = {
+        'ts': round(time.time(), 6),
+        'ms': round(elapsed * 1000, 3),
+        'alias': context['connection'].alias,
+        'sql': sql,
+        'many': many,
+        'url_name': match.url_name if match else None,
+        'view': f"{match.func.__module__}.{match.func.__qualname__}" if match else None,
+        'template': template['template'] if template else None,
+        'template_line': template['line'] if template else None,
+        'source': source,
+    }
+    logger.warning(json.dumps(record, separators=(',', ':'), default=str))
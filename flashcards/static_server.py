@@ -0,0 +1,298 @@
+import asyncio
+import json
+import mimetypes
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from http import HTTPStatus
+from django.conf import settings
+
+# Best first; the suffixes build_assets writes.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+IMMUTABLE = 'public, max-age=31536000, immutable'
+CHUNK_SIZE = 256 * 1024
+MANIFEST = 'staticfiles.json'
+
+
+class StaticFile:
+    def __init__(self, path, stat, content_type, cache_control):
+        self.path = path
+        self.size = stat.st_size
+        self.etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+        self.last_modified = formatdate(stat.st_mtime, usegmt=True)
+        self.mtime = int(stat.st_mtime)
+        self.content_type = content_type
+        self.cache_control = cache_control
+        # encoding: (path, size, etag) of each precompressed sibling.
+        self.variants = {}
+
+
+class Response:
+    def __init__(self, status, headers, path=None, offset=0, length=0):
+        self.status = status
+        self.headers = headers
+        self.path = path
+        self.offset = offset
+        self.length = length
+
+
+def _content_type(name):
+    content_type, _ = mimetypes.guess_type(name)
+    content_type = content_type or 'application/octet-stream'
+    if content_type.startswith('text/') or content_type in ('application/javascript', 'image/svg+xml'):
+        content_type += '; charset=utf-8'
+    return content_type
+
+
+def _accepted(accept_encoding):
+    """Return the encodings an Accept-Encoding header allows."""
+    accepted = set()
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        q = params.strip()
+        if q.startswith('q='):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def _byte_range(header, size):
+    """Parse a single "bytes=" range: (start, end) inclusive, None to serve the
+    whole file, or False when the range cannot be satisfied."""
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        # Other units and multiple ranges may be ignored (RFC 9110 14.2).
+        return None
+    first, dash, last = spec.strip().partition('-')
+    if not dash:
+        return None
+    try:
+        if first:
+            start = int(first)
+            if start >= size:
+                return False
+            end = int(last) if last else size - 1
+            if start > end:
+                return None
+        else:
+            suffix = int(last)
+            if suffix == 0:
+                return False
+            start, end = max(size - suffix, 0), size - 1
+    except ValueError:
+        return None
+    return start, min(end, size - 1)
+
+
+class StaticIndex:
+    """The files under STATIC_ROOT, read once when the server starts.
+
+    Names listed in the manifest ManifestStaticFilesStorage writes contain a
+    hash of their content, so they are cached by browsers for a year; other
+    files for STATIC_MAX_AGE seconds. Files added after startup are not
+    served until the next restart.
+    """
+
+    def __init__(self, root, prefix):
+        self.prefix = prefix
+        self.files = {}
+        if not root or not os.path.isdir(root):
+            return
+        hashed = set()
+        try:
+            with open(os.path.join(root, MANIFEST)) as f:
+                hashed = set(json.load(f)['paths'].values())
+        except (OSError, ValueError, KeyError):
+            pass
+        short = f'public, max-age={settings.STATIC_MAX_AGE}'
+        variant_suffixes = tuple(suffix for _, suffix in ENCODINGS)
+        for directory, _, names in os.walk(root):
+            for name in names:
+                path = os.path.join(directory, name)
+                relative = os.path.relpath(path, root).replace(os.sep, '/')
+                if name.endswith(variant_suffixes + ('.tmp',)) or relative == MANIFEST:
+                    continue
+                self.files[prefix + relative] = StaticFile(
+                    path, os.stat(path), _content_type(name), IMMUTABLE if relative in hashed else short,
+                )
+        for static_file in self.files.values():
+            for encoding, suffix in ENCODINGS:
+                try:
+                    stat = os.stat(static_file.path + suffix)
+                except FileNotFoundError:
+                    continue
+                static_file.variants[encoding] = (
+                    static_file.path + suffix, stat.st_size, f'{static_file.etag[:-1]}-{encoding}"',
+                )
+
+    def respond(self, method, path, headers):
+        """Build the response for a request, or None to pass it to Django.
+
+        headers maps lower-case header names to values.
+        """
+        static_file = self.files.get(path)
+        if static_file is None:
+            return None
+        if method not in ('GET', 'HEAD'):
+            return Response(405, [('Allow', 'GET, HEAD'), ('Content-Length', '0')])
+
+        file_path, size, etag, encoding = static_file.path, static_file.size, static_file.etag, None
+        range_header = headers.get('range')
+        if static_file.variants and not range_header:
+            # Byte ranges are served from the uncompressed file.
+            accepted = _accepted(headers.get('accept-encoding', ''))
+            for name, _ in ENCODINGS:
+                if name in accepted and name in static_file.variants:
+                    file_path, size, etag = static_file.variants[name]
+                    encoding = name
+                    break
+
+        response_headers = [
+            ('Content-Type', static_file.content_type),
+            ('Cache-Control', static_file.cache_control),
+            ('ETag', etag),
+            ('Last-Modified', static_file.last_modified),
+            ('Accept-Ranges', 'bytes'),
+        ]
+        if static_file.variants:
+            response_headers.append(('Vary', 'Accept-Encoding'))
+        if encoding:
+            response_headers.append(('Content-Encoding', encoding))
+
+        if self.not_modified(static_file, etag, headers):
+            return Response(304, response_headers)
+
+        if range_header and self.range_applies(static_file, headers.get('if-range')):
+            byte_range = _byte_range(range_header, size)
+            if byte_range is False:
+                response_headers.append(('Content-Range', f'bytes */{size}'))
+                response_headers.append(('Content-Length', '0'))
+                return Response(416, response_headers)
+            if byte_range is not None:
+                start, end = byte_range
+                response_headers.append(('Content-Range', f'bytes {start}-{end}/{size}'))
+                response_headers.append(('Content-Length', str(end - start + 1)))
+                return Response(206, response_headers, None if method == 'HEAD' else file_path,
+                                start, end - start + 1)
+
+        response_headers.append(('Content-Length', str(size)))
+        return Response(200, response_headers, None if method == 'HEAD' else file_path, 0, size)
+
+    def not_modified(self, static_file, etag, headers):
+        if_none_match = headers.get('if-none-match')
+        if if_none_match is not None:
+            tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+            return '*' in tags or etag in tags
+        if_modified_since = headers.get('if-modified-since')
+        if if_modified_since:
+            try:
+                return static_file.mtime <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def range_applies(self, static_file, if_range):
+        # A stale If-Range means the client's copy changed: send everything.
+        return if_range is None or if_range in (static_file.etag, static_file.last_modified)
+
+
+def build_index():
+    prefix = '/' + settings.STATIC_URL.lstrip('/')
+    if '://' in settings.STATIC_URL:
+        # Static files are served from another host.
+        return StaticIndex(None, prefix)
+    return StaticIndex(settings.STATIC_ROOT, prefix)
+
+
+def _status_line(status):
+    return f'{status} {HTTPStatus(status).phrase}'
+
+
+class StaticFilesWSGI:
+    def __init__(self, application, index):
+        self.application = application
+        self.index = index
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '').encode('latin-1').decode('utf-8', 'replace')
+        headers = {key[5:].replace('_', '-').lower(): value
+                   for key, value in environ.items() if key.startswith('HTTP_')}
+        response = self.index.respond(environ['REQUEST_METHOD'], path, headers)
+        if response is None:
+            return self.application(environ, start_response)
+        start_response(_status_line(response.status), response.headers)
+        if response.path is None:
+            return []
+        f = open(response.path, 'rb')
+        f.seek(response.offset)
+        if response.offset == 0 and response.length == os.fstat(f.fileno()).st_size:
+            file_wrapper = environ.get('wsgi.file_wrapper')
+            if file_wrapper is not None:
+                # Lets the server use sendfile().
+                return file_wrapper(f, CHUNK_SIZE)
+        return _read_file(f, response.length)
+
+
+def _read_file(f, length):
+    try:
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+class StaticFilesASGI:
+    def __init__(self, application, index):
+        self.application = application
+        self.index = index
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.application(scope, receive, send)
+        headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+        response = self.index.respond(scope['method'], scope['path'], headers)
+        if response is None:
+            return await self.application(scope, receive, send)
+        await send({
+            'type': 'http.response.start',
+            'status': response.status,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in response.headers],
+        })
+        if response.path is None:
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        # File reads run off the event loop.
+        f = await asyncio.to_thread(open, response.path, 'rb')
+        try:
+            await asyncio.to_thread(f.seek, response.offset)
+            remaining = response.length
+            while True:
+                chunk = await asyncio.to_thread(f.read, min(CHUNK_SIZE, remaining)) if remaining else b''
+                remaining -= len(chunk)
+                more = bool(chunk) and remaining > 0
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': more})
+                if not more:
+                    break
+        finally:
+            f.close()
+
+
+def wrap_wsgi(application):
+    """Serve STATIC_ROOT in front of the Django WSGI application when SERVE_STATIC is on."""
+    if not settings.SERVE_STATIC:
+        return application
+    return StaticFilesWSGI(application, build_index())
+
+
+def wrap_asgi(application):
+    """Serve STATIC_ROOT in front of the Django ASGI application when SERVE_STATIC is on."""
+    if not settings.SERVE_STATIC:
+        return application
+    return StaticFilesASGI(application, build_index())
@@ -0,0 +1,17 @@
+from django import template
+from django.conf import settings
+from django.templatetags.static import static
+from django.utils.html import format_html
+
+register = template.Library()
+
+TAILWIND_CDN_URL = 'https://cdn.tailwindcss.com'
+# Where build_assets writes the compiled stylesheet, relative to the static files.
+STYLESHEET = 'build/app.css'
+
+
+@register.simple_tag
+def stylesheet():
+    if settings.TAILWIND_CDN:
+        return format_html('<script src="{}"></script>', TAILWIND_CDN_URL)
+    return format_html('<link rel="stylesheet" href="{}">', static(STYLESHEET))
@@ -0,0 +1,320 @@
+import gzip
+import json
+import os
+import subprocess
+import tempfile
+from io import StringIO
+from unittest import mock, skipUnless
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from flashcards.models import User, FlashcardSet, Comment, Collection, Flashcard
+from flashcards.core.search import search_cards
+from flashcards.profiling import admin_from_token
+from flashcards.management.commands.bench_quota import quota_keys
+from flashcards.management.commands.export_to_json import Command as ExportCommand
+
+class InterruptedExport(ExportCommand):
+    def __init__(self, fail_after, **kwargs):
+        super().__init__(**kwargs)
+        self.fail_after = fail_after
+
+    def write_chunk(self, *args, **kwargs):
+        if self.fail_after == 0:
+            raise KeyboardInterrupt
+        self.fail_after -= 1
+        super().write_chunk(*args, **kwargs)
+
+class ExportToJsonTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="exporter", password="password")
+        cls.flashcard_set = FlashcardSet.objects.create(name="Export Set", author=cls.user)
+        for i in range(7):
+            Flashcard.objects.create(question=f"Q{i}", answer=f"A{i}", difficulty='Easy', flashcardset=cls.flashcard_set)
+        cls.comment = Comment.objects.create(comment="Nice", author=cls.user, flashcardset=cls.flashcard_set)
+        Collection.objects.create(name="Export Collection", author=cls.user, flashcardset=cls.flashcard_set, comment=cls.comment)
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.tmpdir.name, name)
+
+    def read_lines(self, path):
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt') as f:
+            return [json.loads(line) for line in f]
+
+    def test_export_plain(self):
+        output = self.path('export.jsonl')
+        call_command('export_to_json', output, '--chunk-size', '3', stdout=StringIO())
+
+        lines = self.read_lines(output)
+        self.assertEqual(len(lines), 11)
+        self.assertEqual([l['model'] for l in lines[:2]], ['flashcards.user', 'flashcards.flashcardset'])
+        self.assertEqual(lines[0]['fields']['username'], "exporter")
+        self.assertEqual(lines[2]['fields']['flashcardset_id'], self.flashcard_set.id)
+        self.assertFalse(os.path.exists(output + '.checkpoint'))
+
+    def test_export_gzip(self):
+        output = self.path('export.jsonl.gz')
+        call_command('export_to_json', output, '--chunk-size', '2', stdout=StringIO())
+
+        self.assertEqual(len(self.read_lines(output)), 11)
+
+    def test_resume_after_interruption(self):
+        for name in ('export.jsonl', 'export.jsonl.gz'):
+            with self.subTest(name=name):
+                expected = self.path('expected-' + name)
+                call_command('export_to_json', expected, '--chunk-size', '3', stdout=StringIO())
+
+                output = self.path(name)
+                with self.assertRaises(KeyboardInterrupt):
+                    call_command(InterruptedExport(fail_after=3), output, '--chunk-size', '3', stdout=StringIO())
+                with open(output + '.checkpoint') as f:
+                    self.assertEqual(json.load(f)['model'], 'flashcards.flashcard')
+
+                call_command('export_to_json', output, '--chunk-size', '3', '--resume', stdout=StringIO())
+
+                self.assertEqual(self.read_lines(output), self.read_lines(expected))
+                self.assertFalse(os.path.exists(output + '.checkpoint'))
+
+    def test_resume_without_checkpoint(self):
+        with self.assertRaises(CommandError):
+            call_command('export_to_json', self.path('missing.jsonl'), '--resume', stdout=StringIO())
+
+@skipUnless(connection.vendor == 'sqlite', "audit_query_plans reads SQLite query plans")
+class AuditQueryPlansTest(TestCase):
+    def test_views_have_no_full_scans(self):
+        out = StringIO()
+        call_command('audit_query_plans', '--rows', '300', '--large-table', '100', stdout=out)
+        self.assertIn("No full scans of large tables found.", out.getvalue())
+
+    def test_reports_scan_and_missing_index(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, 'flashcards_flashcard')
+            index = next(name for name, c in constraints.items() if c['index'] and c['columns'] == ['flashcardset_id'])
+            cursor.execute(f'DROP INDEX "{index}"')
+
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('audit_query_plans', '--rows', '300', '--large-table', '100', '--json', stdout=out)
+
+        findings = json.loads(out.getvalue())['findings']
+        self.assertIn('api_set_cards', {f['view'] for f in findings})
+        self.assertIn('flashcards_flashcard(flashcardset_id)', {f['suggested_index'] for f in findings})
+
+    def test_view_errors_fail_the_audit(self):
+        out = StringIO()
+        with mock.patch('flashcards.core.api.serialize_collection', side_effect=RuntimeError("boom")):
+            with self.assertRaisesMessage(CommandError, "1 view(s) raised."):
+                call_command('audit_query_plans', '--rows', '300', '--large-table', '100', '--json', stdout=out)
+
+        errors = json.loads(out.getvalue())['errors']
+        self.assertEqual(errors, [{'view': 'api_collection', 'error': "RuntimeError('boom')"}])
+
+@skipUnless(connection.vendor == 'sqlite', "bench_sqlite needs SQLite")
+class BenchSqliteTest(TestCase):
+    def test_reports_both_profiles(self):
+        out = StringIO()
+        call_command('bench_sqlite', '--workers', '2', '--seconds', '0.2', '--sets', '10', '--cards', '100',
+                     stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[1].startswith('defaults, reconnect'))
+        self.assertTrue(lines[2].startswith('SQLITE_PRAGMAS, persistent'))
+
+
+@skipUnless(connection.vendor == 'sqlite', "the FTS5 search index only exists on SQLite")
+class RebuildSearchIndexTest(TestCase):
+    def test_restores_rows_missing_from_the_index(self):
+        user = User.objects.create(username="indexer", password="password")
+        reqset = FlashcardSet.objects.create(name="Chemistry", author=user)
+        cards = [
+            Flashcard.objects.create(question=f"Element {i}", answer="Noble gas", difficulty='Easy', flashcardset=reqset)
+            for i in range(5)
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM flashcards_flashcard_fts")
+        self.assertEqual(search_cards("noble", 10), [])
+
+        call_command('rebuild_search_index', chunk_size=2, stdout=StringIO())
+        self.assertCountEqual([row['id'] for row in search_cards("noble", 10)], [card.id for card in cards])
+        self.assertEqual(len(search_cards("chemistry", 10)), 5)
+
+
+class BenchQuotaTest(TestCase):
+    def test_times_both_checks_and_races_workers(self):
+        cache.set('flashcards:unrelated', 'kept')
+        self.addCleanup(cache.delete, 'flashcards:unrelated')
+        out = StringIO()
+        call_command('bench_quota', '--sets', '50', '--samples', '20', '--workers', '2', '--attempts', '15',
+                     stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertTrue(lines[1].startswith('cached sliding window'))
+        self.assertTrue(lines[2].startswith('COUNT(*) of last 24h'))
+        self.assertIn('2 workers x 15 attempts on one user', lines[3])
+        self.assertEqual(FlashcardSet.objects.count(), 0)
+        # Only the benchmark's own counters are removed from the cache.
+        self.assertEqual(cache.get('flashcards:unrelated'), 'kept')
+        self.assertEqual(cache.get_many(quota_keys([0])), {})
+
+
+class SampleDataTest(TestCase):
+    def test_loads_into_a_migrated_database(self):
+        call_command('loaddata', 'sample_data', verbosity=0)
+        self.assertEqual(User.objects.count(), 2)
+        self.assertEqual(FlashcardSet.objects.count(), 2)
+        self.assertEqual(Collection.objects.count(), 2)
+
+
+class ProfileTokenTest(TestCase):
+    def test_issues_tokens_to_admins_only(self):
+        admin = User.objects.create(username="profiler", password="password", admin=True)
+        user = User.objects.create(username="regular", password="password")
+        out = StringIO()
+        call_command('profile_token', admin.id, stdout=out)
+        self.assertEqual(admin_from_token(out.getvalue().strip()), admin)
+        with self.assertRaisesMessage(CommandError, "is not an admin"):
+            call_command('profile_token', user.id, stdout=StringIO())
+
+
+MANIFEST_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'},
+}
+
+
+class BenchStartupTest(TestCase):
+    def test_times_each_settings_module_and_records_the_results(self):
+        fd, path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        # The production settings serve hashed static file names.
+        static_root = tempfile.TemporaryDirectory()
+        self.addCleanup(static_root.cleanup)
+        with override_settings(STATIC_ROOT=static_root.name, STORAGES=MANIFEST_STORAGES):
+            call_command('collectstatic', interactive=False, verbosity=0)
+        environ = {'ALLOWED_HOSTS': 'localhost', 'STATIC_ROOT': static_root.name, 'TAILWIND_CDN': 'True'}
+        self.enterContext(mock.patch.dict(os.environ, environ))
+        for _ in range(2):
+            out = StringIO()
+            call_command('bench_startup', '--runs', '1', '--record', path, stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual([line.split()[:2] for line in lines[1:7]], [
+            [module, target]
+            for module in ('flashcards.settings', 'flashcards.settings_production')
+            for target in ('wsgi', 'asgi', 'check')
+        ])
+        self.assertTrue(lines[7].startswith('previous: '))
+        with open(path) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(len(records), 2)
+        self.assertIn('first_response_ms', records[1]['results']['flashcards.settings_production']['wsgi'])
+
+    def test_missing_manifest_is_reported(self):
+        static_root = tempfile.TemporaryDirectory()
+        self.addCleanup(static_root.cleanup)
+        environ = {'ALLOWED_HOSTS': 'localhost', 'STATIC_ROOT': static_root.name, 'TAILWIND_CDN': 'True'}
+        self.enterContext(mock.patch.dict(os.environ, environ))
+        with self.assertRaisesMessage(CommandError, "run 'manage.py build_assets'"):
+            call_command('bench_startup', '--runs', '1', '--modules', 'flashcards.settings_production',
+                         stdout=StringIO())
+
+    def test_production_settings_leave_out_the_dev_apps(self):
+        from flashcards import settings_production
+        self.assertFalse(settings_production.DEBUG)
+        self.assertNotIn('django_browser_reload', settings_production.INSTALLED_APPS)
+        self.assertNotIn('django_browser_reload.middleware.BrowserReloadMiddleware', settings_production.MIDDLEWARE)
+        self.assertNotIn('django.template.context_processors.debug',
+                         settings_production.TEMPLATES[0]['OPTIONS']['context_processors'])
+
+
+class BuildAssetsTest(TestCase):
+    def setUp(self):
+        source = tempfile.TemporaryDirectory()
+        static_root = tempfile.TemporaryDirectory()
+        self.addCleanup(source.cleanup)
+        self.addCleanup(static_root.cleanup)
+        self.source, self.static_root = source.name, static_root.name
+        self.enterContext(override_settings(STATICFILES_DIRS=[self.source], STATIC_ROOT=self.static_root,
+                                            STORAGES=MANIFEST_STORAGES))
+        self.css = '.mx-auto{margin-left:auto;margin-right:auto}' * 20
+
+    def tailwind(self, command, **kwargs):
+        output = command[command.index('-o') + 1]
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        with open(output, 'w') as f:
+            f.write(self.css)
+        return subprocess.CompletedProcess(command, 0, '', '')
+
+    def test_builds_hashes_and_compresses_the_stylesheet(self):
+        out = StringIO()
+        with mock.patch('flashcards.management.commands.build_assets.subprocess.run', self.tailwind):
+            call_command('build_assets', stdout=out)
+
+        with open(os.path.join(self.static_root, 'staticfiles.json')) as f:
+            hashed = json.load(f)['paths']['build/app.css']
+        self.assertRegex(hashed, r'^build/app\.[0-9a-f]{12}\.css$')
+        with gzip.open(os.path.join(self.static_root, hashed + '.gz'), 'rt') as f:
+            self.assertEqual(f.read(), self.css)
+        self.assertIn(f'stylesheet is {hashed}', out.getvalue())
+
+    def test_skip_css_needs_a_built_stylesheet(self):
+        with self.assertRaisesMessage(CommandError, "has not been built"):
+            call_command('build_assets', '--skip-css', stdout=StringIO())
+
+    def test_reports_tailwind_failures(self):
+        failed = subprocess.CompletedProcess([], 1, '', 'npm error could not determine executable to run')
+        with mock.patch('flashcards.management.commands.build_assets.subprocess.run', return_value=failed):
+            with self.assertRaisesMessage(CommandError, "could not determine executable"):
+                call_command('build_assets', stdout=StringIO())
+
+    @override_settings(STORAGES={'default': MANIFEST_STORAGES['default'], 'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}})
+    def test_needs_a_hashing_storage(self):
+        with self.assertRaisesMessage(CommandError, "settings_production"):
+            call_command('build_assets', stdout=StringIO())
+
+
+class ReplayTrafficTest(TransactionTestCase):
+    def setUp(self):
+        user = User.objects.create(username="replayed", password="password")
+        self.set = FlashcardSet.objects.create(name="Replayed", author=user)
+        fd, self.path = tempfile.mkstemp(suffix='.jsonl')
+        records = [
+            {'ts': 100.0, 'method': 'GET', 'path': reverse('search_set'), 'query': {'set_id': [str(self.set.id)]}},
+            {'ts': 100.01, 'method': 'GET', 'path': reverse('api_search'), 'query': {'q': ['replayed']}},
+            {'ts': 100.02, 'method': 'POST', 'path': reverse('create_flashcard_set'),
+             'form': {'user_id': [str(user.id)], 'set_name': ['from replay']}},
+            {'ts': 100.03, 'method': 'GET', 'path': '/missing'},
+        ]
+        with os.fdopen(fd, 'w') as f:
+            f.writelines(json.dumps(record) + '\n' for record in records)
+        self.addCleanup(os.remove, self.path)
+
+    def replay(self, *args):
+        out = StringIO()
+        call_command('replay_traffic', self.path, '--concurrency', '2', *args, stdout=out)
+        return {line.split()[0]: line.split()[1:3] for line in out.getvalue().splitlines()[1:-1]}
+
+    def test_replays_through_wsgi(self):
+        rows = self.replay()
+        self.assertEqual(rows['search_set'], ['1', '0'])
+        self.assertEqual(rows['api_search'], ['1', '0'])
+        self.assertEqual(rows['create_flashcard_set'], ['1', '0'])
+        self.assertEqual(rows['unresolved'], ['0', '1'])
+        self.assertTrue(FlashcardSet.objects.filter(name='from replay').exists())
+
+    def test_replays_through_asgi_as_fast_as_possible(self):
+        rows = self.replay('--asgi', '--speed', '0')
+        self.assertEqual(rows['search_set'], ['1', '0'])
+        self.assertEqual(rows['create_flashcard_set'], ['1', '0'])
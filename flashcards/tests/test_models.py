@@ -1,7 +1,11 @@
+from datetime import timedelta
+from unittest import skipUnless
 from django.test import TestCase
-from django.db import IntegrityError
+from django.db import IntegrityError, connection
 from django.core.exceptions import ValidationError
-from flashcards.models import User, FlashcardSet, Comment, Collection, Flashcard, DifficultyLevel
+from django.utils import timezone
+from flashcards.models import User, FlashcardSet, Comment, Collection, Flashcard, DifficultyLevel, ReviewState
+from flashcards.core import scheduler
 
 class UserModelTest(TestCase):
     @classmethod
@@ -290,3 +294,97 @@ class FlashcardModelTest(TestCase):
         )
 
         self.assertIsNone(flashcard.difficulty)
+
+class ReviewStateModelTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="learner", password="password")
+        cls.flashcard_set = FlashcardSet.objects.create(name="Review Set", author=cls.user)
+        cls.easy = Flashcard.objects.create(question="Easy?", answer="Yes", difficulty=DifficultyLevel.EASY, flashcardset=cls.flashcard_set)
+        cls.hard = Flashcard.objects.create(question="Hard?", answer="Yes", difficulty=DifficultyLevel.HARD, flashcardset=cls.flashcard_set)
+        cls.unrated = Flashcard.objects.create(question="Unrated?", answer="Yes", flashcardset=cls.flashcard_set)
+        cls.now = timezone.now()
+
+    def test_enroll_seeds_ease_from_difficulty(self):
+        scheduler.enroll(self.user, self.flashcard_set.id, now=self.now)
+
+        states = {s.flashcard_id: s for s in ReviewState.objects.filter(user=self.user)}
+        self.assertEqual(len(states), 3)
+        self.assertEqual(states[self.easy.id].ease_factor, 2.6)
+        self.assertEqual(states[self.hard.id].ease_factor, 2.2)
+        self.assertEqual(states[self.unrated.id].ease_factor, 2.5)
+        self.assertEqual(states[self.easy.id].due_at, self.now)
+
+    def test_enroll_twice_keeps_existing_state(self):
+        scheduler.enroll(self.user, self.flashcard_set.id, now=self.now)
+        state = ReviewState.objects.get(user=self.user, flashcard=self.easy)
+        scheduler.review(state, 5, now=self.now)
+
+        scheduler.enroll(self.user, self.flashcard_set.id, now=self.now)
+
+        self.assertEqual(ReviewState.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(ReviewState.objects.get(pk=state.pk).repetitions, 1)
+
+    def test_review_intervals_follow_difficulty(self):
+        scheduler.enroll(self.user, self.flashcard_set.id, now=self.now)
+        easy = ReviewState.objects.get(user=self.user, flashcard=self.easy)
+        hard = ReviewState.objects.get(user=self.user, flashcard=self.hard)
+
+        self.assertEqual(scheduler.review(easy, 4, now=self.now).interval_days, 3)
+        self.assertEqual(scheduler.review(hard, 4, now=self.now).interval_days, 1)
+        self.assertEqual(scheduler.review(easy, 4, now=self.now).interval_days, 8)
+        self.assertEqual(scheduler.review(easy, 4, now=self.now).interval_days, round(8 * 2.6))
+        self.assertEqual(easy.due_at, self.now + timedelta(days=easy.interval_days))
+
+    def test_failed_review_resets_repetitions(self):
+        scheduler.enroll(self.user, self.flashcard_set.id, now=self.now)
+        state = ReviewState.objects.get(user=self.user, flashcard=self.hard)
+        scheduler.review(state, 5, now=self.now)
+        scheduler.review(state, 5, now=self.now)
+
+        scheduler.review(state, 1, now=self.now)
+
+        self.assertEqual(state.repetitions, 0)
+        self.assertEqual(state.interval_days, 1)
+        self.assertGreaterEqual(state.ease_factor, scheduler.MIN_EASE_FACTOR)
+
+    def test_lapsed_easy_card_relearns_after_a_day(self):
+        scheduler.enroll(self.user, self.flashcard_set.id, now=self.now)
+        state = ReviewState.objects.get(user=self.user, flashcard=self.easy)
+        scheduler.review(state, 5, now=self.now)
+        scheduler.review(state, 5, now=self.now)
+
+        scheduler.review(state, 2, now=self.now)
+        self.assertEqual(state.interval_days, 1)
+        self.assertEqual(state.due_at, self.now + timedelta(days=1))
+        # The Easy seed of 3 days is only for cards never reviewed.
+        self.assertEqual(scheduler.review(state, 4, now=self.now).interval_days, 1)
+
+    def test_ease_factor_floor(self):
+        scheduler.enroll(self.user, self.flashcard_set.id, now=self.now)
+        state = ReviewState.objects.get(user=self.user, flashcard=self.hard)
+        for _ in range(10):
+            scheduler.review(state, 0, now=self.now)
+        self.assertEqual(state.ease_factor, scheduler.MIN_EASE_FACTOR)
+
+    @skipUnless(connection.vendor == 'sqlite', "asserts SQLite's query plan")
+    def test_due_cards_uses_user_due_index(self):
+        plan = scheduler.due_cards(self.user, 10).explain()
+        self.assertIn("review_user_due_idx", plan)
+        self.assertNotIn("USE TEMP B-TREE", plan)
+
+    def test_unique_state_per_user_and_card(self):
+        ReviewState.objects.create(user=self.user, flashcard=self.easy, due_at=self.now)
+        with self.assertRaises(IntegrityError):
+            ReviewState.objects.create(user=self.user, flashcard=self.easy, due_at=self.now)
+
+@skipUnless(connection.vendor == 'sqlite', "SQLite pragmas")
+class SqlitePragmaTest(TestCase):
+    def test_pragmas_applied_to_new_connections(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA temp_store')
+            self.assertEqual(cursor.fetchone()[0], 2)
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0], -64000)
@@ -0,0 +1,165 @@
+import os
+import tempfile
+from unittest import mock
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+from flashcards.models import User, FlashcardSet, Comment, Collection, Flashcard, ReviewState
+from flashcards.profiling import make_token
+from flashcards.urls import urlpatterns
+
+# Exact number of queries each view runs with a cold cache. Every named URL in
+# flashcards/urls.py must appear here, and the count must not change when the
+# number of related rows grows.
+EXPECTED_QUERIES = {
+    'index': 0,
+    'list_users': 1,
+    'submit_form': 1,
+    'success': 0,
+    'search_id': 1,
+    'delete_user': 15,
+    'search_user': 1,
+    'list_sets': 1,
+    'create_flashcard_set': 2,
+    'search_set': 3,
+    'delete_set': 9,
+    'update_set': 2,
+    'comment_set': 4,
+    'search_flashcard': 1,
+    'list_collections': 1,
+    'search_col': 1,
+    'update_collection': 2,
+    'create_collection': 2,
+    'list_all_collections': 1,
+    'delete_collection': 2,
+    'random_collection': 3,
+    'create_flashcards': 5,
+    'userhub': 0,
+    'sethub': 0,
+    'collectionhub': 0,
+    'study_flashcards': 2,
+    'metrics': 0,
+    'profile_list': 1,
+    'profile_detail': 1,
+    'api_search': 1,
+    'api_sets': 1,
+    'api_set_cards': 2,
+    'api_random_collection': 3,
+    'api_collection': 1,
+    'api_due_cards': 2,
+    'api_study_set': 4,
+    'api_record_review': 2,
+}
+
+class QueryCountTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="counted", password="password")
+        cls.set = FlashcardSet.objects.create(name="Counted Set", author=cls.user)
+        cls.comment = Comment.objects.create(comment="Counted", author=cls.user, flashcardset=cls.set)
+        cls.collection = Collection.objects.create(
+            name="Counted Collection", author=cls.user, flashcardset=cls.set, comment=cls.comment,
+        )
+        cls.card = Flashcard.objects.create(question="Q", answer="A", difficulty='Easy', flashcardset=cls.set)
+        ReviewState.objects.create(user=cls.user, flashcard=cls.card, due_at=timezone.now())
+        cls.token = make_token(User.objects.create(username="profiler", password="password", admin=True))
+
+    def setUp(self):
+        profile_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(profile_dir.cleanup)
+        for suffix, content in (('.folded', 'view 1\n'), ('.json', '{"name": "stored"}')):
+            with open(os.path.join(profile_dir.name, 'stored' + suffix), 'w') as f:
+                f.write(content)
+        settings_override = override_settings(PROFILE_DIR=profile_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def add_rows(self, count):
+        for i in range(count):
+            other = User.objects.create(username=f"other{i}", password="password")
+            flashcard_set = FlashcardSet.objects.create(name=f"Set {i}", author=self.user)
+            comment = Comment.objects.create(comment=f"Comment {i}", author=other, flashcardset=self.set)
+            Collection.objects.create(name=f"Collection {i}", author=self.user, flashcardset=flashcard_set, comment=comment)
+            card = Flashcard.objects.create(question=f"Q{i}", answer=f"A{i}", difficulty='Hard', flashcardset=self.set)
+            ReviewState.objects.create(user=self.user, flashcard=card, due_at=timezone.now())
+
+    def scenarios(self):
+        user_id = self.user.id
+        set_id = self.set.id
+        col_id = self.collection.id
+        return {
+            'index': ('get', reverse('index'), {}),
+            'list_users': ('get', reverse('list_users'), {}),
+            'submit_form': ('post', reverse('submit_form'), {'username': 'new', 'password': 'new'}),
+            'success': ('get', reverse('success'), {}),
+            'search_id': ('post', reverse('search_id'), {'user_id': user_id}),
+            'delete_user': ('post', reverse('delete_user'), {'id': user_id}),
+            'search_user': ('post', reverse('search_user'), {'user_id': user_id}),
+            'list_sets': ('post', reverse('list_sets'), {'user_id': user_id}),
+            'create_flashcard_set': ('post', reverse('create_flashcard_set'), {'user_id': user_id, 'set_name': 'new'}),
+            'search_set': ('post', reverse('search_set'), {'set_id': set_id}),
+            'delete_set': ('post', reverse('delete_set'), {'set_id': set_id}),
+            'update_set': ('post', reverse('update_set'), {'set_id': set_id, 'name': 'renamed', 'update': ''}),
+            'comment_set': ('post', reverse('comment_set'), {'set_id': set_id, 'comment': 'new', 'author': user_id}),
+            'search_flashcard': ('post', reverse('search_flashcard'), {'set_id': set_id}),
+            'list_collections': ('post', reverse('list_collections'), {'user_id': user_id}),
+            'search_col': ('post', reverse('search_col'), {'col_id': col_id}),
+            'update_collection': ('post', reverse('update_collection'), {'col_id': col_id, 'name': 'renamed', 'update': ''}),
+            'create_collection': ('post', reverse('create_collection'), {'colname': 'new', 'user_id': user_id}),
+            'list_all_collections': ('get', reverse('list_all_collections'), {}),
+            'delete_collection': ('post', reverse('delete_collection'), {'col_id': col_id}),
+            'random_collection': ('get', reverse('random_collection'), {}),
+            'create_flashcards': ('post', reverse('create_flashcards'), {
+                'set_id': set_id, 'question': 'q', 'answer': 'a', 'difficulty': 'Easy', 'add': '',
+            }),
+            'userhub': ('get', reverse('userhub'), {}),
+            'sethub': ('get', reverse('sethub'), {}),
+            'collectionhub': ('get', reverse('collectionhub'), {}),
+            'study_flashcards': ('post', reverse('study_flashcards'), {'flashcard_set': set_id}),
+            'metrics': ('get', reverse('metrics'), {}),
+            'profile_list': ('get', reverse('profile_list'), {'profile': self.token}),
+            'profile_detail': ('get', reverse('profile_detail', args=['stored']), {'profile': self.token}),
+            'api_search': ('get', reverse('api_search'), {'q': 'Q'}),
+            'api_sets': ('get', reverse('api_sets'), {}),
+            'api_set_cards': ('get', reverse('api_set_cards', args=[set_id]), {}),
+            'api_random_collection': ('get', reverse('api_random_collection'), {}),
+            'api_collection': ('get', reverse('api_collection', args=[col_id]), {}),
+            'api_due_cards': ('get', reverse('api_due_cards', args=[user_id]), {}),
+            'api_study_set': ('post', reverse('api_study_set', args=[user_id, set_id]), {}),
+            'api_record_review': ('post', reverse('api_record_review', args=[user_id]), {'card_id': self.card.id, 'quality': 4}),
+        }
+
+    def count_queries(self, name):
+        method, url, data = self.scenarios()[name]
+        cache.clear()
+        # Probe the lowest id so the random picker never misses a gap in the
+        # ids, which backends with shared sequences (PostgreSQL) leave behind.
+        with mock.patch('flashcards.core.randompick.random.randint', side_effect=lambda low, high: low), \
+                transaction.atomic():
+            with CaptureQueriesContext(connection) as captured:
+                if method == 'post' and name.startswith('api_') and data:
+                    response = self.client.post(url, data, content_type='application/json')
+                else:
+                    response = getattr(self.client, method)(url, data)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            self.assertLess(response.status_code, 400, name)
+            transaction.set_rollback(True)
+        return len(captured)
+
+    def test_every_named_url_is_pinned(self):
+        names = {p.name for p in urlpatterns if isinstance(p, URLPattern) and p.name}
+        self.assertEqual(names, set(EXPECTED_QUERIES))
+
+    def test_query_counts(self):
+        small = {name: self.count_queries(name) for name in EXPECTED_QUERIES}
+        self.add_rows(10)
+        large = {name: self.count_queries(name) for name in EXPECTED_QUERIES}
+
+        for name, expected in EXPECTED_QUERIES.items():
+            with self.subTest(view=name):
+                self.assertEqual(small[name], expected, f"{name} ran {small[name]} queries")
+                self.assertEqual(large[name], small[name], f"{name} grows with row count")
@@ -0,0 +1,128 @@
+from datetime import timedelta
+from unittest import mock
+from django.core.cache import cache
+from django.db.models.query import QuerySet
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.utils import timezone
+from flashcards.core import catalogue, views
+from flashcards.middleware import PIN_COOKIE, PrimaryPinMiddleware
+from flashcards.models import FlashcardSet
+from flashcards.routers import PrimaryReplicaRouter, end_request, recently_written, start_request
+
+router = PrimaryReplicaRouter()
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'], REPLICA_PIN_SECONDS=5)
+class PrimaryReplicaRouterTest(SimpleTestCase):
+    def serve(self, view, cookies=None):
+        request = RequestFactory().get('/')
+        request.COOKIES.update(cookies or {})
+        return PrimaryPinMiddleware(view)(request)
+
+    def test_reads_go_to_replicas(self):
+        seen = []
+
+        def view(request):
+            seen.append({router.db_for_read(FlashcardSet) for _ in range(10)})
+            return HttpResponse()
+
+        for _ in range(50):
+            response = self.serve(view)
+        # Each request sticks to one replica; requests spread over all of them.
+        self.assertTrue(all(len(replicas) == 1 for replicas in seen))
+        self.assertEqual(set().union(*seen), {'replica1', 'replica2'})
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_writes_pin_the_rest_of_the_request(self):
+        seen = []
+
+        def view(request):
+            seen.append(router.db_for_read(FlashcardSet))
+            seen.append(router.db_for_write(FlashcardSet))
+            seen.append(router.db_for_read(FlashcardSet))
+            return HttpResponse()
+
+        response = self.serve(view)
+        self.assertIn(seen[0], ['replica1', 'replica2'])
+        self.assertEqual(seen[1:], ['default', 'default'])
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 5)
+
+    def test_pin_cookie_reads_from_primary(self):
+        seen = []
+
+        def view(request):
+            seen.append(router.db_for_read(FlashcardSet))
+            return HttpResponse()
+
+        response = self.serve(view, cookies={PIN_COOKIE: '1'})
+        self.assertEqual(seen, ['default'])
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_outside_requests_use_primary(self):
+        self.assertEqual(router.db_for_read(FlashcardSet), 'default')
+        router.db_for_write(FlashcardSet)
+        self.assertEqual(router.db_for_read(FlashcardSet), 'default')
+
+    def test_replicas_are_not_migrated(self):
+        self.assertTrue(router.allow_migrate('default', 'flashcards'))
+        self.assertFalse(router.allow_migrate('replica1', 'flashcards'))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas_reads_from_primary(self):
+        seen = []
+
+        def view(request):
+            seen.append(router.db_for_read(FlashcardSet))
+            return HttpResponse()
+
+        self.serve(view)
+        self.assertEqual(seen, ['default'])
+
+    def test_recently_written(self):
+        self.assertTrue(recently_written(timezone.now()))
+        self.assertFalse(recently_written(timezone.now() - timedelta(seconds=6)))
+
+    async def test_catalogue_refilled_from_primary_after_invalidation(self):
+        seen = []
+
+        async def akeyset_page(queryset, **window):
+            seen.append(queryset.db)
+            return mock.Mock(object_list=[], next_cursor=None, prev_cursor=None)
+
+        self.addCleanup(cache.delete, catalogue.INVALIDATED_CACHE_KEY)
+        request = RequestFactory().get('/')
+        token = start_request(pinned=False)
+        try:
+            with mock.patch.object(catalogue, 'akeyset_page', akeyset_page):
+                catalogue.invalidate_catalogue()
+                # Once replicas have caught up, pages are built from them again.
+                await cache.adelete(catalogue.INVALIDATED_CACHE_KEY)
+                await catalogue.aset_catalogue_page(request)
+                catalogue.invalidate_catalogue()
+                await catalogue.aset_catalogue_page(request)
+        finally:
+            end_request(token)
+        self.assertIn(seen[0], ['replica1', 'replica2'])
+        self.assertEqual(seen[1], 'default')
+
+    async def test_set_cards_read_from_primary_right_after_a_change(self):
+        seen = []
+
+        def aiter(queryset):
+            seen.append(queryset.db)
+            return self.no_rows()
+
+        token = start_request(pinned=False)
+        try:
+            with mock.patch.object(QuerySet, '__aiter__', aiter):
+                for updated_at in (timezone.now() - timedelta(minutes=1), timezone.now()):
+                    await views.set_cards_fragment(FlashcardSet(id=0, updated_at=updated_at))
+        finally:
+            end_request(token)
+        self.assertIn(seen[0], ['replica1', 'replica2'])
+        self.assertEqual(seen[1], 'default')
+
+    async def no_rows(self):
+        return
+        yield
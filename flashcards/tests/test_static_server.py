@@ -0,0 +1,134 @@
+import asyncio
+import gzip
+import io
+import json
+import os
+import tempfile
+from django.test import SimpleTestCase, override_settings
+from flashcards.static_server import StaticFilesASGI, StaticFilesWSGI, StaticIndex, wrap_wsgi
+
+CSS = b'.mx-auto{margin-left:auto;margin-right:auto}' * 20
+HASHED = 'build/app.0123456789ab.css'
+
+
+def django_app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [b'django']
+
+
+async def django_asgi(scope, receive, send):
+    await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+    await send({'type': 'http.response.body', 'body': b'django'})
+
+
+@override_settings(STATIC_MAX_AGE=60)
+class StaticServerTest(SimpleTestCase):
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        os.makedirs(os.path.join(root.name, 'build'))
+        for name in ('build/app.css', HASHED):
+            with open(os.path.join(root.name, name), 'wb') as f:
+                f.write(CSS)
+        with open(os.path.join(root.name, HASHED + '.gz'), 'wb') as f:
+            f.write(gzip.compress(CSS))
+        with open(os.path.join(root.name, HASHED + '.br'), 'wb') as f:
+            f.write(b'brotli bytes')
+        with open(os.path.join(root.name, 'staticfiles.json'), 'w') as f:
+            json.dump({'paths': {'build/app.css': HASHED}, 'version': '1.1'}, f)
+        self.index = StaticIndex(root.name, '/static/')
+        self.app = StaticFilesWSGI(django_app, self.index)
+
+    def get(self, path, method='GET', **headers):
+        environ = {'REQUEST_METHOD': method, 'PATH_INFO': path, 'wsgi.input': io.BytesIO()}
+        environ.update({'HTTP_' + name.upper(): value for name, value in headers.items()})
+        started = {}
+
+        def start_response(status, response_headers):
+            started['status'] = int(status.split()[0])
+            started['headers'] = dict(response_headers)
+
+        body = b''.join(self.app(environ, start_response))
+        return started['status'], started['headers'], body
+
+    def test_hashed_files_are_immutable(self):
+        status, headers, body = self.get('/static/' + HASHED)
+        self.assertEqual(status, 200)
+        self.assertEqual(headers['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(headers['Content-Type'], 'text/css; charset=utf-8')
+        self.assertEqual(body, CSS)
+        self.assertEqual(self.get('/static/build/app.css')[1]['Cache-Control'], 'public, max-age=60')
+
+    def test_picks_the_best_accepted_encoding(self):
+        status, headers, body = self.get('/static/' + HASHED, accept_encoding='gzip, deflate, br')
+        self.assertEqual((headers['Content-Encoding'], body), ('br', b'brotli bytes'))
+        self.assertEqual(headers['Vary'], 'Accept-Encoding')
+
+        status, headers, body = self.get('/static/' + HASHED, accept_encoding='br;q=0, gzip')
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(body), CSS)
+        self.assertEqual(headers['Content-Length'], str(len(body)))
+
+        status, headers, body = self.get('/static/' + HASHED)
+        self.assertNotIn('Content-Encoding', headers)
+        self.assertEqual(body, CSS)
+
+    def test_byte_ranges(self):
+        status, headers, body = self.get('/static/' + HASHED, range='bytes=4-11', accept_encoding='gzip')
+        self.assertEqual((status, body), (206, CSS[4:12]))
+        self.assertEqual(headers['Content-Range'], f'bytes 4-11/{len(CSS)}')
+        self.assertNotIn('Content-Encoding', headers)
+
+        status, headers, body = self.get('/static/' + HASHED, range='bytes=-5')
+        self.assertEqual((status, body), (206, CSS[-5:]))
+
+        status, headers, body = self.get('/static/' + HASHED, range=f'bytes={len(CSS)}-')
+        self.assertEqual((status, headers['Content-Range'], body), (416, f'bytes */{len(CSS)}', b''))
+
+        # Multiple ranges, and ranges of a copy the client no longer has, get the whole file.
+        self.assertEqual(self.get('/static/' + HASHED, range='bytes=0-1,4-5')[0], 200)
+        self.assertEqual(self.get('/static/' + HASHED, range='bytes=0-1', if_range='"stale"')[0], 200)
+
+    def test_conditional_requests(self):
+        etag = self.get('/static/' + HASHED, accept_encoding='gzip')[1]['ETag']
+        status, _, body = self.get('/static/' + HASHED, accept_encoding='gzip', if_none_match=etag)
+        self.assertEqual((status, body), (304, b''))
+        # The uncompressed file has another ETag.
+        self.assertEqual(self.get('/static/' + HASHED, if_none_match=etag)[0], 200)
+
+        last_modified = self.get('/static/' + HASHED)[1]['Last-Modified']
+        self.assertEqual(self.get('/static/' + HASHED, if_modified_since=last_modified)[0], 304)
+
+    def test_other_requests(self):
+        status, headers, body = self.get('/static/' + HASHED, method='HEAD')
+        self.assertEqual((status, headers['Content-Length'], body), (200, str(len(CSS)), b''))
+        self.assertEqual(self.get('/static/' + HASHED, method='POST')[:2], (405, {'Allow': 'GET, HEAD',
+                                                                                  'Content-Length': '0'}))
+        self.assertEqual(self.get('/static/missing.css')[2], b'django')
+        self.assertEqual(self.get('/static/staticfiles.json')[2], b'django')
+        self.assertEqual(self.get('/homepage')[2], b'django')
+
+    def test_asgi(self):
+        app = StaticFilesASGI(django_asgi, self.index)
+
+        async def request(path, headers=()):
+            scope = {'type': 'http', 'method': 'GET', 'path': path, 'headers': list(headers)}
+            messages = []
+
+            async def send(message):
+                messages.append(message)
+
+            await app(scope, None, send)
+            return messages[0], b''.join(message.get('body', b'') for message in messages[1:])
+
+        start, body = asyncio.run(request('/static/' + HASHED, [(b'range', b'bytes=0-7')]))
+        self.assertEqual((start['status'], body), (206, CSS[:8]))
+        self.assertIn((b'content-range', f'bytes 0-7/{len(CSS)}'.encode()), start['headers'])
+
+        start, body = asyncio.run(request('/static/' + HASHED, [(b'accept-encoding', b'gzip')]))
+        self.assertEqual(gzip.decompress(body), CSS)
+        self.assertEqual(asyncio.run(request('/homepage'))[1], b'django')
+
+    @override_settings(SERVE_STATIC=False)
+    def test_off_by_default(self):
+        self.assertIs(wrap_wsgi(django_app), django_app)
@@ -1,8 +1,27 @@
 import json
-from django.test import TestCase
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from unittest import mock, skipUnless
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.core.cache import cache
+from django.db import connection
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.http import HttpResponseForbidden
 from flashcards.models import User, FlashcardSet, Comment, Collection, Flashcard, DifficultyLevel
+from flashcards import metrics, profiling
+from flashcards.slowlog import slow_query_wrapper
+from flashcards.core import pages, views
+from flashcards.core.catalogue import catalogue_generation
+from flashcards.core.quota import take_set_quota
+from flashcards.core.randompick import BOUNDS_CACHE_KEY, collection_id_bounds, random_collection
 
 class UserListViewTest(TestCase):
 
@@ -243,7 +262,7 @@ class SearchSetByIdTest(TestCase):
         self.assertContains(response, self.set.name)
         self.assertContains(response, formatted_created_at)
         self.assertContains(response, formatted_updated_at)
-        self.assertContains(response, self.user.id)
+        self.assertContains(response, self.user.username)
 
     def test_search_set_not_found(self):
         url = reverse('search_set')
@@ -255,6 +274,16 @@ class SearchSetByIdTest(TestCase):
         self.assertNotContains(response, "Created:")
         self.assertNotContains(response, "Updated:")
         self.assertNotContains(response, "Author:")
+
+    def test_lookups_by_get_report_missing_ids(self):
+        for name, data, message in [
+            ('search_set', {'set_id': 999}, "No flashcard set found with that Id."),
+            ('search_flashcard', {'set_id': 999}, "No flashcards in this set. Try adding some!"),
+            ('study_flashcards', {'flashcard_set': 999}, "No flashcards available in the selected set"),
+        ]:
+            with self.subTest(view=name):
+                self.assertContains(self.client.get(reverse(name), data), message)
+                self.assertNotContains(self.client.get(reverse(name)), message)
     
 class DeleteSetTest(TestCase):
     @classmethod
@@ -870,4 +899,1045 @@ class CreateFlashcardTest(TestCase):
 
         response = self.client.post(url, form_data)
         self.assertEqual(response.status_code, 403)
-    
\ No newline at end of file
+    
+
+class KeysetPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create(username=f"pageuser{i}", password="password") for i in range(5)]
+        cls.sets = [FlashcardSet.objects.create(name=f"Page Set {i}", author=cls.users[0]) for i in range(5)]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_list_users_first_page(self):
+        response = self.client.get(reverse('list_users'), {'size': 2})
+
+        self.assertEqual(response.status_code, 200)
+        page = response.context['page']
+        self.assertEqual([u['id'] for u in page], [u.id for u in self.users[:2]])
+        self.assertEqual(page.next_cursor, self.users[1].id)
+        self.assertFalse(page.has_prev)
+        self.assertContains(response, 'pageuser1')
+        self.assertNotContains(response, 'pageuser2')
+
+    def test_list_users_next_and_prev(self):
+        response = self.client.get(reverse('list_users'), {'size': 2, 'after': self.users[1].id})
+        page = response.context['page']
+        self.assertEqual([u['id'] for u in page], [u.id for u in self.users[2:4]])
+        self.assertEqual(page.prev_cursor, self.users[2].id)
+        self.assertEqual(page.next_cursor, self.users[3].id)
+
+        response = self.client.get(reverse('list_users'), {'size': 2, 'before': page.prev_cursor})
+        page = response.context['page']
+        self.assertEqual([u['id'] for u in page], [u.id for u in self.users[:2]])
+        self.assertFalse(page.has_prev)
+        self.assertEqual(page.next_cursor, self.users[1].id)
+
+    def test_list_users_last_page(self):
+        response = self.client.get(reverse('list_users'), {'size': 2, 'after': self.users[3].id})
+        page = response.context['page']
+        self.assertEqual([u['id'] for u in page], [self.users[4].id])
+        self.assertFalse(page.has_next)
+
+    def test_page_size_is_capped(self):
+        with self.settings(MAX_PAGE_SIZE=3):
+            response = self.client.get(reverse('list_users'), {'size': 1000})
+        self.assertEqual(len(response.context['page']), 3)
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        response = self.client.get(reverse('list_users'), {'after': 'abc'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page']), 5)
+
+    def test_study_set_picker_is_paginated(self):
+        response = self.client.get(reverse('study_flashcards'), {'size': 3})
+
+        self.assertContains(response, 'Page Set 2')
+        self.assertNotContains(response, 'Page Set 3')
+        self.assertContains(response, f'after={self.sets[2].id}')
+
+    def test_list_all_collections_is_paginated(self):
+        for i in range(3):
+            Collection.objects.create(name=f"Page Collection {i}", author=self.users[0])
+
+        response = self.client.get(reverse('list_all_collections'), {'size': 2})
+
+        self.assertContains(response, 'Page Collection 1')
+        self.assertNotContains(response, 'Page Collection 2')
+        self.assertTrue(response.context['page'].has_next)
+
+class StreamingApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="apiuser", password="password")
+        cls.set = FlashcardSet.objects.create(name="Api Set", author=cls.user)
+        cls.other_set = FlashcardSet.objects.create(name="Other Api Set", author=cls.user)
+        for i in range(5):
+            Flashcard.objects.create(question=f"Q{i}", answer=f"A{i}", difficulty='Hard', flashcardset=cls.set)
+
+    def read_json(self, response):
+        self.assertTrue(response.streaming)
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_list_sets(self):
+        response = self.client.get(reverse('api_sets'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        data = self.read_json(response)
+        self.assertEqual([s['name'] for s in data], ["Api Set", "Other Api Set"])
+        self.assertIn('created_at', data[0])
+
+    def test_set_cards_streamed_in_chunks(self):
+        with self.settings(API_CHUNK_SIZE=2):
+            response = self.client.get(reverse('api_set_cards', args=[self.set.id]))
+            chunks = list(response.streaming_content)
+
+        self.assertEqual(len(chunks), 5)
+        data = json.loads(b''.join(chunks))
+        self.assertEqual([c['question'] for c in data], [f"Q{i}" for i in range(5)])
+        self.assertEqual(data[0], {'question': 'Q0', 'answer': 'A0', 'difficulty': 'hard'})
+
+    def test_set_cards_shuffle(self):
+        response = self.client.get(reverse('api_set_cards', args=[self.set.id]), {'shuffle': 'true'})
+        data = self.read_json(response)
+        self.assertEqual(sorted(c['question'] for c in data), [f"Q{i}" for i in range(5)])
+
+    def test_set_cards_shuffle_does_not_sort_in_database(self):
+        with self.settings(API_CHUNK_SIZE=2), CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('api_set_cards', args=[self.set.id]), {'shuffle': '1'})
+            data = self.read_json(response)
+
+        self.assertEqual(sorted(c['question'] for c in data), [f"Q{i}" for i in range(5)])
+        self.assertFalse(any('RAND' in q['sql'].upper() for q in queries))
+
+    async def test_streamed_asynchronously_under_asgi(self):
+        with self.settings(API_CHUNK_SIZE=2):
+            for params in ({}, {'shuffle': '1'}):
+                response = await self.async_client.get(reverse('api_set_cards', args=[self.set.id]), params)
+                self.assertTrue(response.is_async)
+                chunks = [chunk async for chunk in response.streaming_content]
+                data = json.loads(b''.join(chunks))
+                self.assertEqual(sorted(c['question'] for c in data), [f"Q{i}" for i in range(5)])
+        self.assertEqual(data[0]['difficulty'], 'hard')
+
+    def test_shuffle_is_capped(self):
+        with self.settings(API_SHUFFLE_MAX_CARDS=4):
+            response = self.client.get(reverse('api_set_cards', args=[self.set.id]), {'shuffle': '1'})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'message': "Sets of more than 4 cards cannot be shuffled"})
+            # Unshuffled sets of any size still stream.
+            self.assertEqual(len(self.read_json(self.client.get(reverse('api_set_cards', args=[self.set.id])))), 5)
+
+    def test_empty_set(self):
+        response = self.client.get(reverse('api_set_cards', args=[self.other_set.id]))
+        self.assertEqual(self.read_json(response), [])
+
+    def test_set_cards_not_found(self):
+        response = self.client.get(reverse('api_set_cards', args=[999]))
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'message': "The flashcard set was not found"})
+
+    def test_post_not_allowed(self):
+        response = self.client.post(reverse('api_sets'))
+        self.assertEqual(response.status_code, 405)
+
+class RandomCollectionPickerTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="randomuser", password="password")
+        cls.collections = [Collection.objects.create(name=f"Random {i}", author=cls.user) for i in range(10)]
+
+    def setUp(self):
+        cache.delete(BOUNDS_CACHE_KEY)
+
+    def test_picks_existing_collection(self):
+        ids = {c.id for c in self.collections}
+        for _ in range(20):
+            self.assertIn(random_collection().id, ids)
+
+    def test_picks_across_gaps(self):
+        Collection.objects.exclude(id=self.collections[4].id).delete()
+        with self.settings(RANDOM_PICK_ATTEMPTS=1):
+            for _ in range(10):
+                self.assertEqual(random_collection().id, self.collections[4].id)
+
+    def test_stale_bounds_after_table_emptied(self):
+        random_collection()
+        Collection.objects.all().delete()
+
+        self.assertIsNone(random_collection())
+        self.assertIsNone(cache.get(BOUNDS_CACHE_KEY))
+
+    def test_picker_does_not_scan_table(self):
+        with self.settings(RANDOM_PICK_ATTEMPTS=3):
+            with self.assertNumQueries(2):
+                collection_id_bounds()
+            with self.assertNumQueries(1):
+                self.assertIsNotNone(random_collection())
+
+    def test_api_redirects_to_random_collection(self):
+        response = self.client.get(reverse('api_random_collection'))
+
+        self.assertEqual(response.status_code, 302)
+        detail = self.client.get(response['Location'])
+        self.assertEqual(detail.status_code, 200)
+        self.assertEqual(detail.json()['author']['username'], "randomuser")
+
+    def test_api_no_collections(self):
+        Collection.objects.all().delete()
+
+        response = self.client.get(reverse('api_random_collection'))
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'message': "There are no flashcard set collections"})
+
+class SetCatalogueCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="catalogueuser", password="password")
+        cls.set = FlashcardSet.objects.create(name="Catalogue Set", author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_second_render_needs_no_catalogue_query(self):
+        url = reverse('study_flashcards')
+        self.client.get(url)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertContains(response, "Catalogue Set")
+
+    def test_create_invalidates(self):
+        url = reverse('study_flashcards')
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            FlashcardSet.objects.create(name="Brand New Set", author=self.user)
+
+        self.assertContains(self.client.get(url), "Brand New Set")
+
+    def test_rename_invalidates(self):
+        url = reverse('study_flashcards')
+        self.client.get(url)
+        self.set.name = "Renamed Set"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.set.save()
+
+        response = self.client.get(url)
+        self.assertContains(response, "Renamed Set")
+        self.assertNotContains(response, "Catalogue Set")
+
+    def test_delete_invalidates(self):
+        url = reverse('study_flashcards')
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.set.delete()
+
+        self.assertNotContains(self.client.get(url), "Catalogue Set")
+
+    def test_unrelated_field_update_keeps_cache(self):
+        self.client.get(reverse('study_flashcards'))
+        generation = catalogue_generation()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.set.save(update_fields=['updated_at'])
+
+        self.assertEqual(catalogue_generation(), generation)
+
+    def test_invalidated_only_once_committed(self):
+        generation = catalogue_generation()
+        with self.captureOnCommitCallbacks() as callbacks:
+            FlashcardSet.objects.create(name="Uncommitted Set", author=self.user)
+            self.assertEqual(catalogue_generation(), generation)
+
+        callbacks[0]()
+        self.assertNotEqual(catalogue_generation(), generation)
+
+class DueQueueApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="studier", password="password")
+        cls.set = FlashcardSet.objects.create(name="Due Set", author=cls.user)
+        cls.cards = [
+            Flashcard.objects.create(question=f"Due Q{i}", answer=f"Due A{i}", difficulty='Medium', flashcardset=cls.set)
+            for i in range(3)
+        ]
+
+    def enroll(self):
+        response = self.client.post(reverse('api_study_set', args=[self.user.id, self.set.id]))
+        self.assertEqual(response.status_code, 201)
+
+    def test_due_queue_after_enroll(self):
+        self.enroll()
+
+        response = self.client.get(reverse('api_due_cards', args=[self.user.id]), {'limit': 2})
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data), 2)
+        self.assertEqual(data[0]['difficulty'], 'medium')
+
+    def test_review_moves_card_out_of_queue(self):
+        self.enroll()
+        card = self.cards[0]
+
+        response = self.client.post(
+            reverse('api_record_review', args=[self.user.id]),
+            json.dumps({'card_id': card.id, 'quality': 5}),
+            content_type='application/json',
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['interval_days'], 1)
+        due = self.client.get(reverse('api_due_cards', args=[self.user.id])).json()
+        self.assertNotIn(card.id, [c['card_id'] for c in due])
+
+    def test_review_invalid_quality(self):
+        self.enroll()
+        response = self.client.post(
+            reverse('api_record_review', args=[self.user.id]),
+            json.dumps({'card_id': self.cards[0].id, 'quality': 9}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_review_card_id_out_of_range(self):
+        self.enroll()
+        for card_id in (99999999999999999999, 0, -1):
+            response = self.client.post(
+                reverse('api_record_review', args=[self.user.id]),
+                json.dumps({'card_id': card_id, 'quality': 3}),
+                content_type='application/json',
+            )
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'message': "card_id must be an integer"})
+
+    def test_review_card_not_enrolled(self):
+        response = self.client.post(
+            reverse('api_record_review', args=[self.user.id]),
+            json.dumps({'card_id': self.cards[0].id, 'quality': 3}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_unknown_user(self):
+        self.assertEqual(self.client.get(reverse('api_due_cards', args=[999])).status_code, 404)
+        self.assertEqual(self.client.post(reverse('api_study_set', args=[999, self.set.id])).status_code, 404)
+
+class BatchCreateFlashcardTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="batchuser", password="password")
+        cls.flashcard_set = FlashcardSet.objects.create(name="Batch Set", author=cls.user)
+
+    def test_form_creates_many_cards_in_one_insert(self):
+        form_data = {
+            'set_id': self.flashcard_set.id,
+            'question': ['Q1', 'Q2', 'Q3', ''],
+            'answer': ['A1', 'A2', 'A3', ''],
+            'difficulty': ['Easy', 'M', 'hard', ''],
+            'add': '',
+        }
+
+        response = self.client.post(reverse('create_flashcards'), form_data)
+
+        self.assertRedirects(response, '/success')
+        cards = list(Flashcard.objects.filter(flashcardset=self.flashcard_set).order_by('id'))
+        self.assertEqual([c.question for c in cards], ['Q1', 'Q2', 'Q3'])
+        self.assertEqual([c.difficulty for c in cards], ['Easy', 'Medium', 'Hard'])
+
+    def test_form_reports_row_errors_and_creates_nothing(self):
+        form_data = {
+            'set_id': self.flashcard_set.id,
+            'question': ['Q1', '', 'Q3'],
+            'answer': ['A1', 'A2', 'A3'],
+            'difficulty': ['Easy', 'Easy', 'Xenu'],
+            'add': '',
+        }
+
+        response = self.client.post(reverse('create_flashcards'), form_data)
+
+        self.assertEqual(response.status_code, 403)
+        self.assertContains(response, "Card 2:", status_code=403)
+        self.assertContains(response, "Card 3: You must enter a valid difficulty.", status_code=403)
+        self.assertFalse(Flashcard.objects.exists())
+
+    def test_api_creates_cards(self):
+        cards = [{'question': f'Q{i}', 'answer': f'A{i}', 'difficulty': 'easy'} for i in range(200)]
+
+        with self.assertNumQueries(5):
+            response = self.client.post(
+                reverse('api_set_cards', args=[self.flashcard_set.id]),
+                json.dumps(cards),
+                content_type='application/json',
+            )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()), 200)
+        self.assertEqual(response.json()[0], {'question': 'Q0', 'answer': 'A0', 'difficulty': 'easy'})
+        self.assertEqual(Flashcard.objects.filter(flashcardset=self.flashcard_set).count(), 200)
+
+    def test_api_reports_row_errors(self):
+        cards = [
+            {'question': 'Q0', 'answer': 'A0', 'difficulty': 'easy'},
+            {'question': 'Q1', 'difficulty': 'easy'},
+            'not a card',
+        ]
+
+        response = self.client.post(
+            reverse('api_set_cards', args=[self.flashcard_set.id]),
+            json.dumps(cards),
+            content_type='application/json',
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([e['index'] for e in response.json()['errors']], [1, 2])
+        self.assertFalse(Flashcard.objects.exists())
+
+    def test_api_rejects_oversized_batch(self):
+        cards = [{'question': 'Q', 'answer': 'A', 'difficulty': 'easy'}] * 3
+        with self.settings(MAX_CARDS_PER_BATCH=2):
+            response = self.client.post(
+                reverse('api_set_cards', args=[self.flashcard_set.id]),
+                json.dumps(cards),
+                content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 400)
+
+    def test_api_unknown_set(self):
+        response = self.client.post(reverse('api_set_cards', args=[999]), '[]', content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+
+class SetDetailFragmentCacheTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="viewer", password="password")
+        cls.flashcard_set = FlashcardSet.objects.create(name="Detail Set", author=cls.user)
+        Comment.objects.create(comment="Nice set", author=cls.user, flashcardset=cls.flashcard_set)
+        Flashcard.objects.create(question="Q1", answer="A1", difficulty='Easy', flashcardset=cls.flashcard_set)
+
+    def setUp(self):
+        cache.clear()
+
+    def view(self):
+        return self.client.post(reverse('search_set'), {'set_id': self.flashcard_set.id})
+
+    def test_shows_cards_and_comment_authors(self):
+        response = self.view()
+
+        self.assertContains(response, "Q1")
+        self.assertContains(response, "Nice set")
+        self.assertContains(response, "viewer")
+
+    def test_cached_fragment_skips_card_query(self):
+        self.view()
+        with self.assertNumQueries(2):
+            response = self.view()
+        self.assertContains(response, "Q1")
+
+    def test_adding_a_card_refreshes_fragment(self):
+        self.view()
+        Flashcard.objects.create(question="Q2", answer="A2", difficulty='Hard', flashcardset=self.flashcard_set)
+
+        self.assertContains(self.view(), "Q2")
+
+    def test_batch_create_refreshes_fragment(self):
+        self.view()
+        self.client.post(
+            reverse('api_set_cards', args=[self.flashcard_set.id]),
+            json.dumps([{'question': 'Batch Q', 'answer': 'A', 'difficulty': 'Medium'}]),
+            content_type='application/json',
+        )
+
+        self.assertContains(self.view(), "Batch Q")
+
+    def test_deleting_a_card_refreshes_fragment(self):
+        self.view()
+        Flashcard.objects.get(question="Q1").delete()
+
+        self.assertNotContains(self.view(), "Q1")
+
+class ConditionalGetTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="reader", password="password")
+        cls.flashcard_set = FlashcardSet.objects.create(name="Conditional Set", author=cls.user)
+        Flashcard.objects.create(question="Q1", answer="A1", difficulty='Easy', flashcardset=cls.flashcard_set)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_lookups_work_over_get(self):
+        response = self.client.get(reverse('search_set'), {'set_id': self.flashcard_set.id})
+        self.assertContains(response, "Conditional Set")
+        self.assertTrue(response.has_header('ETag'))
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        response = self.client.get(reverse('search_flashcard'), {'set_id': self.flashcard_set.id})
+        self.assertContains(response, "Q1")
+
+    def test_out_of_range_ids_are_not_found(self):
+        for name, param, message in [
+            ('search_set', 'set_id', "No flashcard set found with that Id."),
+            ('search_flashcard', 'set_id', "No flashcards in this set. Try adding some!"),
+            ('study_flashcards', 'flashcard_set', "No flashcards available in the selected set"),
+        ]:
+            for value in ('99999999999999999999', '-1'):
+                with self.subTest(view=name, value=value):
+                    response = self.client.get(reverse(name), {param: value})
+                    self.assertContains(response, message)
+
+    def test_matching_etag_returns_304_without_rendering(self):
+        for name, params in [
+            ('search_set', {'set_id': self.flashcard_set.id}),
+            ('search_flashcard', {'set_id': self.flashcard_set.id}),
+            ('study_flashcards', {'flashcard_set': self.flashcard_set.id}),
+            ('study_flashcards', {}),
+        ]:
+            with self.subTest(view=name, params=params):
+                etag = self.client.get(reverse(name), params)['ETag']
+                response = self.client.get(reverse(name), params, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.templates, [])
+                self.assertEqual(response.content, b'')
+
+    def test_matching_last_modified_returns_304(self):
+        url = reverse('search_set')
+        params = {'set_id': self.flashcard_set.id}
+        last_modified = self.client.get(url, params)['Last-Modified']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, params, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_card_change_invalidates_etag(self):
+        url = reverse('search_flashcard')
+        params = {'set_id': self.flashcard_set.id}
+        etag = self.client.get(url, params)['ETag']
+        Flashcard.objects.create(question="Q2", answer="A2", difficulty='Hard', flashcardset=self.flashcard_set)
+
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, "Q2")
+
+    def test_comment_invalidates_etag(self):
+        url = reverse('search_set')
+        params = {'set_id': self.flashcard_set.id}
+        etag = self.client.get(url, params)['ETag']
+        Comment.objects.create(comment="Fresh comment", author=self.user, flashcardset=self.flashcard_set)
+
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, "Fresh comment")
+
+    def test_catalogue_change_invalidates_study_etag(self):
+        url = reverse('study_flashcards')
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            FlashcardSet.objects.create(name="Brand New Set", author=self.user)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, "Brand New Set")
+
+    def test_deleting_commenter_invalidates_etag(self):
+        commenter = User.objects.create(username="commenter", password="password")
+        Comment.objects.create(comment="Soon gone", author=commenter, flashcardset=self.flashcard_set)
+        url = reverse('search_set')
+        params = {'set_id': self.flashcard_set.id}
+        etag = self.client.get(url, params)['ETag']
+        commenter.delete()
+
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertNotContains(response, "Soon gone")
+
+    def test_renaming_author_or_commenter_invalidates_etag(self):
+        commenter = User.objects.create(username="commenter", password="password")
+        Comment.objects.create(comment="Hello", author=commenter, flashcardset=self.flashcard_set)
+        url = reverse('search_set')
+        params = {'set_id': self.flashcard_set.id}
+        for user, new_name in [(self.user, "renamed author"), (commenter, "renamed commenter")]:
+            with self.subTest(user=user.username):
+                etag = self.client.get(url, params)['ETag']
+                user.username = new_name
+                user.save()
+
+                response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+                self.assertContains(response, new_name)
+
+    def test_saving_user_without_rename_keeps_etag(self):
+        url = reverse('search_set')
+        params = {'set_id': self.flashcard_set.id}
+        etag = self.client.get(url, params)['ETag']
+        self.user.password = "changed"
+        self.user.save()
+        User.objects.get(pk=self.user.pk).save()
+
+        self.assertEqual(self.client.get(url, params, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_post_and_missing_sets_are_not_validated(self):
+        response = self.client.post(reverse('search_set'), {'set_id': self.flashcard_set.id})
+        self.assertFalse(response.has_header('ETag'))
+
+        response = self.client.get(reverse('search_set'), {'set_id': 999})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+
+class StaticPagesTest(TestCase):
+
+    def setUp(self):
+        pages._rendered.clear()
+        self.addCleanup(pages._rendered.clear)
+
+    def test_pages_extend_base_layout(self):
+        response = self.client.get(reverse('userhub'))
+
+        self.assertTemplateUsed(response, 'user_hub.html')
+        self.assertTemplateUsed(response, 'base.html')
+        self.assertContains(response, '<title>User Hub</title>', html=True)
+
+    @override_settings(PRODUCTION_RENDERING=True)
+    def test_production_serves_prerendered_bytes(self):
+        pages.prerender_pages()
+        for name in ['index', 'success', 'userhub', 'sethub', 'collectionhub']:
+            with self.subTest(view=name):
+                response = self.client.get(reverse(name))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.templates, [])
+                self.assertEqual(response['Content-Type'], 'text/html; charset=utf-8')
+
+    @override_settings(PRODUCTION_RENDERING=True)
+    def test_prerendered_matches_rendered(self):
+        with override_settings(PRODUCTION_RENDERING=False):
+            rendered = self.client.get(reverse('sethub')).content
+
+        self.assertEqual(self.client.get(reverse('sethub')).content, rendered)
+        self.assertEqual(self.client.get(reverse('sethub')).templates, [])
+
+    def test_pages_load_the_tailwind_cdn_in_development(self):
+        self.assertContains(self.client.get(reverse('sethub')), '<script src="https://cdn.tailwindcss.com"></script>')
+
+    @override_settings(TAILWIND_CDN=False)
+    def test_pages_link_the_built_stylesheet(self):
+        response = self.client.get(reverse('sethub'))
+
+        self.assertContains(response, '<link rel="stylesheet" href="/static/build/app.css">')
+        self.assertNotContains(response, 'cdn.tailwindcss.com')
+
+    # No manifest: as before the first build_assets run.
+    @override_settings(PRODUCTION_RENDERING=True, TAILWIND_CDN=False, STATIC_ROOT=os.path.dirname(__file__), STORAGES={
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'}})
+    def test_prerendering_waits_for_collected_static_files(self):
+        pages.prerender_pages()
+        self.assertEqual(pages._rendered, {})
+
+class AsyncReadViewsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="async reader", password="password")
+        cls.flashcard_set = FlashcardSet.objects.create(name="Async Set", author=cls.user)
+        cls.comment = Comment.objects.create(comment="Async comment", author=cls.user, flashcardset=cls.flashcard_set)
+        cls.collection = Collection.objects.create(
+            name="Async Collection", author=cls.user, flashcardset=cls.flashcard_set, comment=cls.comment,
+        )
+        Flashcard.objects.create(question="Async Q", answer="A", difficulty='Easy', flashcardset=cls.flashcard_set)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_read_views_are_async(self):
+        from flashcards.core import views
+        for name in ['list_users', 'list_sets', 'list_collections', 'list_all_collections', 'search_id',
+                     'search_set', 'search_col', 'search_flashcard', 'study_flashcards']:
+            with self.subTest(view=name):
+                self.assertTrue(iscoroutinefunction(getattr(views, name)))
+
+    async def test_read_views_under_async_client(self):
+        set_id = self.flashcard_set.id
+        for method, name, data, expected in [
+            ('get', 'list_users', {}, "async reader"),
+            ('post', 'list_sets', {'user_id': self.user.id}, "Async Set"),
+            ('post', 'list_collections', {'user_id': self.user.id}, "Async comment"),
+            ('get', 'list_all_collections', {}, "Async Set"),
+            ('post', 'search_id', {'user_id': self.user.id}, "async reader"),
+            ('get', 'search_set', {'set_id': set_id}, "Async comment"),
+            ('post', 'search_col', {'col_id': self.collection.id}, "Async comment"),
+            ('get', 'search_flashcard', {'set_id': set_id}, "Async Q"),
+            ('get', 'study_flashcards', {'flashcard_set': set_id}, "Async Q"),
+        ]:
+            with self.subTest(view=name):
+                response = await getattr(self.async_client, method)(reverse(name), data)
+                self.assertContains(response, expected)
+
+
+class SearchApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="searcher", password="password")
+        cls.biology = FlashcardSet.objects.create(name="Biology", author=cls.user)
+        cls.history = FlashcardSet.objects.create(name="History", author=cls.user)
+        cls.in_question = Flashcard.objects.create(
+            question="What does a cell membrane do?", answer="It controls what enters",
+            difficulty='Easy', flashcardset=cls.biology,
+        )
+        cls.in_answer = Flashcard.objects.create(
+            question="What is the smallest unit of life?", answer="The cell",
+            difficulty='Hard', flashcardset=cls.biology,
+        )
+        cls.unrelated = Flashcard.objects.create(
+            question="When did the Roman empire fall?", answer="476 AD",
+            difficulty='Medium', flashcardset=cls.history,
+        )
+
+    def search(self, query, **params):
+        response = self.client.get(reverse('api_search'), {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_ranks_question_matches_first(self):
+        body = self.search("cell")
+        self.assertEqual([row['id'] for row in body['results']], [self.in_question.id, self.in_answer.id])
+        first = body['results'][0]
+        self.assertEqual(first['set_id'], self.biology.id)
+        self.assertEqual(first['set_name'], "Biology")
+        self.assertEqual(first['difficulty'], 'easy')
+        self.assertGreater(first['score'], body['results'][1]['score'])
+
+    def test_matches_set_name(self):
+        body = self.search("history")
+        self.assertEqual([row['id'] for row in body['results']], [self.unrelated.id])
+
+    def test_index_follows_writes(self):
+        Flashcard.objects.filter(id=self.unrelated.id).update(question="Where is the cell nucleus?")
+        self.assertIn(self.unrelated.id, [row['id'] for row in self.search("nucleus")['results']])
+        FlashcardSet.objects.filter(id=self.history.id).update(name="Cytology")
+        self.assertEqual([row['id'] for row in self.search("cytology")['results']], [self.unrelated.id])
+        self.in_question.delete()
+        self.assertNotIn(self.in_question.id, [row['id'] for row in self.search("membrane")['results']])
+
+    def test_paginates_with_offset(self):
+        first = self.search("cell", size=1)
+        self.assertEqual(len(first['results']), 1)
+        self.assertEqual(first['next_offset'], 1)
+        second = self.search("cell", size=1, offset=first['next_offset'])
+        self.assertEqual([row['id'] for row in second['results']], [self.in_answer.id])
+        self.assertIsNone(second['next_offset'])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(self.search('(cell) "membrane: ^')['results'][0]['id'], self.in_question.id)
+        self.assertEqual(self.search('-')['results'], [])
+
+    @skipUnless(connection.vendor == 'sqlite', "prefix matching uses the FTS5 index")
+    def test_last_word_matches_as_prefix(self):
+        self.assertEqual([row['id'] for row in self.search("membr")['results']], [self.in_question.id])
+
+    def test_requires_query(self):
+        response = self.client.get(reverse('api_search'), {'q': '  '})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('api_search'), {'q': 'cell', 'offset': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(SET_QUOTA_PER_DAY=3, SET_QUOTA_WINDOW=100)
+class SetQuotaTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="prolific", password="password")
+        cls.admin = User.objects.create(username="boss", password="password", admin=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def create_set(self, user):
+        return self.client.post(reverse('create_flashcard_set'), {'user_id': user.id, 'set_name': 'quota'})
+
+    def test_rejects_sets_over_the_quota(self):
+        for _ in range(3):
+            self.assertEqual(self.create_set(self.user).status_code, 302)
+        response = self.create_set(self.user)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(FlashcardSet.objects.filter(author=self.user).count(), 3)
+
+    def test_admins_are_exempt(self):
+        for _ in range(5):
+            self.assertEqual(self.create_set(self.admin).status_code, 302)
+
+    def test_quota_is_per_user(self):
+        other = User.objects.create(username="other", password="password")
+        for _ in range(3):
+            self.create_set(self.user)
+        self.assertEqual(self.create_set(other).status_code, 302)
+
+    def test_previous_window_fades_out(self):
+        for _ in range(3):
+            self.assertTrue(take_set_quota(self.user, now=1000))
+        self.assertFalse(take_set_quota(self.user, now=1099))
+        # Halfway through the next window half of the old hits still count.
+        self.assertTrue(take_set_quota(self.user, now=1150))
+        self.assertFalse(take_set_quota(self.user, now=1150))
+        self.assertTrue(take_set_quota(self.user, now=1290))
+
+    def test_concurrent_requests_never_exceed_the_quota(self):
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda _: take_set_quota(self.user, now=1000), range(40)))
+        self.assertEqual(results.count(True), 3)
+
+
+class TrafficCaptureTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="captured", password="password")
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+
+    def records(self):
+        with open(self.path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_records_requests(self):
+        with override_settings(TRAFFIC_CAPTURE_PATH=self.path):
+            self.client.get(reverse('search_set'), {'set_id': 999, 'profile': 'admin-token'})
+            self.client.post(reverse('submit_form'), {'username': 'new', 'password': 'secret',
+                                                      'csrfmiddlewaretoken': 'token'})
+            self.client.post(reverse('api_record_review', args=[self.user.id]), {'card_id': 1, 'quality': 4},
+                             content_type='application/json')
+
+        lookup, form, api = self.records()
+        self.assertEqual(lookup['method'], 'GET')
+        self.assertEqual(lookup['path'], reverse('search_set'))
+        self.assertEqual(lookup['query'], {'set_id': ['999']})
+        self.assertEqual(lookup['url_name'], 'search_set')
+        self.assertEqual(lookup['status'], 200)
+        self.assertGreater(lookup['ms'], 0)
+        self.assertEqual(form['form'], {'username': ['new'], 'password': ['redacted']})
+        self.assertEqual(json.loads(api['json']), {'card_id': 1, 'quality': 4})
+        self.assertLessEqual(lookup['ts'], form['ts'])
+
+    def test_query_is_redacted(self):
+        with override_settings(TRAFFIC_CAPTURE_PATH=self.path):
+            self.client.get(reverse('index'), {'profile': 'admin-token', 'password': 'secret', 'page': '2'})
+            self.client.get(reverse('index'), {'profile': 'admin-token'})
+
+        with_page, token_only = self.records()
+        self.assertEqual(with_page['query'], {'password': ['redacted'], 'page': ['2']})
+        self.assertNotIn('query', token_only)
+
+    def test_samples_requests(self):
+        with override_settings(TRAFFIC_CAPTURE_PATH=self.path, TRAFFIC_CAPTURE_SAMPLE=0):
+            self.client.get(reverse('index'))
+        self.assertEqual(self.records(), [])
+
+    def test_off_without_a_path(self):
+        with override_settings(TRAFFIC_CAPTURE_PATH=''):
+            self.client.get(reverse('index'))
+        self.assertEqual(self.records(), [])
+
+
+class MetricsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="measured", password="password")
+        cls.set = FlashcardSet.objects.create(name="Measured", author=cls.user)
+
+    def setUp(self):
+        patcher = mock.patch.object(metrics, 'registry', metrics.Registry())
+        self.registry = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def scrape(self, **headers):
+        response = self.client.get(reverse('metrics'), headers=headers)
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode().splitlines()
+
+    def test_exports_latency_sql_and_size_per_view(self):
+        self.client.get(reverse('search_set'), {'set_id': self.set.id})
+        self.client.get(reverse('search_set'), {'set_id': self.set.id})
+        lines = self.scrape()
+
+        self.assertIn('# TYPE flashcards_request_duration_seconds histogram', lines)
+        self.assertIn('flashcards_request_duration_seconds_bucket{le="+Inf",method="GET",view="search_set"} 2', lines)
+        self.assertIn('flashcards_request_duration_seconds_count{method="GET",view="search_set"} 2', lines)
+        self.assertIn('flashcards_responses_total{status="200",view="search_set"} 2', lines)
+        queries = [line for line in lines if line.startswith('flashcards_db_queries_total{view="search_set"}')]
+        self.assertEqual(len(queries), 1)
+        self.assertGreater(int(queries[0].split()[-1]), 0)
+        self.assertIn('flashcards_response_size_bytes_count{view="search_set"} 2', lines)
+
+    async def test_counts_sql_of_async_views(self):
+        await self.async_client.get(reverse('list_all_collections'))
+        rows = self.registry.snapshot()
+        self.assertIn(['flashcards_db_queries_total', {'view': 'list_all_collections'}, 1], rows)
+
+    def test_histogram_buckets_are_cumulative(self):
+        for seconds in (0.001, 0.03, 0.03, 20):
+            self.registry.observe('flashcards_request_duration_seconds', {'view': 'v', 'method': 'GET'}, seconds)
+        lines = metrics.exposition(self.registry.snapshot()).splitlines()
+        self.assertIn('flashcards_request_duration_seconds_bucket{le="0.005",method="GET",view="v"} 1', lines)
+        self.assertIn('flashcards_request_duration_seconds_bucket{le="0.05",method="GET",view="v"} 3', lines)
+        self.assertIn('flashcards_request_duration_seconds_bucket{le="10.0",method="GET",view="v"} 3', lines)
+        self.assertIn('flashcards_request_duration_seconds_bucket{le="+Inf",method="GET",view="v"} 4', lines)
+        self.assertIn('flashcards_request_duration_seconds_sum{method="GET",view="v"} 20.061', lines)
+
+    def test_sums_every_worker_in_metrics_dir(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            with open(os.path.join(directory, 'metrics-1.json'), 'w') as f:
+                json.dump([['flashcards_responses_total', {'view': 'index', 'status': '200'}, 5]], f)
+            self.client.get(reverse('index'))
+            lines = self.scrape()
+            self.assertTrue(os.path.exists(self.registry.path()))
+        self.assertIn('flashcards_responses_total{status="200",view="index"} 6', lines)
+
+    @skipUnless(metrics.fcntl is not None, "exited workers are found through fcntl locks")
+    def test_keeps_the_totals_of_exited_workers(self):
+        def worker():
+            metrics.registry.inc('flashcards_responses_total', {'view': 'index', 'status': '200'}, 3)
+            metrics.registry.flush(force=True)
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            for _ in range(2):
+                process = multiprocessing.get_context('fork').Process(target=worker)
+                process.start()
+                process.join()
+            self.registry.inc('flashcards_responses_total', {'view': 'index', 'status': '200'})
+            for _ in range(2):
+                lines = metrics.exposition(self.registry.collect()).splitlines()
+                self.assertIn('flashcards_responses_total{status="200",view="index"} 7', lines)
+            # The workers' files were folded into one; this process keeps its own.
+            data_files = sorted(name for name in os.listdir(directory) if name.endswith('.json'))
+            # A later process with a reused pid gets a file of its own.
+            self.assertNotEqual(metrics.Registry().path(), self.registry.path())
+        self.assertEqual(data_files, sorted([metrics.EXITED_FILE, os.path.basename(self.registry.path())]))
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token_protects_the_page(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.scrape(authorization='Bearer secret')
+
+
+@override_settings(SLOW_QUERY_LOG='slow.jsonl', SLOW_QUERY_MS=0)
+class SlowQueryLogTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="slow", password="password")
+
+    def wrapped(self):
+        # Connections opened while SLOW_QUERY_LOG is set already carry the
+        # wrapper (PostgreSQL's pool opens them per checkout).
+        if slow_query_wrapper in connection.execute_wrappers:
+            return nullcontext()
+        return connection.execute_wrapper(slow_query_wrapper)
+
+    def logged(self, action):
+        with self.assertLogs('flashcards.slow_queries', 'WARNING') as logs, self.wrapped():
+            action()
+        return [json.loads(record.getMessage()) for record in logs.records]
+
+    def test_attributes_queries_to_the_view(self):
+        records = self.logged(lambda: self.client.post(reverse('search_user'), {'user_id': self.user.id}))
+        lookup = records[0]
+        self.assertIn('"flashcards_user"', lookup['sql'])
+        self.assertEqual(lookup['url_name'], 'search_user')
+        self.assertEqual(lookup['view'], 'flashcards.core.views.search_user')
+        self.assertRegex(lookup['source'], r'^flashcards/core/views\.py:\d+$')
+        self.assertIsNone(lookup['template'])
+        self.assertGreaterEqual(lookup['ms'], 0)
+
+    def test_attributes_queries_of_async_views_to_the_awaiting_line(self):
+        # The ORM of an async view runs in a sync_to_async thread.
+        async def lookup():
+            await self.async_client.get(reverse('search_set'), {'set_id': 999})
+
+        records = self.logged(lambda: async_to_sync(lookup)())
+        validator, lookup = [record for record in records if '"flashcards_flashcardset"' in record['sql']]
+        self.assertEqual(lookup['view'], 'flashcards.core.views.search_set')
+        self.assertRegex(validator['source'], r'^flashcards/core/conditional\.py:\d+$')
+        self.assertRegex(lookup['source'], r'^flashcards/core/views\.py:\d+$')
+        line = int(lookup['source'].rsplit(':', 1)[1])
+        with open(views.__file__) as f:
+            self.assertIn('aget(', ''.join(f.readlines()[line - 1:line + 3]))
+
+    def test_attributes_queries_to_the_template_line(self):
+        template = Template("<ul>\n{% for user in users %}<li>{{ user.username }}</li>{% endfor %}\n</ul>")
+        records = self.logged(lambda: template.render(Context({'users': User.objects.all()})))
+        users = [record for record in records if '"flashcards_user"' in record['sql']]
+        self.assertEqual(len(users), 1)
+        self.assertEqual(users[0]['template_line'], 2)
+        self.assertIsNone(users[0]['url_name'])
+
+    @override_settings(SLOW_QUERY_MS=10000)
+    def test_fast_queries_are_not_logged(self):
+        with self.assertNoLogs('flashcards.slow_queries'), self.wrapped():
+            self.client.post(reverse('search_user'), {'user_id': self.user.id})
+
+
+class ProfilingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username="profiler", password="password", admin=True)
+        cls.user = User.objects.create(username="regular", password="password")
+        cls.set = FlashcardSet.objects.create(name="Profiled", author=cls.user)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings_override = override_settings(PROFILE_DIR=self.directory, PROFILE_INTERVAL_MS=0.1)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def profile(self, token):
+        return self.client.post(reverse('comment_set'), {'set_id': self.set.id, 'comment': 'hi', 'author': self.user.id},
+                                headers={'x-profile': token})
+
+    def test_admin_token_profiles_the_request(self):
+        response = self.profile(profiling.make_token(self.admin))
+        name = response['X-Profile-Id']
+        with open(os.path.join(self.directory, name + '.json')) as f:
+            meta = json.load(f)
+        self.assertEqual(meta['url_name'], 'comment_set')
+        self.assertEqual(meta['status'], response.status_code)
+        self.assertEqual(meta['user_id'], self.admin.id)
+        self.assertTrue(os.path.exists(os.path.join(self.directory, name + '.folded')))
+
+        token = profiling.make_token(self.admin)
+        listing = self.client.get(reverse('profile_list'), {'profile': token})
+        self.assertContains(listing, reverse('comment_set'))
+        download = self.client.get(reverse('profile_detail', args=[name]), {'profile': token})
+        self.assertEqual(download.status_code, 200)
+        self.assertEqual(os.listdir(self.directory).count(name + '.json'), 1)
+
+    async def test_profiles_async_views(self):
+        token = profiling.make_token(self.admin)
+        response = await self.async_client.get(reverse('list_all_collections'), headers={'x-profile': token})
+        with open(os.path.join(self.directory, response['X-Profile-Id'] + '.json')) as f:
+            self.assertEqual(json.load(f)['url_name'], 'list_all_collections')
+
+    def test_other_tokens_are_ignored(self):
+        for token in (profiling.make_token(self.user), 'forged', ''):
+            with self.subTest(token=token):
+                response = self.profile(token)
+                self.assertNotIn('X-Profile-Id', response)
+                self.assertEqual(self.client.get(reverse('profile_list'), {'profile': token}).status_code, 403)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_sampler_collects_collapsed_stacks(self):
+        sampler = profiling.Sampler(threading.get_ident())
+        sampler.start()
+        time.sleep(0.05)
+        sampler.stop()
+        self.assertGreater(sampler.samples, 0)
+        stack, count = sampler.collapsed().splitlines()[0].rsplit(' ', 1)
+        self.assertIn('test_sampler_collects_collapsed_stacks (flashcards/tests/test_views.py:', stack)
+        self.assertGreater(int(count), 0)
+
+    @override_settings(PROFILE_MAX_FILES=2)
+    def test_store_keeps_the_newest_profiles(self):
+        token = profiling.make_token(self.admin)
+        names = [self.profile(token)['X-Profile-Id'] for _ in range(3)]
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         sorted(name + suffix for name in names[1:] for suffix in ('.folded', '.json')))
@@ -15,17 +15,19 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
-from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
 from flashcards.core import views as core_views
+from flashcards.core import api as core_api
+from flashcards import metrics, profiling
 
 urlpatterns = [
     path("", core_views.index),
-    path("admin/", admin.site.urls),
-    path("__reload__/", include("django_browser_reload.urls")),
+    path("metrics", metrics.metrics, name='metrics'),
+    path("profiles", profiling.profile_list, name='profile_list'),
+    path("profiles/<str:name>", profiling.profile_detail, name='profile_detail'),
     path("homepage", core_views.index, name='index'),
     path("userlist", core_views.list_users, name='list_users'),
     path("createuser", core_views.submit_form, name='submit_form'),
@@ -52,7 +54,24 @@ urlpatterns = [
     path("sethub", core_views.sethub, name='sethub'),
     path("collectionhub", core_views.collectionhub, name='collectionhub'),
     path("studyflashcards", core_views.study_flashcards, name='study_flashcards'),
+    path("api/sets", core_api.sets, name='api_sets'),
+    path("api/sets/<int:set_id>/cards", core_api.set_cards, name='api_set_cards'),
+    path("api/search", core_api.search, name='api_search'),
+    path("api/collections/random", core_api.random_collection, name='api_random_collection'),
+    path("api/collections/<int:col_id>", core_api.collection_detail, name='api_collection'),
+    path("api/users/<int:user_id>/due", core_api.due_cards, name='api_due_cards'),
+    path("api/users/<int:user_id>/study/<int:set_id>", core_api.study_set, name='api_study_set'),
+    path("api/users/<int:user_id>/reviews", core_api.record_review, name='api_record_review'),
 ]
+
+# Only import the admin and the dev apps' URLs when they are installed;
+# flashcards.settings_production leaves them out.
+if "django.contrib.admin" in settings.INSTALLED_APPS:
+    from django.contrib import admin
+    urlpatterns.append(path("admin/", admin.site.urls))
+if "django_browser_reload" in settings.INSTALLED_APPS:
+    urlpatterns.append(path("__reload__/", include("django_browser_reload.urls")))
+
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
@@ -11,6 +11,9 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from flashcards.static_server import wrap_wsgi
+
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "flashcards.settings")
 
-application = get_wsgi_application()
+# With SERVE_STATIC on, files under STATIC_ROOT are answered before Django.
+application = wrap_wsgi(get_wsgi_application())